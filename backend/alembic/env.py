@@ -0,0 +1,70 @@
+from logging.config import fileConfig
+import os
+import sys
+
+from alembic import context
+
+# Make the app package importable when running the alembic CLI from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base, engine, DATABASE_URL
+from app import models  # noqa: F401 - registers the tables on Base.metadata
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Backend-specific search structures created by raw SQL in migration 0006
+SEARCH_INDEX_OBJECTS = ("search_documents_fts", "ix_search_documents_fulltext")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate from dropping objects the models can't describe."""
+    return not (reflected and name and name.startswith(SEARCH_INDEX_OBJECTS))
+
+
+def run_migrations_offline() -> None:
+    """Emit SQL for the migrations without a database connection."""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run the migrations against the application's engine."""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
+    with engine.connect() as connection:
+        _run_with_connection(connection)
+
+
+def _run_with_connection(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
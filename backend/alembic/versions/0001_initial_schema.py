@@ -0,0 +1,134 @@
+"""Initial schema
+
+Matches the tables previously created by Base.metadata.create_all.
+Databases created that way are stamped at this revision by
+app.migrations.upgrade_database before upgrading.
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_initial_schema"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_admin", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "subjects",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_subjects_id", "subjects", ["id"])
+
+    op.create_table(
+        "questions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("subject_id", sa.Integer(), sa.ForeignKey("subjects.id"), nullable=False),
+        sa.Column("question_text", sa.Text(), nullable=False),
+        sa.Column("option_a", sa.String(), nullable=False),
+        sa.Column("option_b", sa.String(), nullable=False),
+        sa.Column("option_c", sa.String(), nullable=False),
+        sa.Column("option_d", sa.String(), nullable=False),
+        sa.Column("correct_answer", sa.String(), nullable=False),
+        sa.Column("explanation", sa.Text(), nullable=True),
+        sa.Column("difficulty_level", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_questions_id", "questions", ["id"])
+
+    op.create_table(
+        "practice_sessions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("subject_id", sa.Integer(), sa.ForeignKey("subjects.id"), nullable=False),
+        sa.Column("score", sa.Float(), nullable=True),
+        sa.Column("total_questions", sa.Integer(), nullable=True),
+        sa.Column("correct_answers", sa.Integer(), nullable=True),
+        sa.Column("time_taken", sa.Integer(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_practice_sessions_id", "practice_sessions", ["id"])
+
+    op.create_table(
+        "question_attempts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id"), nullable=False),
+        sa.Column("session_id", sa.Integer(), sa.ForeignKey("practice_sessions.id"), nullable=False),
+        sa.Column("selected_answer", sa.String(), nullable=False),
+        sa.Column("is_correct", sa.Boolean(), nullable=False),
+        sa.Column("time_taken", sa.Integer(), nullable=True),
+        sa.Column("attempted_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_question_attempts_id", "question_attempts", ["id"])
+
+    op.create_table(
+        "subject_contents",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("subject_id", sa.Integer(), sa.ForeignKey("subjects.id"), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_subject_contents_id", "subject_contents", ["id"])
+
+    op.create_table(
+        "lessons",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("content_id", sa.Integer(), sa.ForeignKey("subject_contents.id"), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_lessons_id", "lessons", ["id"])
+
+    op.create_table(
+        "user_enrollments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("subject_id", sa.Integer(), sa.ForeignKey("subjects.id"), nullable=False),
+        sa.Column("enrolled_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_user_enrollments_id", "user_enrollments", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_enrollments")
+    op.drop_table("lessons")
+    op.drop_table("subject_contents")
+    op.drop_table("question_attempts")
+    op.drop_table("practice_sessions")
+    op.drop_table("questions")
+    op.drop_table("subjects")
+    op.drop_table("users")
@@ -0,0 +1,61 @@
+"""Composite indexes for hot filters and unique enrollments
+
+Revision ID: 0002_hot_path_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_hot_path_indexes"
+down_revision: Union[str, Sequence[str], None] = "0001_initial_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_question_attempts_user_id_attempted_at", "question_attempts", ["user_id", "attempted_at"]),
+    ("ix_question_attempts_user_id_is_correct", "question_attempts", ["user_id", "is_correct"]),
+    ("ix_question_attempts_session_id", "question_attempts", ["session_id"]),
+    ("ix_question_attempts_question_id", "question_attempts", ["question_id"]),
+    ("ix_practice_sessions_user_id_completed_at", "practice_sessions", ["user_id", "completed_at"]),
+    ("ix_practice_sessions_subject_id_score", "practice_sessions", ["subject_id", "score"]),
+    ("ix_practice_sessions_completed_at", "practice_sessions", ["completed_at"]),
+    ("ix_user_enrollments_user_id_is_active", "user_enrollments", ["user_id", "is_active", "subject_id"]),
+    ("ix_user_enrollments_subject_id_is_active", "user_enrollments", ["subject_id", "is_active"]),
+    ("ix_questions_subject_id_is_active_difficulty", "questions", ["subject_id", "is_active", "difficulty_level"]),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Re-enrolling used to insert a new row per enrollment, so keep only the
+    # newest row for each user/subject pair before adding the unique index
+    op.execute(
+        sa.text(
+            "DELETE FROM user_enrollments WHERE id NOT IN ("
+            "SELECT id FROM (SELECT MAX(id) AS id FROM user_enrollments "
+            "GROUP BY user_id, subject_id) AS keep)"
+        )
+    )
+    op.create_index(
+        "uq_user_enrollments_user_id_subject_id",
+        "user_enrollments",
+        ["user_id", "subject_id"],
+        unique=True,
+    )
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    op.drop_index("uq_user_enrollments_user_id_subject_id", table_name="user_enrollments")
@@ -0,0 +1,47 @@
+"""Elo ratings for questions and per-subject user mastery
+
+Revision ID: 0003_adaptive_ratings
+Revises: 0002_hot_path_indexes
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_adaptive_ratings"
+down_revision: Union[str, Sequence[str], None] = "0002_hot_path_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("questions") as batch_op:
+        batch_op.add_column(sa.Column("rating", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("rating_attempts", sa.Integer(), server_default="0", nullable=True))
+
+    op.create_table(
+        "user_mastery",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("subject_id", sa.Integer(), sa.ForeignKey("subjects.id"), nullable=False),
+        sa.Column("ability", sa.Float(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_user_mastery_id", "user_mastery", ["id"])
+    op.create_index("uq_user_mastery_user_id_subject_id", "user_mastery", ["user_id", "subject_id"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uq_user_mastery_user_id_subject_id", table_name="user_mastery")
+    op.drop_index("ix_user_mastery_id", table_name="user_mastery")
+    op.drop_table("user_mastery")
+    with op.batch_alter_table("questions") as batch_op:
+        batch_op.drop_column("rating_attempts")
+        batch_op.drop_column("rating")
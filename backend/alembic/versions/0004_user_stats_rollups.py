@@ -0,0 +1,64 @@
+"""Per-user statistics rollups
+
+Revision ID: 0004_user_stats_rollups
+Revises: 0003_adaptive_ratings
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_user_stats_rollups"
+down_revision: Union[str, Sequence[str], None] = "0003_adaptive_ratings"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user_stats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("sessions", sa.Integer(), nullable=False),
+        sa.Column("score_sum", sa.Float(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("correct_answers", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_table(
+        "user_subject_stats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("subject_id", sa.Integer(), sa.ForeignKey("subjects.id"), primary_key=True),
+        sa.Column("sessions", sa.Integer(), nullable=False),
+    )
+
+    # Backfill from existing history; from here on writes keep the rollups current
+    op.execute(
+        sa.text(
+            "INSERT INTO user_stats (user_id, sessions, score_sum, attempts, correct_answers) "
+            "SELECT users.id, COALESCE(s.sessions, 0), COALESCE(s.score_sum, 0.0), "
+            "COALESCE(a.attempts, 0), COALESCE(a.correct_answers, 0) FROM users "
+            "LEFT JOIN (SELECT user_id, COUNT(id) AS sessions, COALESCE(SUM(score), 0.0) AS score_sum "
+            "FROM practice_sessions GROUP BY user_id) AS s ON s.user_id = users.id "
+            "LEFT JOIN (SELECT user_id, COUNT(id) AS attempts, "
+            "COUNT(CASE WHEN is_correct THEN 1 END) AS correct_answers "
+            "FROM question_attempts GROUP BY user_id) AS a ON a.user_id = users.id "
+            "WHERE s.user_id IS NOT NULL OR a.user_id IS NOT NULL"
+        )
+    )
+    op.execute(
+        sa.text(
+            "INSERT INTO user_subject_stats (user_id, subject_id, sessions) "
+            "SELECT user_id, subject_id, COUNT(id) FROM practice_sessions GROUP BY user_id, subject_id"
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_subject_stats")
+    op.drop_table("user_stats")
@@ -0,0 +1,52 @@
+"""Daily practice activity rollups per subject
+
+Revision ID: 0005_daily_subject_stats
+Revises: 0004_user_stats_rollups
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_daily_subject_stats"
+down_revision: Union[str, Sequence[str], None] = "0004_user_stats_rollups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "daily_subject_stats",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("subject_id", sa.Integer(), sa.ForeignKey("subjects.id"), primary_key=True),
+        sa.Column("sessions", sa.Integer(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("score_sum", sa.Float(), nullable=False),
+        sa.Column("time_sum", sa.Integer(), nullable=False),
+    )
+
+    # Backfill from existing history; from here on writes keep the rollups current
+    op.execute(
+        sa.text(
+            "INSERT INTO daily_subject_stats (day, subject_id, sessions, attempts, score_sum, time_sum) "
+            "SELECT day, subject_id, SUM(sessions), SUM(attempts), SUM(score_sum), SUM(time_sum) FROM ("
+            "SELECT DATE(completed_at) AS day, subject_id, COUNT(id) AS sessions, 0 AS attempts, "
+            "COALESCE(SUM(score), 0.0) AS score_sum, COALESCE(SUM(time_taken), 0) AS time_sum "
+            "FROM practice_sessions GROUP BY DATE(completed_at), subject_id "
+            "UNION ALL "
+            "SELECT DATE(question_attempts.attempted_at), questions.subject_id, 0, COUNT(question_attempts.id), 0.0, 0 "
+            "FROM question_attempts JOIN questions ON questions.id = question_attempts.question_id "
+            "GROUP BY DATE(question_attempts.attempted_at), questions.subject_id"
+            ") AS activity GROUP BY day, subject_id"
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("daily_subject_stats")
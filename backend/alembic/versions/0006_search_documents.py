@@ -0,0 +1,89 @@
+"""Full-text search documents
+
+Revision ID: 0006_search_documents
+Revises: 0005_daily_subject_stats
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_search_documents"
+down_revision: Union[str, Sequence[str], None] = "0005_daily_subject_stats"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# FTS5 mirrors search_documents through triggers, so set-based writes stay indexed
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE search_documents_fts USING fts5("
+    "title, body, content='search_documents', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER search_documents_fts_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER search_documents_fts_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts (search_documents_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER search_documents_fts_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts (search_documents_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body); END",
+]
+
+BACKFILL = [
+    "INSERT INTO search_documents (kind, ref_id, subject_id, title, body, is_active) "
+    "SELECT 'subject', id, id, name, COALESCE(description, ''), COALESCE(is_active, 1 = 1) FROM subjects",
+    "INSERT INTO search_documents (kind, ref_id, subject_id, title, body, is_active) "
+    "SELECT 'content', id, subject_id, title, body, 1 = 1 FROM subject_contents",
+    "INSERT INTO search_documents (kind, ref_id, subject_id, title, body, is_active) "
+    "SELECT 'lesson', lessons.id, subject_contents.subject_id, lessons.title, lessons.body, 1 = 1 "
+    "FROM lessons LEFT JOIN subject_contents ON subject_contents.id = lessons.content_id",
+    "INSERT INTO search_documents (kind, ref_id, subject_id, title, body, is_active) "
+    "SELECT 'question', id, subject_id, question_text, '', COALESCE(is_active, 1 = 1) FROM questions",
+]
+
+
+def _sqlite_has_fts5(bind) -> bool:
+    try:
+        return bool(bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+    except Exception:
+        return False
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "search_documents",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("ref_id", sa.Integer(), nullable=False),
+        sa.Column("subject_id", sa.Integer(), nullable=True),
+        sa.Column("title", sa.Text(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+    )
+    op.create_index("ix_search_documents_id", "search_documents", ["id"])
+    op.create_index("uq_search_documents_kind_ref_id", "search_documents", ["kind", "ref_id"], unique=True)
+
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite" and _sqlite_has_fts5(bind):
+        for statement in SQLITE_FTS:
+            op.execute(sa.text(statement))
+    elif bind.dialect.name == "mysql":
+        op.execute(sa.text("CREATE FULLTEXT INDEX ix_search_documents_fulltext ON search_documents (title, body)"))
+
+    for statement in BACKFILL:
+        op.execute(sa.text(statement))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for trigger in ("search_documents_fts_ai", "search_documents_fts_ad", "search_documents_fts_au"):
+            op.execute(sa.text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        op.execute(sa.text("DROP TABLE IF EXISTS search_documents_fts"))
+    op.drop_table("search_documents")
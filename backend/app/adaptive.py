@@ -0,0 +1,131 @@
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import math
+import os
+from dotenv import load_dotenv
+
+from .models import Question, UserMastery
+from .question_pool import question_pool_cache, question_rating
+
+# Load environment variables
+load_dotenv()
+
+# Chance of a correct answer that adaptive practice aims each question at
+ADAPTIVE_TARGET_SUCCESS = float(os.getenv("ADAPTIVE_TARGET_SUCCESS", "0.7"))
+# Elo step for a fresh rating; it shrinks as the rating collects attempts
+ADAPTIVE_K_FACTOR = float(os.getenv("ADAPTIVE_K_FACTOR", "0.4"))
+# Smallest step a settled rating still moves by, so it can follow real change
+ADAPTIVE_MIN_K_FACTOR = 0.05
+# Candidates drawn from per question served, so repeat requests don't get identical sets
+ADAPTIVE_SPREAD = 3
+
+_questions = Question.__table__
+
+# Deltas are added in SQL so concurrent attempts on a question can't overwrite each other
+_rating_update = update(_questions).where(_questions.c.id == bindparam("question_id")).values(
+    rating=func.coalesce(_questions.c.rating, bindparam("prior")) + bindparam("delta"),
+    rating_attempts=func.coalesce(_questions.c.rating_attempts, 0) + bindparam("answered")
+)
+
+def expected_success(ability: float, rating: float) -> float:
+    """Chance that a user of this ability answers a question of this rating correctly"""
+    return 1.0 / (1.0 + math.exp(rating - ability))
+
+def k_factor(attempts: int) -> float:
+    """Elo step size for a rating backed by this many attempts"""
+    return max(ADAPTIVE_MIN_K_FACTOR, ADAPTIVE_K_FACTOR / (1 + attempts / 20))
+
+def target_rating(ability: float) -> float:
+    """Question rating this ability answers correctly with ADAPTIVE_TARGET_SUCCESS chance"""
+    return ability - math.log(ADAPTIVE_TARGET_SUCCESS / (1 - ADAPTIVE_TARGET_SUCCESS))
+
+def get_mastery(db: Session, user_id: int, subject_id: int) -> Optional[UserMastery]:
+    """Get a user's ability estimate for a subject"""
+    return db.query(UserMastery).filter(
+        UserMastery.user_id == user_id,
+        UserMastery.subject_id == subject_id
+    ).first()
+
+def lock_mastery(db: Session, user_id: int, subject_id: int) -> UserMastery:
+    """Get a user's mastery row for a subject, created on first use and locked until the caller commits"""
+    locked = db.query(UserMastery).filter(
+        UserMastery.user_id == user_id,
+        UserMastery.subject_id == subject_id
+    ).with_for_update().populate_existing()
+    mastery = locked.first()
+    if mastery is not None:
+        return mastery
+    try:
+        # The new row stays locked by this transaction until it commits
+        with db.begin_nested():
+            mastery = UserMastery(user_id=user_id, subject_id=subject_id, ability=0.0, attempts=0)
+            db.add(mastery)
+        return mastery
+    except IntegrityError:
+        # A concurrent transaction created the row first
+        return locked.one()
+
+def select_adaptive_question_ids(
+    db: Session,
+    user_id: int,
+    subject_id: int,
+    count: int,
+    exclude: Optional[set] = None
+) -> Tuple[float, List[int]]:
+    """Pick questions rated near the user's target for a subject, returning the ability used and the ids"""
+    mastery = get_mastery(db, user_id, subject_id)
+    ability = mastery.ability if mastery else 0.0
+    pool = question_pool_cache.get(db, subject_id)
+    return ability, pool.nearest_ids(target_rating(ability), count, exclude or set(), ADAPTIVE_SPREAD)
+
+def record_attempts(db: Session, user_id: int, subject_id: int, graded: Iterable[Tuple[int, bool]]):
+    """Apply Elo updates for newly graded answers to the user's ability and the questions' ratings.
+
+    Only the answered questions and the user's mastery row are read, so the
+    cost follows the size of the submission, not the user's history. The
+    mastery row stays locked and changes join the caller's transaction; the
+    caller commits.
+    """
+    graded = list(graded)
+    if not graded:
+        return
+    questions = {
+        row.id: row for row in db.query(
+            Question.id, Question.rating, Question.rating_attempts, Question.difficulty_level
+        ).filter(Question.id.in_({question_id for question_id, _ in graded}))
+    }
+
+    # Locked, so concurrent sessions for the same user and subject apply their answers one after the other
+    mastery = lock_mastery(db, user_id, subject_id)
+    ability, attempts = mastery.ability, mastery.attempts
+
+    # Replay the answers in order against local copies, then write each question's net change
+    ratings = {}
+    for question_id, is_correct in graded:
+        row = questions.get(question_id)
+        if row is None:
+            continue
+        if question_id not in ratings:
+            prior = question_rating(row.rating, row.difficulty_level)
+            ratings[question_id] = {"prior": prior, "rating": prior, "answered": 0, "seen": row.rating_attempts or 0}
+        state = ratings[question_id]
+        surprise = (1.0 if is_correct else 0.0) - expected_success(ability, state["rating"])
+        ability += k_factor(attempts) * surprise
+        state["rating"] -= k_factor(state["seen"] + state["answered"]) * surprise
+        attempts += 1
+        state["answered"] += 1
+
+    mastery.ability = ability
+    mastery.attempts = attempts
+    if ratings:
+        db.execute(_rating_update, [
+            {
+                "question_id": question_id,
+                "prior": state["prior"],
+                "delta": state["rating"] - state["prior"],
+                "answered": state["answered"],
+            }
+            for question_id, state in ratings.items()
+        ])
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+from .models import User, Subject, Question, PracticeSession, QuestionAttempt, UserEnrollment
+
+# Load environment variables
+load_dotenv()
+
+# How long computed counters are reused before hitting the database again
+ADMIN_STATS_CACHE_SECONDS = float(os.getenv("ADMIN_STATS_CACHE_SECONDS", "5"))
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+def memoized(key: str, compute, ttl_seconds: float = None):
+    """Return a cached value for key, recomputing it once the window has passed"""
+    ttl = ADMIN_STATS_CACHE_SECONDS if ttl_seconds is None else ttl_seconds
+    now = time.monotonic()
+    with _memo_lock:
+        entry = _memo.get(key)
+        if entry and entry[1] > now:
+            return entry[0]
+    value = compute()
+    if ttl > 0:
+        with _memo_lock:
+            _memo[key] = (value, now + ttl)
+    return value
+
+def clear_memoized(prefix: str = ""):
+    """Drop memoized values whose key starts with prefix"""
+    with _memo_lock:
+        for key in [k for k in _memo if k.startswith(prefix)]:
+            del _memo[key]
+
+def _count_if(condition):
+    return func.count(case((condition, 1)))
+
+def _compute_system_counters(db: Session) -> dict:
+    now = datetime.utcnow()
+    week_ago = now - timedelta(days=7)
+    day_ago = now - timedelta(days=1)
+
+    users = db.query(
+        func.count(User.id),
+        _count_if(User.is_active == True),
+        _count_if(User.is_admin == True),
+        _count_if(User.created_at >= week_ago),
+        _count_if(User.created_at >= day_ago),
+    ).one()
+
+    subjects = db.query(
+        func.count(Subject.id),
+        _count_if(Subject.is_active == True),
+        _count_if(Subject.is_active == False),
+    ).one()
+
+    questions = db.query(
+        func.count(Question.id),
+        _count_if(Question.is_active == True),
+        _count_if(Question.is_active == False),
+    ).one()
+
+    sessions = db.query(
+        func.count(PracticeSession.id),
+        func.avg(PracticeSession.score),
+        func.avg(PracticeSession.time_taken),
+        _count_if(PracticeSession.completed_at >= week_ago),
+        _count_if(PracticeSession.completed_at >= day_ago),
+    ).one()
+
+    total_attempts = db.query(func.count(QuestionAttempt.id)).scalar()
+
+    return {
+        "users": {
+            "total": users[0],
+            "active": users[1],
+            "admins": users[2],
+            "new_7d": users[3],
+            "new_24h": users[4],
+        },
+        "subjects": {
+            "total": subjects[0],
+            "active": subjects[1],
+            "inactive": subjects[2],
+        },
+        "questions": {
+            "total": questions[0],
+            "active": questions[1],
+            "inactive": questions[2],
+        },
+        "sessions": {
+            "total": sessions[0],
+            "average_score": sessions[1] or 0.0,
+            "average_time": sessions[2] or 0.0,
+            "recent_7d": sessions[3],
+            "recent_24h": sessions[4],
+        },
+        "attempts": {
+            "total": total_attempts,
+        },
+        "computed_at": now,
+    }
+
+def get_system_counters(db: Session) -> dict:
+    """Get system-wide counters with one aggregate query per table, memoized briefly"""
+    return memoized("system_counters", lambda: _compute_system_counters(db))
+
+# Sortable metrics for subject analytics
+SUBJECT_ANALYTICS_SORT_FIELDS = ("id", "name", "enrollment_count", "question_count", "average_score")
+
+def get_subject_analytics(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    sort_by: str = "id",
+    descending: bool = False
+) -> list:
+    """Get enrollment, question and score metrics for active subjects in a single query"""
+    enrollments = db.query(
+        UserEnrollment.subject_id.label("subject_id"),
+        func.count(UserEnrollment.id).label("enrollment_count")
+    ).filter(UserEnrollment.is_active == True).group_by(UserEnrollment.subject_id).subquery()
+
+    questions = db.query(
+        Question.subject_id.label("subject_id"),
+        func.count(Question.id).label("question_count")
+    ).filter(Question.is_active == True).group_by(Question.subject_id).subquery()
+
+    scores = db.query(
+        PracticeSession.subject_id.label("subject_id"),
+        func.avg(PracticeSession.score).label("average_score")
+    ).group_by(PracticeSession.subject_id).subquery()
+
+    enrollment_count = func.coalesce(enrollments.c.enrollment_count, 0)
+    question_count = func.coalesce(questions.c.question_count, 0)
+    average_score = func.coalesce(scores.c.average_score, 0.0)
+    sort_columns = {
+        "id": Subject.id,
+        "name": Subject.name,
+        "enrollment_count": enrollment_count,
+        "question_count": question_count,
+        "average_score": average_score,
+    }
+    sort_column = sort_columns[sort_by]
+
+    rows = db.query(Subject, enrollment_count, question_count, average_score).outerjoin(
+        enrollments, enrollments.c.subject_id == Subject.id
+    ).outerjoin(
+        questions, questions.c.subject_id == Subject.id
+    ).outerjoin(
+        scores, scores.c.subject_id == Subject.id
+    ).filter(
+        Subject.is_active == True
+    ).order_by(
+        sort_column.desc() if descending else sort_column.asc(), Subject.id
+    ).offset(skip).limit(limit).all()
+
+    return [
+        {
+            "subject": subject,
+            "enrollment_count": enrollments_total,
+            "question_count": questions_total,
+            "average_score": round(score or 0.0, 2)
+        } for subject, enrollments_total, questions_total, score in rows
+    ]
@@ -0,0 +1,113 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional
+from sqlalchemy.orm import Session
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+from .models import Question
+
+# Load environment variables
+load_dotenv()
+
+# Upper bound on how stale another worker's copy can get after an admin edit
+ANSWER_KEY_CACHE_SECONDS = float(os.getenv("ANSWER_KEY_CACHE_SECONDS", "300"))
+
+# One-byte answer codes; 0 marks an id that is not a question of the subject
+ANSWER_CODES = {"A": 1, "B": 2, "C": 3, "D": 4}
+# Stored answers outside A-D: the question exists but no selection matches it
+UNGRADABLE_ANSWER = 255
+# A subject's ids spread over more than this many times its question count get a sorted id array instead of a dense one
+DENSE_SPAN_FACTOR = 4
+
+def encode_answer(answer: Optional[str]) -> int:
+    """Get the one-byte code for an answer letter, 0 when it isn't A-D"""
+    return ANSWER_CODES.get((answer or "").strip().upper(), 0)
+
+class SubjectAnswerKey:
+    """Correct answers of one subject's questions.
+
+    When the subject's ids are close together, codes is indexed by
+    question id - first_id. When they are scattered among other subjects'
+    ids, a dense array would be sized by the id span, so codes runs
+    parallel to a sorted array of ids searched with bisect instead.
+    """
+
+    __slots__ = ("first_id", "ids", "codes", "expires_at")
+
+    def __init__(self, rows: Iterable[tuple], ttl_seconds: float):
+        rows = sorted(rows, key=lambda row: row[0])
+        self.first_id = rows[0][0] if rows else 0
+        span = rows[-1][0] - self.first_id + 1 if rows else 0
+        if span <= DENSE_SPAN_FACTOR * len(rows):
+            self.ids = None
+            self.codes = bytearray(span)
+            for question_id, answer in rows:
+                self.codes[question_id - self.first_id] = encode_answer(answer) or UNGRADABLE_ANSWER
+        else:
+            self.ids = array("q", (question_id for question_id, _ in rows))
+            self.codes = bytearray(encode_answer(answer) or UNGRADABLE_ANSWER for _, answer in rows)
+        self.expires_at = time.monotonic() + ttl_seconds
+
+    def get(self, question_id: int) -> int:
+        if self.ids is not None:
+            index = bisect_left(self.ids, question_id)
+            if index < len(self.ids) and self.ids[index] == question_id:
+                return self.codes[index]
+            return 0
+        index = question_id - self.first_id
+        if 0 <= index < len(self.codes):
+            return self.codes[index]
+        return 0
+
+    def __contains__(self, question_id: int) -> bool:
+        return self.get(question_id) != 0
+
+    def is_correct(self, question_id: int, selected_answer: str) -> bool:
+        """Grade a selected option with a memory lookup"""
+        code = self.get(question_id)
+        return code != 0 and code == encode_answer(selected_answer)
+
+class AnswerKeyCache:
+    """Per-process answer keys, loaded per subject on first use"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._keys: Dict[int, SubjectAnswerKey] = {}
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, subject_id: int) -> SubjectAnswerKey:
+        """Get a subject's answer key, loading it with one narrow query when missing or expired"""
+        with self._lock:
+            key = self._keys.get(subject_id)
+            generation = (self._epoch, self._generations.get(subject_id, 0))
+        if key is not None and key.expires_at > time.monotonic():
+            return key
+        rows = db.query(Question.id, Question.correct_answer).filter(Question.subject_id == subject_id).all()
+        key = SubjectAnswerKey(rows, self.ttl_seconds)
+        with self._lock:
+            # Don't keep a key that was invalidated while it was loading
+            if (self._epoch, self._generations.get(subject_id, 0)) == generation:
+                self._keys[subject_id] = key
+        return key
+
+    def invalidate(self, subject_id: int):
+        with self._lock:
+            self._keys.pop(subject_id, None)
+            self._generations[subject_id] = self._generations.get(subject_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._keys.clear()
+
+answer_key_cache = AnswerKeyCache(ANSWER_KEY_CACHE_SECONDS)
+
+def invalidate_answer_keys(*subject_ids: int):
+    """Drop cached answer keys so the next grading reloads them"""
+    for subject_id in subject_ids:
+        answer_key_cache.invalidate(subject_id)
@@ -0,0 +1,346 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterator, Optional
+from sqlalchemy import select, func, delete, DateTime, text
+from starlette.concurrency import run_in_threadpool
+import json
+import logging
+import os
+import threading
+import uuid
+import zlib
+from dotenv import load_dotenv
+
+from .database import engine
+from .uploads import iter_upload_lines
+from .user_stats import STATS_TABLES, rebuild_user_stats
+from .daily_stats import rebuild_daily_stats
+from .search import rebuild_search_index
+from .models import (
+    User, Subject, Question, SubjectContent, Lesson, UserEnrollment, PracticeSession, QuestionAttempt, UserMastery,
+    DailySubjectStats
+)
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the server-side cursor per round trip
+BACKUP_CHUNK_SIZE = int(os.getenv("BACKUP_CHUNK_SIZE", "1000"))
+
+# Rows inserted (and committed) per executemany during a restore
+RESTORE_CHUNK_SIZE = int(os.getenv("RESTORE_CHUNK_SIZE", "5000"))
+
+BACKUP_FORMAT = "studentlearn-backup"
+BACKUP_FORMAT_VERSION = 1
+
+# Tables in foreign key order, so a restore can insert them front to back
+BACKUP_TABLES = [
+    model.__table__ for model in (
+        User, Subject, Question, SubjectContent, Lesson, UserEnrollment, PracticeSession, QuestionAttempt,
+        UserMastery
+    )
+]
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _dump(record: dict) -> str:
+    return json.dumps(record, default=_json_default, separators=(",", ":")) + "\n"
+
+def iter_backup_lines(chunk_size: int = None) -> Iterator[str]:
+    """Yield the whole database as NDJSON, a chunk of rows at a time.
+
+    The first line is a header, then one {"table", "row"} line per row, and a
+    footer with per-table counts marks a complete backup.
+    """
+    chunk_size = chunk_size or BACKUP_CHUNK_SIZE
+    counts = {}
+    yield _dump({
+        "type": "header",
+        "format": BACKUP_FORMAT,
+        "version": BACKUP_FORMAT_VERSION,
+        "timestamp": datetime.utcnow().isoformat(),
+        "tables": [table.name for table in BACKUP_TABLES],
+    })
+
+    # One transaction for every table so the export is a consistent snapshot
+    with engine.connect() as conn, conn.begin():
+        for table in BACKUP_TABLES:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+                select(table).order_by(table.c.id)
+            )
+            count = 0
+            for rows in result.partitions():
+                yield "".join(_dump({"table": table.name, "row": dict(row._mapping)}) for row in rows)
+                count += len(rows)
+            counts[table.name] = count
+
+    yield _dump({"type": "footer", "counts": counts})
+
+def iter_gzip(chunks: Iterator[str], level: int = 6) -> Iterator[bytes]:
+    """Gzip-compress a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_backup(compress: bool = False) -> Iterator:
+    """Stream a backup as NDJSON text, or gzip bytes when compress is set"""
+    lines = iter_backup_lines()
+    return iter_gzip(lines) if compress else lines
+
+# Restore
+
+# Password placeholder for users from backups that carry no hash
+RESTORED_PASSWORD_HASH = "restored_user_password_hash"
+
+# Top-level keys of the original single-document JSON backups
+LEGACY_BACKUP_KEYS = {
+    "users": "users",
+    "subjects": "subjects",
+    "questions": "questions",
+    "enrollments": "user_enrollments",
+}
+
+_tables_by_name = {table.name: table for table in BACKUP_TABLES}
+_restore_lock = threading.Lock()
+_restore_runs: "OrderedDict[str, RestoreRun]" = OrderedDict()
+
+class RestoreInProgress(Exception):
+    """Raised when a restore is started while another one is running"""
+
+class InvalidBackup(ValueError):
+    """Raised when the uploaded backup cannot be parsed"""
+
+class RestoreRun:
+    """Chunked restore of a backup stream, with progress and resume checkpoints.
+
+    Every chunk is inserted with one executemany and committed on its own, and
+    rows arrive in id order per table, so after an interruption the highest id
+    in each table is exactly how far that table got. Resuming skips those rows
+    instead of clearing the database again.
+    """
+
+    def __init__(self, resume: bool = False, chunk_size: int = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.resume = resume
+        self.chunk_size = chunk_size or RESTORE_CHUNK_SIZE
+        self.status = "running"
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+        self.error = None
+        self.complete = False
+        self.current_table = None
+        self.chunks = 0
+        self.restored = {table.name: 0 for table in BACKUP_TABLES}
+        self.skipped = {table.name: 0 for table in BACKUP_TABLES}
+        self.expected = None
+        self._checkpoints = {}
+        self._pending = []
+        self._pending_table = None
+        self._ready = []
+        self._datetime_columns = {
+            table.name: [column.name for column in table.columns if isinstance(column.type, DateTime)]
+            for table in BACKUP_TABLES
+        }
+
+    def prepare(self):
+        """Clear existing data, or load resume checkpoints"""
+        with engine.begin() as conn:
+            if self.resume:
+                for table in BACKUP_TABLES:
+                    self._checkpoints[table.name] = conn.execute(select(func.max(table.c.id))).scalar() or 0
+            else:
+                for table in [DailySubjectStats.__table__] + STATS_TABLES + list(reversed(BACKUP_TABLES)):
+                    conn.execute(delete(table))
+
+    def add(self, table_name: str, row: dict) -> bool:
+        """Queue a row, returning True once a chunk is ready to flush"""
+        table = _tables_by_name.get(table_name)
+        if table is None:
+            raise InvalidBackup(f"Unknown table in backup: {table_name}")
+        if row.get("id") is not None and row["id"] <= self._checkpoints.get(table_name, 0):
+            self.skipped[table_name] += 1
+            return False
+
+        values = {key: value for key, value in row.items() if key in table.c}
+        for column in self._datetime_columns[table_name]:
+            if isinstance(values.get(column), str):
+                values[column] = datetime.fromisoformat(values[column])
+        if table_name == "users" and not values.get("hashed_password"):
+            values["hashed_password"] = RESTORED_PASSWORD_HASH
+
+        if self._pending and self._pending_table != table_name:
+            self._ready.append((self._pending_table, self._pending))
+            self._pending = []
+        self._pending_table = table_name
+        self._pending.append(values)
+        if len(self._pending) >= self.chunk_size:
+            self._ready.append((table_name, self._pending))
+            self._pending = []
+        return bool(self._ready)
+
+    def flush(self):
+        """Insert and commit the chunks that are ready, one transaction each"""
+        while self._ready:
+            table_name, rows = self._ready.pop(0)
+            table = _tables_by_name[table_name]
+            self.current_table = table_name
+            with engine.begin() as conn:
+                # executemany needs one key set per statement; backups are uniform,
+                # so this is normally a single batch
+                batch = []
+                for values in rows:
+                    if batch and values.keys() != batch[0].keys():
+                        conn.execute(table.insert(), batch)
+                        batch = []
+                    batch.append(values)
+                conn.execute(table.insert(), batch)
+            self.chunks += 1
+            self.restored[table_name] += len(rows)
+            logger.info("Restore %s: %s +%d rows (%d so far)", self.id, table_name, len(rows), self.restored[table_name])
+
+    def finish(self):
+        """Flush the last chunk and bring id sequences in line with the restored rows"""
+        if self._pending:
+            self._ready.append((self._pending_table, self._pending))
+            self._pending = []
+        self.flush()
+        with engine.begin() as conn:
+            # Rollups aren't part of the backup; derive them from what was restored
+            rebuild_user_stats(conn)
+            rebuild_daily_stats(conn)
+            rebuild_search_index(conn)
+            if conn.dialect.name == "postgresql":
+                for table in BACKUP_TABLES:
+                    conn.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                        f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+                    ))
+        if self.complete and self.expected:
+            self.complete = all(
+                self.restored.get(name, 0) + self.skipped.get(name, 0) == count
+                for name, count in self.expected.items()
+            )
+        self.status = "completed" if self.complete else "incomplete"
+        self.finished_at = datetime.utcnow()
+        self.current_table = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "resume": self.resume,
+            "chunk_size": self.chunk_size,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "current_table": self.current_table,
+            "chunks": self.chunks,
+            "restored": self.restored,
+            "skipped": self.skipped,
+            "expected": self.expected,
+            "error": self.error,
+        }
+
+def _legacy_records(document: dict) -> Iterator[tuple]:
+    for key, table_name in LEGACY_BACKUP_KEYS.items():
+        for row in sorted(document.get(key, []), key=lambda row: row.get("id") or 0):
+            yield table_name, row
+
+async def _iter_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    # Yield (table, row) pairs, plus (None, footer) once the backup is known to be complete
+    lines = iter_upload_lines(chunks)
+    try:
+        first = await lines.__anext__()
+    except StopAsyncIteration:
+        raise InvalidBackup("Backup is empty")
+    try:
+        header = json.loads(first)
+    except ValueError:
+        header = None
+
+    if not (isinstance(header, dict) and header.get("type") == "header"):
+        # Original single-document JSON backup: small by construction, parse it whole
+        body = first + b"\n" + b"\n".join([line async for line in lines])
+        try:
+            document = json.loads(body)
+        except ValueError:
+            raise InvalidBackup("Backup is neither NDJSON nor a JSON document")
+        if not isinstance(document, dict):
+            raise InvalidBackup("Backup is neither NDJSON nor a JSON document")
+        for record in _legacy_records(document):
+            yield record
+        yield None, {"type": "footer", "counts": None}
+        return
+
+    if header.get("format") != BACKUP_FORMAT or header.get("version") != BACKUP_FORMAT_VERSION:
+        raise InvalidBackup("Unsupported backup format or version")
+    async for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise InvalidBackup("Malformed line in backup")
+        if record.get("type") == "footer":
+            yield None, record
+        else:
+            yield record["table"], record["row"]
+
+async def restore_from_stream(
+    chunks: AsyncIterator[bytes],
+    resume: bool = False,
+    chunk_size: int = None,
+    on_flush: Callable[[RestoreRun], None] = None
+) -> RestoreRun:
+    """Restore a backup from a byte stream, inserting and committing it chunk by chunk.
+
+    on_flush is called after every committed chunk; an exception from it stops the restore.
+    """
+    if not _restore_lock.acquire(blocking=False):
+        raise RestoreInProgress("A restore is already running")
+    run = RestoreRun(resume=resume, chunk_size=chunk_size)
+    _restore_runs[run.id] = run
+    while len(_restore_runs) > 10:
+        _restore_runs.popitem(last=False)
+    try:
+        prepared = False
+        async for table_name, row in _iter_records(chunks):
+            # Existing data is only cleared once the header has been accepted
+            if not prepared:
+                await run_in_threadpool(run.prepare)
+                prepared = True
+            if table_name is None:
+                run.expected = row.get("counts")
+                run.complete = True
+            elif run.add(table_name, row):
+                await run_in_threadpool(run.flush)
+                if on_flush:
+                    on_flush(run)
+        if not prepared:
+            raise InvalidBackup("Backup has no records")
+        await run_in_threadpool(run.finish)
+        return run
+    except Exception as e:
+        run.status = "failed"
+        run.error = str(e)
+        run.finished_at = datetime.utcnow()
+        if isinstance(e, InvalidBackup):
+            logger.warning("Restore %s rejected: %s", run.id, e)
+        else:
+            logger.exception("Restore %s failed", run.id)
+        raise
+    finally:
+        _restore_lock.release()
+
+def get_restore_progress(restore_id: Optional[str] = None) -> Optional[dict]:
+    """Get progress of a restore run, or of the most recent one"""
+    if restore_id:
+        run = _restore_runs.get(restore_id)
+    else:
+        run = next(reversed(_restore_runs.values()), None)
+    return run.to_dict() if run else None
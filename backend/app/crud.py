@@ -1,10 +1,23 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, insert, update, case
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
+from datetime import datetime
 
 from .models import User, Subject, Question, PracticeSession, QuestionAttempt, UserEnrollment
-from .schemas import UserCreate, QuestionCreate, PracticeSessionCreate, QuestionAttemptCreate
+from .schemas import UserCreate, QuestionCreate, PracticeSessionCreate, QuestionAttemptCreate, AttemptAnswer
 from .auth import get_password_hash
+from .hashing import hash_password_async
+from .principal_cache import invalidate_principal
+from .pagination import decode_cursor, keyset_after
+from .answer_keys import answer_key_cache, SubjectAnswerKey
+from .question_pool import invalidate_question_caches, sample_question_ids
+from .adaptive import record_attempts
+from .user_stats import get_user_stats, record_session_added, record_attempts_added, record_score_changed
+from .daily_stats import record_daily_activity, today
+from .response_cache import invalidate_subject_responses
+from .search import index_documents, remove_documents
 
 # User CRUD operations
 def get_user(db: Session, user_id: int) -> Optional[User]:
@@ -15,9 +28,15 @@ def get_user_by_email(db: Session, email: str) -> Optional[User]:
     """Get user by email"""
     return db.query(User).filter(User.email == email).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    """Get all users with pagination"""
-    return db.query(User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[User]:
+    """Get all users with offset or cursor pagination, ordered by id"""
+    query = db.query(User).order_by(User.id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, (int,))
+        query = query.filter(keyset_after(db, (User.id,), (last_id,)))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def create_user(db: Session, user: UserCreate) -> User:
     """Create a new user"""
@@ -42,6 +61,7 @@ def update_user(db: Session, user_id: int, **kwargs) -> Optional[User]:
                 setattr(db_user, key, value)
         db.commit()
         db.refresh(db_user)
+        invalidate_principal(db_user.email)
     return db_user
 
 # Subject CRUD operations
@@ -57,8 +77,11 @@ def create_subject(db: Session, name: str, description: str = None) -> Subject:
     """Create a new subject"""
     db_subject = Subject(name=name, description=description)
     db.add(db_subject)
+    db.flush()
+    index_documents(db, "subject", Subject.id == db_subject.id)
     db.commit()
     db.refresh(db_subject)
+    invalidate_subject_responses(db_subject.id)
     return db_subject
 
 def delete_subject(db: Session, subject_id: int) -> bool:
@@ -66,7 +89,9 @@ def delete_subject(db: Session, subject_id: int) -> bool:
     subject = db.query(Subject).filter(Subject.id == subject_id).first()
     if subject:
         db.delete(subject)
+        remove_documents(db, "subject", subject_id)
         db.commit()
+        invalidate_subject_responses(subject_id)
         return True
     return False
 
@@ -77,20 +102,36 @@ def get_subject_by_id(db: Session, subject_id: int) -> Optional[Subject]:
 # User Enrollment CRUD operations
 def enroll_user_in_subject(db: Session, user_id: int, subject_id: int) -> Optional[UserEnrollment]:
     """Enroll a user in a subject"""
-    # Check if already enrolled
+    # Check if already enrolled (one row per user-subject pair)
     existing = db.query(UserEnrollment).filter(
         UserEnrollment.user_id == user_id,
-        UserEnrollment.subject_id == subject_id,
-        UserEnrollment.is_active == True
+        UserEnrollment.subject_id == subject_id
     ).first()
     
     if existing:
-        return existing  # Already enrolled
+        if not existing.is_active:
+            # Re-enroll by reactivating the previous enrollment
+            existing.is_active = True
+            existing.enrolled_at = func.now()
+            db.commit()
+            db.refresh(existing)
+        return existing
     
     # Create new enrollment
     enrollment = UserEnrollment(user_id=user_id, subject_id=subject_id)
     db.add(enrollment)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        # A concurrent request may have created the enrollment first; any other failure stands
+        existing = db.query(UserEnrollment).filter(
+            UserEnrollment.user_id == user_id,
+            UserEnrollment.subject_id == subject_id
+        ).first()
+        if existing is None:
+            raise
+        return existing
     db.refresh(enrollment)
     return enrollment
 
@@ -131,18 +172,22 @@ def get_question(db: Session, question_id: int) -> Optional[Question]:
     return db.query(Question).filter(Question.id == question_id).first()
 
 def get_questions_by_subject(db: Session, subject_id: int, limit: int = 10) -> List[Question]:
-    """Get questions for a specific subject"""
-    return db.query(Question).filter(
-        Question.subject_id == subject_id,
-        Question.is_active == True
-    ).limit(limit).all()
+    """Get a random selection of active questions for a specific subject"""
+    question_ids = sample_question_ids(db, subject_id, limit)
+    if not question_ids:
+        return []
+    questions = {question.id: question for question in db.query(Question).filter(Question.id.in_(question_ids))}
+    return [questions[question_id] for question_id in question_ids if question_id in questions]
 
 def create_question(db: Session, question: QuestionCreate) -> Question:
     """Create a new question"""
     db_question = Question(**question.dict())
     db.add(db_question)
+    db.flush()
+    index_documents(db, "question", Question.id == db_question.id)
     db.commit()
     db.refresh(db_question)
+    invalidate_question_caches(db_question.subject_id)
     return db_question
 
 # Practice Session CRUD operations
@@ -150,33 +195,69 @@ def create_practice_session(db: Session, session: PracticeSessionCreate, user_id
     """Create a new practice session"""
     db_session = PracticeSession(**session.dict(), user_id=user_id)
     db.add(db_session)
+    record_session_added(db, user_id, db_session.subject_id, db_session.score or 0.0)
+    record_daily_activity(
+        db, today(), db_session.subject_id,
+        sessions=1, score_sum=db_session.score or 0.0, time_sum=db_session.time_taken or 0
+    )
     db.commit()
     db.refresh(db_session)
     return db_session
 
-def get_user_practice_sessions(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[PracticeSession]:
-    """Get practice sessions for a user"""
-    return db.query(PracticeSession).filter(
-        PracticeSession.user_id == user_id
-    ).order_by(PracticeSession.completed_at.desc()).offset(skip).limit(limit).all()
+def get_user_practice_sessions(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> List[PracticeSession]:
+    """Get practice sessions for a user, newest first, with offset or cursor pagination"""
+    query = db.query(PracticeSession).filter(PracticeSession.user_id == user_id).order_by(
+        PracticeSession.completed_at.desc(), PracticeSession.id.desc()
+    )
+    if cursor:
+        query = query.filter(keyset_after(
+            db, (PracticeSession.completed_at, PracticeSession.id),
+            decode_cursor(cursor, (datetime, int)), descending=True
+        ))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def update_practice_session(db: Session, session_id: int, **kwargs) -> Optional[PracticeSession]:
     """Update practice session"""
     db_session = db.query(PracticeSession).filter(PracticeSession.id == session_id).first()
     if db_session:
+        old_score = db_session.score or 0.0
+        old_daily = (db_session.completed_at, db_session.subject_id, old_score, db_session.time_taken or 0)
         for key, value in kwargs.items():
             if hasattr(db_session, key):
                 setattr(db_session, key, value)
+        if "score" in kwargs:
+            record_score_changed(db, db_session.user_id, (db_session.score or 0.0) - old_score)
+        new_daily = (db_session.completed_at, db_session.subject_id, db_session.score or 0.0, db_session.time_taken or 0)
+        if new_daily != old_daily:
+            # Move the session's contribution, which may now fall on another day or subject
+            day, subject_id, score, time_taken = old_daily
+            record_daily_activity(db, day, subject_id, sessions=-1, score_sum=-score, time_sum=-time_taken)
+            day, subject_id, score, time_taken = new_daily
+            record_daily_activity(db, day, subject_id, sessions=1, score_sum=score, time_sum=time_taken)
         db.commit()
         db.refresh(db_session)
     return db_session
 
 # Question Attempt CRUD operations
+def get_answer_key(db: Session, subject_id: int) -> SubjectAnswerKey:
+    """Get the cached answer key used to grade a subject's questions"""
+    return answer_key_cache.get(db, subject_id)
+
 def create_question_attempt(db: Session, attempt: QuestionAttemptCreate, user_id: int) -> QuestionAttempt:
     """Create a new question attempt"""
-    # Get the question to check if answer is correct
-    question = get_question(db, attempt.question_id)
-    is_correct = question.correct_answer == attempt.selected_answer if question else False
+    # Grade against the cached answer key of the question's subject
+    subject_id = db.query(Question.subject_id).filter(Question.id == attempt.question_id).scalar()
+    is_correct = subject_id is not None and get_answer_key(db, subject_id).is_correct(
+        attempt.question_id, attempt.selected_answer
+    )
     
     db_attempt = QuestionAttempt(
         **attempt.dict(),
@@ -184,51 +265,211 @@ def create_question_attempt(db: Session, attempt: QuestionAttemptCreate, user_id
         is_correct=is_correct
     )
     db.add(db_attempt)
+    if subject_id is not None:
+        record_attempts(db, user_id, subject_id, [(attempt.question_id, is_correct)])
+    record_attempts_added(db, user_id, 1, 1 if is_correct else 0)
+    if subject_id is not None:
+        record_daily_activity(db, today(), subject_id, attempts=1)
     db.commit()
     db.refresh(db_attempt)
     return db_attempt
 
-def get_user_question_attempts(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[QuestionAttempt]:
-    """Get question attempts for a user"""
-    return db.query(QuestionAttempt).filter(
-        QuestionAttempt.user_id == user_id
-    ).order_by(QuestionAttempt.attempted_at.desc()).offset(skip).limit(limit).all()
+def create_question_attempts_batch(
+    db: Session,
+    session: PracticeSession,
+    answers: List[AttemptAnswer],
+    user_id: int
+) -> List[dict]:
+    """Grade a set of answers, insert them in one statement and update the session totals in the same transaction"""
+    answer_key = get_answer_key(db, session.subject_id)
+    missing = sorted({answer.question_id for answer in answers if answer.question_id not in answer_key})
+    if missing:
+        existing = {question_id for (question_id,) in db.query(Question.id).filter(Question.id.in_(missing))}
+        unknown = [question_id for question_id in missing if question_id not in existing]
+        if unknown:
+            raise ValueError(f"Questions not found: {', '.join(map(str, unknown))}")
+        raise ValueError(f"Questions not in this session's subject: {', '.join(map(str, missing))}")
+
+    results = []
+    rows = []
+    for answer in answers:
+        is_correct = answer_key.is_correct(answer.question_id, answer.selected_answer)
+        results.append({
+            "question_id": answer.question_id,
+            "selected_answer": answer.selected_answer,
+            "is_correct": is_correct
+        })
+        rows.append({
+            "user_id": user_id,
+            "question_id": answer.question_id,
+            "session_id": session.id,
+            "selected_answer": answer.selected_answer,
+            "is_correct": is_correct,
+            "time_taken": answer.time_taken
+        })
+    correct_count = sum(1 for result in results if result["is_correct"])
+    time_taken = sum(answer.time_taken for answer in answers)
+
+    try:
+        # Lock the session row and note its score, so the stats get the exact change
+        old_score, completed_at = db.query(PracticeSession.score, PracticeSession.completed_at).filter(
+            PracticeSession.id == session.id
+        ).with_for_update().one()
+        old_score = old_score or 0.0
+        db.execute(insert(QuestionAttempt).values(rows))
+        # Increment in SQL so concurrent batches for the same session can't lose updates
+        correct_answers = PracticeSession.correct_answers + correct_count
+        db.execute(
+            update(PracticeSession).where(PracticeSession.id == session.id).values(
+                correct_answers=correct_answers,
+                time_taken=PracticeSession.time_taken + time_taken,
+                score=correct_answers * 100.0 / case(
+                    (PracticeSession.total_questions > 0, PracticeSession.total_questions), else_=1
+                )
+            ).execution_options(synchronize_session=False)
+        )
+        record_attempts(db, user_id, session.subject_id, (
+            (result["question_id"], result["is_correct"]) for result in results
+        ))
+        new_score = select(PracticeSession.score).where(PracticeSession.id == session.id).scalar_subquery()
+        record_attempts_added(db, user_id, len(rows), correct_count, score_change=new_score - old_score)
+        record_daily_activity(db, today(), session.subject_id, attempts=len(rows))
+        record_daily_activity(
+            db, completed_at, session.subject_id, score_sum=new_score - old_score, time_sum=time_taken
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(session)
+    return results
+
+def get_user_question_attempts(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> List[QuestionAttempt]:
+    """Get question attempts for a user, newest first, with offset or cursor pagination"""
+    query = db.query(QuestionAttempt).filter(QuestionAttempt.user_id == user_id).order_by(
+        QuestionAttempt.attempted_at.desc(), QuestionAttempt.id.desc()
+    )
+    if cursor:
+        query = query.filter(keyset_after(
+            db, (QuestionAttempt.attempted_at, QuestionAttempt.id),
+            decode_cursor(cursor, (datetime, int)), descending=True
+        ))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 # Analytics and Statistics
 def get_user_statistics(db: Session, user_id: int) -> dict:
     """Get comprehensive statistics for a user"""
-    # Total practice sessions
-    total_sessions = db.query(func.count(PracticeSession.id)).filter(
-        PracticeSession.user_id == user_id
-    ).scalar()
-    
-    # Average score
-    avg_score = db.query(func.avg(PracticeSession.score)).filter(
-        PracticeSession.user_id == user_id
-    ).scalar() or 0.0
-    
-    # Total questions attempted
-    total_questions = db.query(func.count(QuestionAttempt.id)).filter(
-        QuestionAttempt.user_id == user_id
-    ).scalar()
-    
-    # Total correct answers
-    total_correct = db.query(func.count(QuestionAttempt.id)).filter(
-        QuestionAttempt.user_id == user_id,
-        QuestionAttempt.is_correct == True
-    ).scalar()
-    
-    # Subjects practiced
-    subjects_practiced = db.query(Subject.name).join(PracticeSession).filter(
-        PracticeSession.user_id == user_id
-    ).distinct().all()
-    subjects_list = [subject[0] for subject in subjects_practiced]
-    
-    return {
-        "total_sessions": total_sessions,
-        "average_score": round(avg_score, 2),
-        "total_questions_attempted": total_questions,
-        "total_correct_answers": total_correct,
-        "accuracy_rate": round((total_correct / total_questions * 100) if total_questions > 0 else 0, 2),
-        "subjects_practiced": subjects_list
-    } 
\ No newline at end of file
+    # Served from the user_stats rollups, which every session and attempt write keeps current
+    return get_user_stats(db, user_id)
+
+# Async counterparts for the hot routes served from get_async_db
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+    """Get user by email"""
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def create_user_async(db: AsyncSession, user: UserCreate) -> User:
+    """Create a new user, hashing the password on the hashing pool"""
+    hashed_password = await hash_password_async(user.password)
+    db_user = User(
+        email=user.email,
+        full_name=user.full_name,
+        hashed_password=hashed_password,
+        is_admin=user.is_admin
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def get_subjects_async(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Subject]:
+    """Get all active subjects"""
+    result = await db.execute(
+        select(Subject).where(Subject.is_active == True).offset(skip).limit(limit)
+    )
+    return list(result.scalars().all())
+
+async def get_subject_by_id_async(db: AsyncSession, subject_id: int) -> Optional[Subject]:
+    """Get subject by ID"""
+    return await db.get(Subject, subject_id)
+
+async def _get_active_enrollment_async(db: AsyncSession, user_id: int, subject_id: int) -> Optional[UserEnrollment]:
+    result = await db.execute(
+        select(UserEnrollment).where(
+            UserEnrollment.user_id == user_id,
+            UserEnrollment.subject_id == subject_id,
+            UserEnrollment.is_active == True
+        )
+    )
+    return result.scalars().first()
+
+async def enroll_user_in_subject_async(db: AsyncSession, user_id: int, subject_id: int) -> Optional[UserEnrollment]:
+    """Enroll a user in a subject"""
+    # Check if already enrolled (one row per user-subject pair)
+    result = await db.execute(
+        select(UserEnrollment).where(
+            UserEnrollment.user_id == user_id,
+            UserEnrollment.subject_id == subject_id
+        )
+    )
+    existing = result.scalars().first()
+    if existing:
+        if not existing.is_active:
+            # Re-enroll by reactivating the previous enrollment
+            existing.is_active = True
+            existing.enrolled_at = func.now()
+            await db.commit()
+            await db.refresh(existing)
+        return existing
+
+    enrollment = UserEnrollment(user_id=user_id, subject_id=subject_id)
+    db.add(enrollment)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        # A concurrent request may have created the enrollment first; any other failure stands
+        result = await db.execute(
+            select(UserEnrollment).where(
+                UserEnrollment.user_id == user_id,
+                UserEnrollment.subject_id == subject_id
+            )
+        )
+        existing = result.scalars().first()
+        if existing is None:
+            raise
+        return existing
+    await db.refresh(enrollment)
+    return enrollment
+
+async def unenroll_user_from_subject_async(db: AsyncSession, user_id: int, subject_id: int) -> bool:
+    """Remove user enrollment from a subject"""
+    enrollment = await _get_active_enrollment_async(db, user_id, subject_id)
+    if enrollment:
+        enrollment.is_active = False
+        await db.commit()
+        return True
+    return False
+
+async def get_user_enrolled_subjects_async(db: AsyncSession, user_id: int) -> List[Subject]:
+    """Get all subjects a user is enrolled in"""
+    result = await db.execute(
+        select(Subject).join(UserEnrollment).where(
+            UserEnrollment.user_id == user_id,
+            UserEnrollment.is_active == True,
+            Subject.is_active == True
+        )
+    )
+    return list(result.scalars().all())
+
+async def is_user_enrolled_async(db: AsyncSession, user_id: int, subject_id: int) -> bool:
+    """Check if user is enrolled in a specific subject"""
+    return await _get_active_enrollment_async(db, user_id, subject_id) is not None
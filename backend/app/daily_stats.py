@@ -0,0 +1,191 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import select, insert, delete, func, literal, union_all
+from sqlalchemy.orm import Session
+
+from .models import Subject, Question, PracticeSession, QuestionAttempt, DailySubjectStats
+from .user_stats import bump_rollup
+
+_daily_stats = DailySubjectStats.__table__
+
+ANALYTICS_GRANULARITIES = ("day", "week", "month")
+# Longest range one analytics request may cover (about ten years of days)
+MAX_ANALYTICS_DAYS = 3660
+
+def today() -> date:
+    """Current UTC day, the calendar the rollups are kept in"""
+    return datetime.utcnow().date()
+
+def _as_date(value) -> date:
+    # func.date() comes back as text on SQLite
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+def record_daily_activity(db: Session, day, subject_id: int, **deltas):
+    """Add to one subject's totals for a day; runs in the caller's transaction"""
+    bump_rollup(db, _daily_stats, {"day": _as_date(day or today()), "subject_id": subject_id}, **deltas)
+
+def record_daily_sessions_removed(db: Session, *criteria):
+    """Take the sessions matching criteria, and their attempts, out of the daily totals.
+
+    Call before deleting them, in the same transaction.
+    """
+    session_ids = select(PracticeSession.id).where(*criteria)
+    session_day = func.date(PracticeSession.completed_at)
+    sessions = db.query(
+        session_day, PracticeSession.subject_id, func.count(PracticeSession.id),
+        func.coalesce(func.sum(PracticeSession.score), 0.0), func.coalesce(func.sum(PracticeSession.time_taken), 0)
+    ).filter(*criteria).group_by(session_day, PracticeSession.subject_id).all()
+    attempt_day = func.date(QuestionAttempt.attempted_at)
+    attempts = db.query(
+        attempt_day, Question.subject_id, func.count(QuestionAttempt.id)
+    ).join(Question, Question.id == QuestionAttempt.question_id).filter(
+        QuestionAttempt.session_id.in_(session_ids)
+    ).group_by(attempt_day, Question.subject_id).all()
+
+    for day, subject_id, count, score_sum, time_sum in sessions:
+        record_daily_activity(db, day, subject_id, sessions=-count, score_sum=-score_sum, time_sum=-time_sum)
+    for day, subject_id, count in attempts:
+        record_daily_activity(db, day, subject_id, attempts=-count)
+
+def rebuild_daily_stats(db, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """Recompute the daily rollups for days in [start, end] (open ends mean all history).
+
+    Works on a Session or a Connection with one DELETE and one INSERT ...
+    SELECT, returning the number of rows written. The caller commits.
+    """
+    def within(day):
+        return [condition for condition in (
+            day >= start if start else None,
+            day <= end if end else None,
+        ) if condition is not None]
+
+    db.execute(delete(_daily_stats).where(*within(_daily_stats.c.day)))
+
+    session_day = func.date(PracticeSession.completed_at)
+    attempt_day = func.date(QuestionAttempt.attempted_at)
+    activity = union_all(
+        select(
+            session_day.label("day"),
+            PracticeSession.subject_id.label("subject_id"),
+            func.count(PracticeSession.id).label("sessions"),
+            literal(0).label("attempts"),
+            func.coalesce(func.sum(PracticeSession.score), 0.0).label("score_sum"),
+            func.coalesce(func.sum(PracticeSession.time_taken), 0).label("time_sum"),
+        ).where(*within(session_day)).group_by(session_day, PracticeSession.subject_id),
+        select(
+            attempt_day,
+            Question.subject_id,
+            literal(0),
+            func.count(QuestionAttempt.id),
+            literal(0.0),
+            literal(0),
+        ).join(Question, Question.id == QuestionAttempt.question_id)
+        .where(*within(attempt_day)).group_by(attempt_day, Question.subject_id),
+    ).subquery()
+    result = db.execute(insert(_daily_stats).from_select(
+        ["day", "subject_id", "sessions", "attempts", "score_sum", "time_sum"],
+        select(
+            activity.c.day,
+            activity.c.subject_id,
+            func.sum(activity.c.sessions),
+            func.sum(activity.c.attempts),
+            func.sum(activity.c.score_sum),
+            func.sum(activity.c.time_sum),
+        ).group_by(activity.c.day, activity.c.subject_id)
+    ))
+    return result.rowcount
+
+def period_start(day: date, granularity: str) -> date:
+    """First day of the day, ISO week (Monday) or month containing day"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+def _next_period(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+def _averages(sessions, score_sum, time_sum) -> dict:
+    return {
+        "average_score": round(score_sum / sessions, 2) if sessions else 0.0,
+        "average_time": round(time_sum / sessions, 2) if sessions else 0.0,
+    }
+
+def get_activity(db: Session, start: date, end: date, granularity: str = "day") -> List[dict]:
+    """Activity per day, week or month between start and end, including empty periods"""
+    rows = db.query(
+        DailySubjectStats.day,
+        func.sum(DailySubjectStats.sessions),
+        func.sum(DailySubjectStats.attempts),
+        func.sum(DailySubjectStats.score_sum),
+        func.sum(DailySubjectStats.time_sum),
+    ).filter(
+        DailySubjectStats.day >= start,
+        DailySubjectStats.day <= end
+    ).group_by(DailySubjectStats.day).all()
+
+    totals = {}
+    for day, sessions, attempts, score_sum, time_sum in rows:
+        bucket = totals.setdefault(period_start(_as_date(day), granularity), [0, 0, 0.0, 0])
+        bucket[0] += sessions or 0
+        bucket[1] += attempts or 0
+        bucket[2] += score_sum or 0.0
+        bucket[3] += time_sum or 0
+
+    activity = []
+    period = period_start(start, granularity)
+    while period <= end:
+        sessions, attempts, score_sum, time_sum = totals.get(period, (0, 0, 0.0, 0))
+        activity.append({
+            "date": period.isoformat(),
+            "sessions": sessions,
+            "attempts": attempts,
+            **_averages(sessions, score_sum, time_sum),
+        })
+        period = _next_period(period, granularity)
+    return activity
+
+def get_overall_activity(db: Session, recent_since: date) -> dict:
+    """All-time totals, plus sessions completed since recent_since"""
+    sessions, attempts, score_sum, time_sum = db.query(
+        func.coalesce(func.sum(DailySubjectStats.sessions), 0),
+        func.coalesce(func.sum(DailySubjectStats.attempts), 0),
+        func.coalesce(func.sum(DailySubjectStats.score_sum), 0.0),
+        func.coalesce(func.sum(DailySubjectStats.time_sum), 0),
+    ).one()
+    recent_sessions = db.query(func.coalesce(func.sum(DailySubjectStats.sessions), 0)).filter(
+        DailySubjectStats.day >= recent_since
+    ).scalar()
+    return {
+        "total_sessions": sessions,
+        "total_attempts": attempts,
+        **_averages(sessions, score_sum, time_sum),
+        "recent_sessions": recent_sessions,
+    }
+
+def get_subject_activity(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> List[dict]:
+    """Session count, average score and average time per subject, optionally within a date range"""
+    query = db.query(
+        Subject.name,
+        func.sum(DailySubjectStats.sessions),
+        func.sum(DailySubjectStats.score_sum),
+        func.sum(DailySubjectStats.time_sum),
+    ).join(Subject, Subject.id == DailySubjectStats.subject_id)
+    if start:
+        query = query.filter(DailySubjectStats.day >= start)
+    if end:
+        query = query.filter(DailySubjectStats.day <= end)
+    rows = query.group_by(Subject.id, Subject.name).having(func.sum(DailySubjectStats.sessions) > 0).all()
+    return [
+        {"subject": name, "session_count": sessions, **_averages(sessions, score_sum, time_sum)}
+        for name, sessions, score_sum, time_sum in rows
+    ]
@@ -0,0 +1,132 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from fastapi import HTTPException, status
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "process")  # process or thread
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_DEPTH = int(os.getenv("HASH_QUEUE_DEPTH", str(HASH_WORKERS * 8)))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "1"))
+
+# Password hashing
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_executor: Optional[Executor] = None
+_in_flight = 0
+_metrics = {
+    "completed": 0,
+    "rejected": 0,
+    "queue_wait_total_ms": 0.0,
+    "queue_wait_max_ms": 0.0,
+    "run_total_ms": 0.0,
+}
+
+# Worker functions run inside the pool and report when they actually started,
+# so the caller can tell queue wait apart from bcrypt time
+def _hash_worker(password: str) -> Tuple[str, float, float]:
+    started = time.time()
+    hashed = pwd_context.hash(password)
+    return hashed, started, time.time()
+
+def _verify_worker(plain_password: str, hashed_password: str) -> Tuple[bool, float, float]:
+    started = time.time()
+    valid = pwd_context.verify(plain_password, hashed_password)
+    return valid, started, time.time()
+
+def _thread_executor() -> Executor:
+    return ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash")
+
+def get_hash_executor() -> Executor:
+    """Get the hashing executor, creating it on first use"""
+    global _executor
+    if _executor is None:
+        if HASH_EXECUTOR == "process":
+            try:
+                _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+            except (OSError, NotImplementedError):
+                # Some platforms (e.g. AWS Lambda) have no working multiprocessing
+                _executor = _thread_executor()
+        else:
+            _executor = _thread_executor()
+    return _executor
+
+def _replace_broken_executor(broken: Executor) -> Executor:
+    """Swap a broken process pool for a thread pool, once for all the requests that hit it"""
+    global _executor
+    if _executor is broken:
+        logger.warning("Hashing process pool is broken, falling back to threads")
+        broken.shutdown(wait=False, cancel_futures=True)
+        _executor = _thread_executor()
+    return get_hash_executor()
+
+def shutdown_hash_executor():
+    """Shut down the hashing executor"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def _run(fn, *args):
+    global _in_flight
+    if _in_flight >= HASH_WORKERS + HASH_QUEUE_DEPTH:
+        _metrics["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+        )
+
+    _in_flight += 1
+    submitted = time.time()
+    try:
+        loop = asyncio.get_running_loop()
+        executor = get_hash_executor()
+        try:
+            result, started, finished = await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # A pool worker died (OOM kill, a sandbox that forbids fork); retry once on threads
+            result, started, finished = await loop.run_in_executor(_replace_broken_executor(executor), fn, *args)
+    finally:
+        _in_flight -= 1
+
+    wait_ms = max(0.0, (started - submitted) * 1000)
+    _metrics["completed"] += 1
+    _metrics["queue_wait_total_ms"] += wait_ms
+    _metrics["queue_wait_max_ms"] = max(_metrics["queue_wait_max_ms"], wait_ms)
+    _metrics["run_total_ms"] += (finished - started) * 1000
+    return result
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the hashing pool"""
+    return await _run(_hash_worker, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash on the hashing pool"""
+    return await _run(_verify_worker, plain_password, hashed_password)
+
+def get_hashing_metrics() -> dict:
+    """Get hashing pool queue and timing metrics"""
+    completed = _metrics["completed"]
+    return {
+        "executor": type(_executor).__name__ if _executor else None,
+        "workers": HASH_WORKERS,
+        "queue_depth": HASH_QUEUE_DEPTH,
+        "in_flight": _in_flight,
+        "completed": completed,
+        "rejected": _metrics["rejected"],
+        "avg_queue_wait_ms": round(_metrics["queue_wait_total_ms"] / completed, 2) if completed else 0.0,
+        "max_queue_wait_ms": round(_metrics["queue_wait_max_ms"], 2),
+        "avg_hash_time_ms": round(_metrics["run_total_ms"] / completed, 2) if completed else 0.0,
+    }
@@ -0,0 +1,689 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from .database import SessionLocal
+from .models import User, PracticeSession, QuestionAttempt, UserEnrollment, UserMastery
+from .backup import BACKUP_TABLES, iter_backup_lines, iter_gzip, restore_from_stream
+from .question_import import import_questions, iter_question_rows
+from .user_stats import record_sessions_removed, remove_user_stats
+from .daily_stats import record_daily_sessions_removed
+from .principal_cache import principal_cache, invalidate_principal
+from .answer_keys import answer_key_cache
+from .question_pool import question_pool_cache
+from .response_cache import response_cache
+from .aggregates import clear_memoized
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+JOB_BACKEND = os.getenv("JOB_BACKEND", "local")  # local (thread pool in the API process) or celery
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Uploaded inputs and result artifacts, one directory per job; shared storage when Celery workers run elsewhere
+JOB_DATA_DIR = os.getenv("JOB_DATA_DIR", "./job_data")
+# Finished jobs (and their files) are dropped after this long, or beyond JOB_HISTORY_SIZE
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "86400"))
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "100"))
+# Least seconds between progress writes (and cancellation checks) of a running job
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "0.5"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+# Redis pub/sub channel Celery workers announce cache invalidations on
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "studentlearn:cache-invalidation")
+
+JOB_KINDS = ("cleanup", "backup", "restore", "question-import")
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+CELERY_TASK_NAME = "studentlearn.run_job"
+
+_DATETIME_FIELDS = ("created_at", "started_at", "finished_at")
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested"""
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    params: dict = field(default_factory=dict)
+    status: str = "queued"
+    submitted_by: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    progress: dict = field(default_factory=dict)
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    artifact: Optional[dict] = None
+    cancel_requested: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), default=lambda value: value.isoformat())
+
+    @classmethod
+    def from_json(cls, data: str) -> "Job":
+        values = json.loads(data)
+        for name in _DATETIME_FIELDS:
+            if values.get(name):
+                values[name] = datetime.fromisoformat(values[name])
+        return cls(**values)
+
+def job_dir(job_id: str) -> str:
+    return os.path.join(JOB_DATA_DIR, job_id)
+
+def job_input_path(job_id: str) -> str:
+    return os.path.join(job_dir(job_id), "input")
+
+def _remove_files(job_id: str):
+    shutil.rmtree(job_dir(job_id), ignore_errors=True)
+
+class InMemoryJobStore:
+    """Jobs of this process, newest last; finished ones expire by age and count"""
+
+    def __init__(self, ttl_seconds: int, history_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.history_size = history_size
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, job: Job):
+        with self._lock:
+            self._jobs[job.id] = job
+        self._prune()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return Job(**job.to_dict()) if job else None
+
+    def update(self, job_id: str, **fields) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            for name, value in fields.items():
+                setattr(job, name, value)
+            return Job(**job.to_dict())
+
+    def claim(self, job_id: str) -> bool:
+        """Move a queued job to running, unless it was cancelled first"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued" or job.cancel_requested:
+                return False
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            return True
+
+    def request_cancel(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status not in FINISHED_STATUSES:
+                job.cancel_requested = True
+                if job.status == "queued":
+                    job.status = "cancelled"
+                    job.finished_at = datetime.utcnow()
+            return Job(**job.to_dict())
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return bool(job and job.cancel_requested)
+
+    def list(self) -> List[Job]:
+        self._prune()
+        with self._lock:
+            return [Job(**job.to_dict()) for job in reversed(self._jobs.values())]
+
+    def _prune(self):
+        expires_before = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        removed = []
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job.status in FINISHED_STATUSES]
+            for index, job in enumerate(finished):
+                if len(finished) - index > self.history_size or job.finished_at < expires_before:
+                    removed.append(self._jobs.pop(job.id).id)
+        for job_id in removed:
+            _remove_files(job_id)
+
+class RedisJobStore:
+    """Jobs shared by API processes and Celery workers through Redis"""
+
+    def __init__(self, url: str, ttl_seconds: int, history_size: int, key_prefix: str = "studentlearn:jobs:"):
+        import redis
+        self.ttl_seconds = ttl_seconds
+        self.history_size = history_size
+        self.key_prefix = key_prefix
+        self._client = redis.Redis.from_url(url)
+        self._index = key_prefix + "index"
+
+    def _key(self, job_id: str) -> str:
+        return self.key_prefix + job_id
+
+    def _cancel_key(self, job_id: str) -> str:
+        # Separate from the record, so a worker's progress writes can't overwrite a cancel request
+        return self.key_prefix + job_id + ":cancel"
+
+    def _save(self, job: Job):
+        ttl = self.ttl_seconds if job.status in FINISHED_STATUSES else None
+        self._client.set(self._key(job.id), job.to_json(), ex=ttl)
+
+    def create(self, job: Job):
+        self._save(job)
+        self._client.zadd(self._index, {job.id: job.created_at.timestamp()})
+        self._prune()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        data = self._client.get(self._key(job_id))
+        if data is None:
+            return None
+        job = Job.from_json(data)
+        job.cancel_requested = job.cancel_requested or bool(self._client.exists(self._cancel_key(job_id)))
+        return job
+
+    def update(self, job_id: str, **fields) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        for name, value in fields.items():
+            setattr(job, name, value)
+        self._save(job)
+        return job
+
+    def claim(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or job.status != "queued" or job.cancel_requested:
+            return False
+        self.update(job_id, status="running", started_at=datetime.utcnow())
+        return True
+
+    def request_cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status not in FINISHED_STATUSES:
+            self._client.set(self._cancel_key(job_id), 1, ex=self.ttl_seconds)
+            job.cancel_requested = True
+            if job.status == "queued":
+                job = self.update(job_id, status="cancelled", finished_at=datetime.utcnow())
+        return job
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return bool(self._client.exists(self._cancel_key(job_id)))
+
+    def list(self) -> List[Job]:
+        self._prune()
+        jobs = []
+        for job_id in self._client.zrevrange(self._index, 0, -1):
+            job = self.get(job_id.decode())
+            if job is not None:
+                jobs.append(job)
+        return jobs
+
+    def _prune(self):
+        # Records expire on their own; drop them from the index and remove their files
+        job_ids = [job_id.decode() for job_id in self._client.zrange(self._index, 0, -1)]
+        finished = []
+        for job_id in job_ids:
+            data = self._client.get(self._key(job_id))
+            if data is None:
+                self._client.zrem(self._index, job_id)
+                _remove_files(job_id)
+            elif Job.from_json(data).status in FINISHED_STATUSES:
+                finished.append(job_id)
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            self._client.delete(self._key(job_id), self._cancel_key(job_id))
+            self._client.zrem(self._index, job_id)
+            _remove_files(job_id)
+
+def _create_store():
+    if JOB_BACKEND == "celery":
+        return RedisJobStore(REDIS_URL, JOB_RESULT_TTL_SECONDS, JOB_HISTORY_SIZE)
+    return InMemoryJobStore(JOB_RESULT_TTL_SECONDS, JOB_HISTORY_SIZE)
+
+job_store = _create_store()
+
+class JobContext:
+    """What a running job uses to report progress, notice cancellation and store its artifact"""
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.params = job.params
+        self.input_path = job_input_path(job.id)
+        self.input_read = 0
+        self.input_size = None
+        self._last_report = 0.0
+
+    def progress(self, done: int = None, total: int = None, stage: str = None, force: bool = False):
+        """Record progress and raise JobCancelled if cancellation was requested, at most every JOB_PROGRESS_INTERVAL"""
+        now = time.monotonic()
+        if not force and now - self._last_report < JOB_PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        progress = {"done": done, "total": total, "stage": stage}
+        if done is not None and total:
+            progress["percent"] = round(min(done / total, 1.0) * 100, 1)
+        job_store.update(self.job.id, progress=progress)
+        if job_store.cancel_requested(self.job.id):
+            raise JobCancelled("Cancelled")
+
+    def artifact_path(self, filename: str, media_type: str) -> str:
+        """Path to write the job's result file to; it is offered for download once the job succeeds"""
+        os.makedirs(job_dir(self.job.id), exist_ok=True)
+        self.job.artifact = {"filename": filename, "media_type": media_type}
+        return os.path.join(job_dir(self.job.id), filename)
+
+    async def iter_input(self, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """The uploaded input as a byte stream, reporting how much has been read"""
+        self.input_size = os.path.getsize(self.input_path)
+        with open(self.input_path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                self.input_read += len(chunk)
+                self.progress(self.input_read, self.input_size, "reading input")
+                yield chunk
+
+_job_functions: Dict[str, Callable[[JobContext], dict]] = {}
+
+def job(kind: str):
+    """Register the function that runs jobs of a kind; it returns the job's result"""
+    def decorate(fn):
+        _job_functions[kind] = fn
+        return fn
+    return decorate
+
+def run_job(job_id: str):
+    """Run a queued job to completion; called by the local executor or a Celery worker"""
+    if not job_store.claim(job_id):
+        return
+    job = job_store.get(job_id)
+    ctx = JobContext(job)
+    logger.info("Job %s (%s) started", job_id, job.kind)
+    try:
+        result = _job_functions[job.kind](ctx)
+        fields = {"status": "succeeded", "result": result}
+        # Progress writes are throttled, so the last one may predate the end
+        progress = job_store.get(job_id).progress
+        if progress.get("total"):
+            fields["progress"] = {**progress, "done": progress["total"], "percent": 100.0}
+        if ctx.job.artifact:
+            path = os.path.join(job_dir(job_id), ctx.job.artifact["filename"])
+            fields["artifact"] = {**ctx.job.artifact, "size": os.path.getsize(path)}
+    except JobCancelled as e:
+        fields = {"status": "cancelled", "error": str(e)}
+    except ValueError as e:
+        # Rejected input, like a malformed backup or an empty import
+        logger.warning("Job %s (%s) rejected: %s", job_id, job.kind, e)
+        fields = {"status": "failed", "error": str(e)}
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job_id, job.kind)
+        fields = {"status": "failed", "error": str(e)}
+    if fields["status"] != "succeeded":
+        _remove_files(job_id)
+    elif os.path.exists(ctx.input_path):
+        os.remove(ctx.input_path)
+    job_store.update(job_id, finished_at=datetime.utcnow(), **fields)
+    logger.info("Job %s (%s) %s", job_id, job.kind, fields["status"])
+
+class LocalJobExecutor:
+    """Runs jobs on a thread pool in this process, for single-box deployments and tests"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: str):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            future = self._executor.submit(run_job, job_id)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._futures.pop(job_id, None))
+
+    def cancel(self, job_id: str):
+        # Only a job still waiting for a thread can be withdrawn; a running one stops at its next progress report
+        future = self._futures.get(job_id)
+        if future is not None:
+            future.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+class CeleryJobExecutor:
+    """Hands jobs to Celery workers (celery -A app.jobs:celery_app worker)"""
+
+    def __init__(self, celery):
+        self.celery = celery
+
+    def submit(self, job_id: str):
+        self.celery.send_task(CELERY_TASK_NAME, args=[job_id], task_id=job_id)
+
+    def cancel(self, job_id: str):
+        try:
+            self.celery.control.revoke(job_id)
+        except Exception as e:
+            logger.warning("Job %s revoke failed: %s", job_id, e)
+
+    def shutdown(self):
+        pass
+
+def _create_celery_app():
+    from celery import Celery
+    celery = Celery("studentlearn", broker=CELERY_BROKER_URL)
+    celery.conf.update(
+        # Job state lives in the job store, not a Celery result backend
+        task_ignore_result=True,
+        # Jobs run for minutes; don't let one worker reserve several
+        worker_prefetch_multiplier=1,
+    )
+    celery.task(name=CELERY_TASK_NAME)(run_job)
+    return celery
+
+celery_app = _create_celery_app() if JOB_BACKEND == "celery" else None
+job_executor = CeleryJobExecutor(celery_app) if celery_app is not None else LocalJobExecutor(JOB_WORKERS)
+
+async def submit_job(kind: str, params: dict = None, submitted_by: str = None,
+                     upload: AsyncIterator[bytes] = None) -> Job:
+    """Queue a job, first saving its uploaded input when there is one"""
+    job = Job(id=uuid.uuid4().hex, kind=kind, params=params or {}, submitted_by=submitted_by)
+    if upload is not None:
+        os.makedirs(job_dir(job.id), exist_ok=True)
+        try:
+            with open(job_input_path(job.id), "wb") as f:
+                async for chunk in upload:
+                    await run_in_threadpool(f.write, chunk)
+        except BaseException:
+            _remove_files(job.id)
+            raise
+    job_store.create(job)
+    job_executor.submit(job.id)
+    return job
+
+def get_job(job_id: str) -> Optional[Job]:
+    return job_store.get(job_id)
+
+def list_jobs(kind: Optional[str] = None, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+    """Jobs newest first, optionally of one kind or status"""
+    jobs = [
+        job for job in job_store.list()
+        if (kind is None or job.kind == kind) and (status is None or job.status == status)
+    ]
+    return jobs[:limit]
+
+def cancel_job(job_id: str) -> Optional[Job]:
+    """Cancel a queued job now, or ask a running one to stop at its next progress report"""
+    job = job_store.request_cancel(job_id)
+    if job is not None and job.status == "cancelled":
+        job_executor.cancel(job_id)
+    return job
+
+def job_artifact_path(job: Job) -> Optional[str]:
+    if job.status != "succeeded" or not job.artifact:
+        return None
+    path = os.path.join(job_dir(job.id), job.artifact["filename"])
+    return path if os.path.exists(path) else None
+
+async def iter_job_events(job_id: str, poll_seconds: float = 0.5, keepalive_seconds: float = 15.0) -> AsyncIterator[str]:
+    """Server-sent events with the job's state whenever it changes, ending once it finishes"""
+    last = None
+    last_sent = time.monotonic()
+    while True:
+        job = await run_in_threadpool(job_store.get, job_id)
+        if job is None:
+            return
+        data = job.to_json()
+        if data != last:
+            last = data
+            last_sent = time.monotonic()
+            yield f"event: {job.status}\ndata: {data}\n\n"
+        elif time.monotonic() - last_sent >= keepalive_seconds:
+            last_sent = time.monotonic()
+            yield ": keepalive\n\n"
+        if job.status in FINISHED_STATUSES:
+            return
+        await asyncio.sleep(poll_seconds)
+
+def shutdown_job_executor():
+    job_executor.shutdown()
+
+# Admin jobs
+
+def clear_data_caches():
+    """Drop every cache derived from database rows, after the rows were replaced wholesale"""
+    principal_cache.clear()
+    answer_key_cache.clear()
+    question_pool_cache.clear()
+    response_cache.clear()
+    clear_memoized()
+
+def clear_question_caches():
+    """Drop every subject's question pool and answer key, after questions were added in bulk"""
+    question_pool_cache.clear()
+    answer_key_cache.clear()
+    clear_memoized()
+
+# What each published invalidation clears in an API process
+CACHE_INVALIDATIONS = {
+    "data": clear_data_caches,
+    "questions": clear_question_caches,
+    "stats": clear_memoized,
+}
+
+_invalidation_client = None
+
+def publish_cache_invalidation(scope: str):
+    """Clear this process's caches and, when jobs run in Celery workers, the API processes' too.
+
+    Answer keys, question pools and admin counters only ever live in process
+    memory, so a worker clearing its own copies leaves the API's untouched.
+    """
+    global _invalidation_client
+    CACHE_INVALIDATIONS[scope]()
+    if JOB_BACKEND != "celery":
+        return
+    try:
+        if _invalidation_client is None:
+            import redis
+            _invalidation_client = redis.Redis.from_url(REDIS_URL)
+        _invalidation_client.publish(CACHE_INVALIDATION_CHANNEL, scope)
+    except Exception as e:
+        logger.error("Cache invalidation %r not published; API caches stay stale until they expire: %s", scope, e)
+
+class CacheInvalidationListener:
+    """Applies invalidations published by Celery workers to this API process's caches"""
+
+    def __init__(self, client, channel: str = None):
+        self.client = client
+        self.channel = channel or CACHE_INVALIDATION_CHANNEL
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                # Anything published while not subscribed was missed, so start from empty caches
+                clear_data_caches()
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    scope = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+                    if scope in CACHE_INVALIDATIONS:
+                        CACHE_INVALIDATIONS[scope]()
+            except Exception as e:
+                logger.warning("Cache invalidation listener disconnected: %s", e)
+                self._stop.wait(1.0)
+            finally:
+                pubsub.close()
+
+_invalidation_listener: Optional[CacheInvalidationListener] = None
+
+def start_cache_invalidation_listener():
+    """Follow invalidations from Celery workers; API processes call this on startup"""
+    global _invalidation_listener
+    if JOB_BACKEND != "celery" or _invalidation_listener is not None:
+        return
+    import redis
+    _invalidation_listener = CacheInvalidationListener(redis.Redis.from_url(REDIS_URL))
+    _invalidation_listener.start()
+
+def stop_cache_invalidation_listener():
+    global _invalidation_listener
+    if _invalidation_listener is not None:
+        _invalidation_listener.stop()
+        _invalidation_listener = None
+
+def system_cleanup(db, ctx: Optional[JobContext] = None) -> dict:
+    """Delete inactive users (older than 90 days) and practice sessions older than a year, in one transaction.
+
+    Each table is cleared with one set-based DELETE whose WHERE selects the
+    doomed users or sessions, so the statement count doesn't grow with them.
+    """
+    cleanup_results = {}
+
+    ninety_days_ago = datetime.utcnow() - timedelta(days=90)
+    inactive = (User.is_active == False, User.updated_at <= ninety_days_ago)
+    inactive_user_ids = select(User.id).where(*inactive)
+    if ctx:
+        ctx.progress(0, 2, "inactive users", force=True)
+
+    # Their history goes with them; practice_sessions.user_id can't be left pointing nowhere
+    emails = [email for email, in db.query(User.email).filter(*inactive)]
+    record_daily_sessions_removed(db, PracticeSession.user_id.in_(inactive_user_ids))
+    for model in (QuestionAttempt, PracticeSession, UserEnrollment, UserMastery):
+        db.query(model).filter(model.user_id.in_(inactive_user_ids)).delete(synchronize_session=False)
+    remove_user_stats(db, inactive_user_ids)
+    cleanup_results["deleted_inactive_users"] = db.query(User).filter(*inactive).delete(synchronize_session=False)
+    for email in emails:
+        invalidate_principal(email)
+
+    one_year_ago = datetime.utcnow() - timedelta(days=365)
+    old = PracticeSession.completed_at <= one_year_ago
+    if ctx:
+        ctx.progress(1, 2, "old sessions", force=True)
+
+    record_sessions_removed(db, old)
+    record_daily_sessions_removed(db, old)
+    # Related attempts first
+    db.query(QuestionAttempt).filter(
+        QuestionAttempt.session_id.in_(select(PracticeSession.id).where(old))
+    ).delete(synchronize_session=False)
+    cleanup_results["deleted_old_sessions"] = db.query(PracticeSession).filter(old).delete(synchronize_session=False)
+    if ctx:
+        ctx.progress(2, 2, "old sessions", force=True)
+
+    db.commit()
+    # Admin dashboard counters would otherwise still include the deleted rows until they expire
+    publish_cache_invalidation("stats")
+    return cleanup_results
+
+@job("cleanup")
+def cleanup_job(ctx: JobContext) -> dict:
+    db = SessionLocal()
+    try:
+        return system_cleanup(db, ctx)
+    except BaseException:
+        # Nothing is committed until the end, so a cancelled cleanup deletes nothing
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+@job("backup")
+def backup_job(ctx: JobContext) -> dict:
+    compress = bool(ctx.params.get("compress"))
+    filename = f"studentlearn-backup-{ctx.job.created_at.strftime('%Y%m%dT%H%M%S')}.ndjson" + (".gz" if compress else "")
+    path = ctx.artifact_path(filename, "application/gzip" if compress else "application/x-ndjson")
+    with SessionLocal() as db:
+        total = sum(db.query(table).count() for table in BACKUP_TABLES)
+    rows = 0
+
+    def counted_lines():
+        nonlocal rows
+        for chunk in iter_backup_lines():
+            rows += chunk.count("\n")
+            ctx.progress(rows, total + 2, "exporting")
+            yield chunk
+
+    chunks = iter_gzip(counted_lines()) if compress else (chunk.encode() for chunk in counted_lines())
+    with open(path, "wb") as f:
+        for data in chunks:
+            f.write(data)
+    # Header and footer lines aren't rows
+    return {"filename": filename, "rows": rows - 2}
+
+@job("restore")
+def restore_job(ctx: JobContext) -> dict:
+    try:
+        run = asyncio.run(restore_from_stream(
+            ctx.iter_input(), resume=bool(ctx.params.get("resume")), chunk_size=ctx.params.get("chunk_size"),
+            on_flush=lambda run: ctx.progress(ctx.input_read, ctx.input_size, f"restoring {run.current_table}")
+        ))
+    except JobCancelled:
+        raise JobCancelled("Cancelled; the database holds a partial restore, submit the backup again with resume=true")
+    finally:
+        publish_cache_invalidation("data")
+    if run.status != "completed":
+        return {"message": "Backup ended early; submit it again with resume=true to continue", "restore": run.to_dict()}
+    return {"message": "System restored successfully", "restore": run.to_dict()}
+
+@job("question-import")
+def question_import_job(ctx: JobContext) -> dict:
+    db = SessionLocal()
+    try:
+        report = asyncio.run(import_questions(
+            db, iter_question_rows(ctx.params.get("content_type", ""), ctx.iter_input()),
+            on_flush=lambda question_import: ctx.progress(
+                ctx.input_read, ctx.input_size, f"imported {question_import.created_count} questions"
+            )
+        ))
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        # Chunks are committed as they go, so even a failed import may have added questions
+        publish_cache_invalidation("questions")
+    # The summary stays small; every failed row is in the downloadable report
+    with open(ctx.artifact_path("import-report.json", "application/json"), "w") as f:
+        json.dump(report, f)
+    return {key: value for key, value in report.items() if key != "failed_questions"}
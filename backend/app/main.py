@@ -1,25 +1,44 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Body
+from fastapi import FastAPI, Depends, HTTPException, status, Body, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from datetime import date, datetime, timedelta
 
 import os
 from dotenv import load_dotenv
 
-from app.database import get_db, engine
-from app.models import Base, SubjectContent, Lesson, User, Subject, Question, PracticeSession, QuestionAttempt, UserEnrollment
-from app.schemas import UserCreate, UserResponse, LoginRequest, TokenResponse, SubjectResponse, SubjectContentResponse, LessonResponse, LessonCreate, QuestionResponse, QuestionCreate, QuestionWithAnswer
-from app.auth import create_access_token, get_current_user, authenticate_user, get_password_hash
-from app.crud import create_user, get_user_by_email, get_users, get_subjects, create_subject, delete_subject, get_subject_by_id, enroll_user_in_subject, unenroll_user_from_subject, get_user_enrolled_subjects, is_user_enrolled, get_user, update_user, get_user_statistics, create_question, get_question
-from sqlalchemy import func
+from app.database import get_db, get_async_db, engine, get_pool_metrics
+from app.slow_queries import SLOW_QUERY_SORT_FIELDS, slow_query_log
+from app.request_metrics import RequestMetricsMiddleware, SLOW_REQUEST_MS, metrics_authorized, request_metrics, render_prometheus
+from app.query_budget import query_budget
+from app.migrations import upgrade_database
+from app.models import Base, SubjectContent, Lesson, User, Subject, Question, PracticeSession, QuestionAttempt, UserEnrollment, UserStats
+from app.schemas import UserCreate, UserResponse, LoginRequest, TokenResponse, SubjectResponse, SubjectContentResponse, LessonResponse, LessonCreate, QuestionResponse, QuestionCreate, QuestionWithAnswer, AttemptBatchCreate, AttemptBatchResponse
+from app.hashing import shutdown_hash_executor, get_hashing_metrics
+from app.question_pool import invalidate_question_caches, parse_difficulty_mix, get_recent_question_ids, sample_question_ids
+from app.adaptive import select_adaptive_question_ids
+from app.user_stats import record_sessions_removed
+from app.response_cache import response_cache, get_or_build, conditional_response, invalidate_responses, invalidate_subject_responses, library_courses_key, subject_detail_key, subject_contents_key, content_lessons_key
+from app.search import SEARCH_KINDS, index_documents, search_documents
+from app.daily_stats import ANALYTICS_GRANULARITIES, MAX_ANALYTICS_DAYS, get_activity, get_overall_activity, get_subject_activity, record_daily_sessions_removed, today
+from app.serializers import enrollment_rows_query, practice_session_rows_query, serialize_enrollment_row, serialize_practice_session_row
+from app.question_import import InvalidImport, import_questions, iter_question_rows
+from app.backup import stream_backup, restore_from_stream, get_restore_progress, RestoreInProgress, InvalidBackup
+from app.jobs import JOB_KINDS, JOB_STATUSES, FINISHED_STATUSES, submit_job, get_job, list_jobs, cancel_job, job_artifact_path, iter_job_events, shutdown_job_executor, system_cleanup, clear_data_caches, start_cache_invalidation_listener, stop_cache_invalidation_listener
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, keyset_after, next_cursor
+from app.aggregates import get_system_counters, get_subject_analytics, SUBJECT_ANALYTICS_SORT_FIELDS
+from app.auth import create_access_token, get_current_user, get_optional_user, get_current_user_async, authenticate_user, authenticate_user_async, get_password_hash
+from app.crud import create_user, get_user_by_email, get_users, get_subjects, create_subject, delete_subject, get_subject_by_id, enroll_user_in_subject, unenroll_user_from_subject, get_user_enrolled_subjects, is_user_enrolled, get_user, update_user, get_user_statistics, create_question, get_question, create_question_attempts_batch
+from app.crud import get_user_by_email_async, create_user_async, get_subjects_async, get_subject_by_id_async, enroll_user_in_subject_async, unenroll_user_from_subject_async, get_user_enrolled_subjects_async, is_user_enrolled_async
+from sqlalchemy import func, text
 
 # Load environment variables
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(
     title="StudentLearn API",
     description="Backend API for StudentLearn - Smart Practice Platform",
@@ -35,10 +54,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+# Added last so it is outermost and times everything, including CORS handling
+app.add_middleware(RequestMetricsMiddleware)
+
 security = HTTPBearer()
 
+def set_next_cursor(response: Response, cursor: Optional[str]):
+    """Expose the cursor for the next page of a list response"""
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
+def check_pagination(skip: int, cursor: Optional[str]):
+    """Reject requests mixing offset and cursor pagination"""
+    if cursor and skip:
+        raise HTTPException(status_code=400, detail="Use either skip or cursor, not both")
+
+@app.on_event("startup")
+async def startup():
+    # Apply pending migrations (workers take turns on a migration lock); disable
+    # with AUTO_MIGRATE=false when the deploy runs `alembic upgrade head` instead
+    if os.getenv("AUTO_MIGRATE", "true").lower() == "true":
+        upgrade_database()
+    start_cache_invalidation_listener()
+
+@app.on_event("shutdown")
+async def shutdown():
+    shutdown_hash_executor()
+    shutdown_job_executor()
+    stop_cache_invalidation_listener()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to StudentLearn API", "status": "running"}
@@ -48,10 +95,10 @@ async def health_check():
     return {"status": "healthy", "service": "studentlearn-api"}
 
 @app.post("/auth/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if user already exists
-    existing_user = get_user_by_email(db, user_data.email)
+    existing_user = await get_user_by_email_async(db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -59,13 +106,14 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
 
     # Create new user
-    user = create_user(db, user_data)
+    user = await create_user_async(db, user_data)
     return user
 
 @app.post("/auth/login", response_model=TokenResponse)
-async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+@query_budget(1)
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """Login user and return access token"""
-    user = authenticate_user(db, login_data.email, login_data.password)
+    user = await authenticate_user_async(db, login_data.email, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -83,7 +131,7 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/api/login")
-async def api_login(data: dict = Body(...), db: Session = Depends(get_db)):
+async def api_login(data: dict = Body(...), db: AsyncSession = Depends(get_async_db)):
     """API login endpoint for NextAuth integration"""
     email = data.get("email")
     password = data.get("password")
@@ -91,7 +139,7 @@ async def api_login(data: dict = Body(...), db: Session = Depends(get_db)):
     if not email or not password:
         raise HTTPException(status_code=400, detail="Email and password are required")
     
-    user = authenticate_user(db, email, password)
+    user = await authenticate_user_async(db, email, password)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
@@ -111,10 +159,12 @@ async def api_login(data: dict = Body(...), db: Session = Depends(get_db)):
     }
 
 @app.get("/auth/me", response_model=UserResponse)
+@query_budget(1)
 async def get_current_user_info(current_user = Depends(get_current_user)):
     return UserResponse.from_orm(current_user)
 
 @app.get("/practice/subjects")
+@query_budget(0)
 async def get_practice_subjects():
     """Get available practice subjects"""
     return {
@@ -128,28 +178,72 @@ async def get_practice_subjects():
     }
 
 @app.get("/practice/questions/{subject_id}")
-async def get_practice_questions(subject_id: int, limit: int = 10):
-    """Get practice questions for a specific subject"""
-    # Mock questions - in real app, fetch from database
-    questions = [
-        {
-            "id": 1,
-            "question": "What is the derivative of x²?",
-            "options": ["x", "2x", "x²", "2x²"],
-            "correct_answer": 1,
-            "explanation": "The derivative of x² is 2x using the power rule."
-        },
-        {
-            "id": 2,
-            "question": "Solve for x: 2x + 5 = 13",
-            "options": ["3", "4", "5", "6"],
-            "correct_answer": 1,
-            "explanation": "2x + 5 = 13 → 2x = 8 → x = 4"
-        }
-    ]
-    return {"questions": questions[:limit]}
+@query_budget(5)
+async def get_practice_questions(
+    subject_id: int,
+    limit: int = 10,
+    difficulty: Optional[str] = None,
+    mix: Optional[str] = None,
+    exclude_recent: bool = True,
+    mode: str = "random",
+    db: Session = Depends(get_db),
+    current_user = Depends(get_optional_user)
+):
+    """Get a random or adaptive set of practice questions for a specific subject"""
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    if difficulty and mix:
+        raise HTTPException(status_code=400, detail="Use either difficulty or mix, not both")
+    if mode not in ("random", "adaptive"):
+        raise HTTPException(status_code=400, detail="mode must be random or adaptive")
+    if mode == "adaptive":
+        if not current_user:
+            raise HTTPException(status_code=401, detail="Adaptive practice requires signing in")
+        if difficulty or mix:
+            raise HTTPException(status_code=400, detail="Adaptive mode picks difficulty itself; drop difficulty and mix")
+    
+    try:
+        difficulty_mix = parse_difficulty_mix(mix or f"{difficulty}=1") if (mix or difficulty) else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Signed-in users get questions they haven't seen lately, when the subject has enough
+    exclude = get_recent_question_ids(db, current_user.id) if current_user and exclude_recent else None
+    extra = {}
+    if mode == "adaptive":
+        # Questions rated where the user's estimated chance of success is on target
+        ability, question_ids = select_adaptive_question_ids(db, current_user.id, subject_id, limit, exclude=exclude)
+        extra["ability"] = round(ability, 3)
+    else:
+        question_ids = sample_question_ids(db, subject_id, limit, difficulty_mix=difficulty_mix, exclude=exclude)
+    if not question_ids:
+        if not get_subject_by_id(db, subject_id):
+            raise HTTPException(status_code=404, detail="Subject not found")
+        return {"questions": [], **extra}
+    
+    rows = {row.id: row for row in db.query(
+        Question.id, Question.question_text, Question.option_a, Question.option_b, Question.option_c,
+        Question.option_d, Question.correct_answer, Question.explanation, Question.difficulty_level
+    ).filter(Question.id.in_(question_ids))}
+    
+    questions = []
+    for question_id in question_ids:
+        row = rows.get(question_id)
+        if row is None:
+            continue
+        answer = (row.correct_answer or "").strip().upper()
+        questions.append({
+            "id": row.id,
+            "question": row.question_text,
+            "options": [row.option_a, row.option_b, row.option_c, row.option_d],
+            "correct_answer": "ABCD".index(answer) if answer in ("A", "B", "C", "D") else None,
+            "explanation": row.explanation,
+            "difficulty_level": row.difficulty_level
+        })
+    return {"questions": questions, **extra}
 
 @app.get("/users", response_model=List[UserResponse])
+@query_budget(2)
 async def list_users(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -161,27 +255,71 @@ async def list_users(
 
 # Public endpoint for library courses
 @app.get("/library/courses", response_model=List[SubjectResponse])
-async def get_library_courses(db: Session = Depends(get_db)):
+@query_budget(1)
+async def get_library_courses(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Get all active subjects/courses for the library page (public endpoint)"""
-    return get_subjects(db)
+    async def build():
+        return [SubjectResponse.model_validate(subject) for subject in await get_subjects_async(db)]
+    cached = await get_or_build(library_courses_key(), build)
+    return conditional_response(request, cached, public=True)
+
+# Search subjects and questions (public; admins also search course material)
+@app.get("/search")
+@query_budget(2)
+async def search(
+    q: str,
+    kind: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_optional_user)
+):
+    """Full-text search over subjects and questions (admins also get contents and lessons)"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    if kind and kind not in SEARCH_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(SEARCH_KINDS)}")
+    
+    is_admin = bool(current_user and current_user.is_admin)
+    # Course material is only served to admins elsewhere, so only they can find it here
+    visible = SEARCH_KINDS if is_admin else ("subject", "question")
+    if kind and kind not in visible:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        results, has_more = search_documents(
+            db, q, [kind] if kind else visible, active_only=not is_admin, limit=limit, offset=offset
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search: {str(e)}")
+    return {"query": q, "results": results, "next_offset": offset + limit if has_more else None}
 
 # Get a single subject by ID
 @app.get("/subjects/{subject_id}", response_model=SubjectResponse)
+@query_budget(2)
 async def get_subject(
     subject_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Get details of a specific subject/course"""
-    db_subject = get_subject_by_id(db, subject_id=subject_id)
-    if db_subject is None:
-        raise HTTPException(status_code=404, detail="Subject not found")
+    cached = response_cache.get(subject_detail_key(subject_id))
+    if cached is None:
+        db_subject = get_subject_by_id(db, subject_id=subject_id)
+        if db_subject is None:
+            raise HTTPException(status_code=404, detail="Subject not found")
+        cached = await get_or_build(subject_detail_key(subject_id), lambda: SubjectResponse.model_validate(db_subject))
     
     # Check if subject is active or user is admin
-    if not db_subject.is_active and not current_user.is_admin:
+    if not cached.data["is_active"] and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="This course is not available")
         
-    return db_subject
+    return conditional_response(request, cached)
 
 @app.post("/library/courses", response_model=SubjectResponse)
 async def create_library_course(
@@ -210,6 +348,7 @@ async def create_library_course(
         raise HTTPException(status_code=400, detail=f"Failed to create course: {str(e)}")
 
 @app.get("/subjects", response_model=List[SubjectResponse])
+@query_budget(2)
 async def list_subjects(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -267,21 +406,34 @@ async def add_content(subject_id: int, content: dict, db: Session = Depends(get_
         raise HTTPException(status_code=403, detail="Not authorized")
     new_content = SubjectContent(subject_id=subject_id, title=content["title"], body=content["body"])
     db.add(new_content)
+    db.flush()
+    index_documents(db, "content", SubjectContent.id == new_content.id)
     db.commit()
     db.refresh(new_content)
+    invalidate_responses(subject_contents_key(subject_id))
     return new_content
 
 @app.get("/subjects/{subject_id}/contents")
-async def get_contents(subject_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+@query_budget(2)
+async def get_contents(subject_id: int, request: Request, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return db.query(SubjectContent).filter(SubjectContent.subject_id == subject_id).all()
+    cached = await get_or_build(subject_contents_key(subject_id), lambda: [
+        SubjectContentResponse.model_validate(content)
+        for content in db.query(SubjectContent).filter(SubjectContent.subject_id == subject_id).all()
+    ])
+    return conditional_response(request, cached)
 
 @app.get("/contents/{content_id}/lessons", response_model=List[LessonResponse])
-async def get_lessons(content_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+@query_budget(2)
+async def get_lessons(content_id: int, request: Request, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return db.query(Lesson).filter(Lesson.content_id == content_id).all()
+    cached = await get_or_build(content_lessons_key(content_id), lambda: [
+        LessonResponse.model_validate(lesson)
+        for lesson in db.query(Lesson).filter(Lesson.content_id == content_id).all()
+    ])
+    return conditional_response(request, cached)
 
 @app.post("/contents/{content_id}/lessons", response_model=LessonResponse)
 async def add_lesson(content_id: int, lesson: LessonCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
@@ -289,20 +441,23 @@ async def add_lesson(content_id: int, lesson: LessonCreate, db: Session = Depend
         raise HTTPException(status_code=403, detail="Not authorized")
     new_lesson = Lesson(content_id=content_id, title=lesson.title, body=lesson.body)
     db.add(new_lesson)
+    db.flush()
+    index_documents(db, "lesson", Lesson.id == new_lesson.id)
     db.commit()
     db.refresh(new_lesson)
+    invalidate_responses(content_lessons_key(content_id))
     return new_lesson
 
 # User Enrollment Endpoints
 @app.post("/enrollments/{subject_id}")
 async def enroll_in_subject(
     subject_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
 ):
     """Enroll current user in a subject"""
     # Check if subject exists
-    subject = get_subject_by_id(db, subject_id)
+    subject = await get_subject_by_id_async(db, subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
     
@@ -310,7 +465,7 @@ async def enroll_in_subject(
         raise HTTPException(status_code=400, detail="Subject is not active")
     
     try:
-        enrollment = enroll_user_in_subject(db, current_user.id, subject_id)
+        enrollment = await enroll_user_in_subject_async(db, current_user.id, subject_id)
         return {
             "message": "Successfully enrolled in course",
             "subject_name": subject.name,
@@ -322,12 +477,12 @@ async def enroll_in_subject(
 @app.delete("/enrollments/{subject_id}")
 async def unenroll_from_subject(
     subject_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
 ):
     """Remove current user's enrollment from a subject"""
     try:
-        success = unenroll_user_from_subject(db, current_user.id, subject_id)
+        success = await unenroll_user_from_subject_async(db, current_user.id, subject_id)
         if success:
             return {"message": "Successfully unenrolled from course"}
         else:
@@ -336,45 +491,84 @@ async def unenroll_from_subject(
         raise HTTPException(status_code=400, detail=f"Failed to unenroll: {str(e)}")
 
 @app.get("/my-courses", response_model=List[SubjectResponse])
+@query_budget(2)
 async def get_my_enrolled_courses(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
 ):
     """Get all courses the current user is enrolled in"""
     try:
-        enrolled_subjects = get_user_enrolled_subjects(db, current_user.id)
+        enrolled_subjects = await get_user_enrolled_subjects_async(db, current_user.id)
         return enrolled_subjects
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch enrolled courses: {str(e)}")
 
 @app.get("/enrollments/check/{subject_id}")
+@query_budget(2)
 async def check_enrollment_status(
     subject_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
 ):
     """Check if current user is enrolled in a specific subject"""
     try:
-        is_enrolled = is_user_enrolled(db, current_user.id, subject_id)
+        is_enrolled = await is_user_enrolled_async(db, current_user.id, subject_id)
         return {"is_enrolled": is_enrolled}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to check enrollment: {str(e)}")
 
+# Practice sessions
+
+@app.post("/practice-sessions/{session_id}/attempts:batch", response_model=AttemptBatchResponse)
+@query_budget(20)
+async def submit_attempts_batch(
+    session_id: int,
+    batch: AttemptBatchCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Grade and record a set of answers for one of the current user's practice sessions"""
+    session = db.query(PracticeSession).filter(
+        PracticeSession.id == session_id,
+        PracticeSession.user_id == current_user.id
+    ).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Practice session not found")
+    
+    try:
+        results = create_question_attempts_batch(db, session, batch.answers, current_user.id)
+        return {"session": session, "results": results}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to submit answers: {str(e)}")
+
 # Admin Functions
 
 @app.get("/admin/users", response_model=List[UserResponse])
+@query_budget(2)
 async def admin_list_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Get all users (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
-    return get_users(db, skip=skip, limit=limit)
+    check_pagination(skip, cursor)
+    
+    try:
+        users = get_users(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor(users, limit, "id"))
+    return users
 
 @app.get("/admin/users/{user_id}", response_model=UserResponse)
+@query_budget(2)
 async def admin_get_user(
     user_id: int,
     db: Session = Depends(get_db),
@@ -442,6 +636,7 @@ async def admin_delete_user(
         raise HTTPException(status_code=400, detail=f"Failed to deactivate user: {str(e)}")
 
 @app.get("/admin/statistics")
+@query_budget(6)
 async def admin_get_statistics(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -451,57 +646,32 @@ async def admin_get_statistics(
         raise HTTPException(status_code=403, detail="Admin access required")
     
     try:
-        # Total users
-        total_users = db.query(func.count(User.id)).scalar()
-        active_users = db.query(func.count(User.id)).filter(User.is_active == True).scalar()
-        admin_users = db.query(func.count(User.id)).filter(User.is_admin == True).scalar()
-        
-        # Total subjects and questions
-        total_subjects = db.query(func.count(Subject.id)).scalar()
-        active_subjects = db.query(func.count(Subject.id)).filter(Subject.is_active == True).scalar()
-        total_questions = db.query(func.count(Question.id)).scalar()
-        
-        # Total practice sessions
-        total_sessions = db.query(func.count(PracticeSession.id)).scalar()
-        total_attempts = db.query(func.count(QuestionAttempt.id)).scalar()
-        
-        # Average scores
-        avg_score = db.query(func.avg(PracticeSession.score)).scalar() or 0.0
-        
-        # Recent activity (last 7 days)
-        from datetime import datetime, timedelta
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_sessions = db.query(func.count(PracticeSession.id)).filter(
-            PracticeSession.completed_at >= week_ago
-        ).scalar()
-        
-        recent_users = db.query(func.count(User.id)).filter(
-            User.created_at >= week_ago
-        ).scalar()
+        counters = get_system_counters(db)
         
         return {
             "users": {
-                "total": total_users,
-                "active": active_users,
-                "admins": admin_users,
-                "recent_registrations": recent_users
+                "total": counters["users"]["total"],
+                "active": counters["users"]["active"],
+                "admins": counters["users"]["admins"],
+                "recent_registrations": counters["users"]["new_7d"]
             },
             "content": {
-                "total_subjects": total_subjects,
-                "active_subjects": active_subjects,
-                "total_questions": total_questions
+                "total_subjects": counters["subjects"]["total"],
+                "active_subjects": counters["subjects"]["active"],
+                "total_questions": counters["questions"]["total"]
             },
             "activity": {
-                "total_sessions": total_sessions,
-                "total_attempts": total_attempts,
-                "average_score": round(avg_score, 2),
-                "recent_sessions": recent_sessions
+                "total_sessions": counters["sessions"]["total"],
+                "total_attempts": counters["attempts"]["total"],
+                "average_score": round(counters["sessions"]["average_score"], 2),
+                "recent_sessions": counters["sessions"]["recent_7d"]
             }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get statistics: {str(e)}")
 
 @app.get("/admin/user/{user_id}/statistics")
+@query_budget(4)
 async def admin_get_user_statistics(
     user_id: int,
     db: Session = Depends(get_db),
@@ -525,7 +695,12 @@ async def admin_get_user_statistics(
         raise HTTPException(status_code=500, detail=f"Failed to get user statistics: {str(e)}")
 
 @app.get("/admin/subjects/analytics")
+@query_budget(2)
 async def admin_get_subjects_analytics(
+    skip: int = 0,
+    limit: int = 100,
+    sort_by: str = "id",
+    order: str = "asc",
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -533,35 +708,15 @@ async def admin_get_subjects_analytics(
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
+    if sort_by not in SUBJECT_ANALYTICS_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of: {', '.join(SUBJECT_ANALYTICS_SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    
     try:
-        subjects = get_subjects(db)
-        analytics = []
-        
-        for subject in subjects:
-            # Get enrollment count
-            enrollment_count = db.query(func.count(UserEnrollment.id)).filter(
-                UserEnrollment.subject_id == subject.id,
-                UserEnrollment.is_active == True
-            ).scalar()
-            
-            # Get question count
-            question_count = db.query(func.count(Question.id)).filter(
-                Question.subject_id == subject.id,
-                Question.is_active == True
-            ).scalar()
-            
-            # Get average score for this subject
-            avg_score = db.query(func.avg(PracticeSession.score)).filter(
-                PracticeSession.subject_id == subject.id
-            ).scalar() or 0.0
-            
-            analytics.append({
-                "subject": SubjectResponse.from_orm(subject),
-                "enrollment_count": enrollment_count,
-                "question_count": question_count,
-                "average_score": round(avg_score, 2)
-            })
-        
+        analytics = get_subject_analytics(db, skip=skip, limit=limit, sort_by=sort_by, descending=order == "desc")
+        for entry in analytics:
+            entry["subject"] = SubjectResponse.from_orm(entry["subject"])
         return analytics
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get subject analytics: {str(e)}")
@@ -618,6 +773,7 @@ async def admin_toggle_user_admin(
         raise HTTPException(status_code=400, detail=f"Failed to toggle admin status: {str(e)}")
 
 @app.get("/admin/enrollments")
+@query_budget(2)
 async def admin_get_enrollments(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -627,27 +783,8 @@ async def admin_get_enrollments(
         raise HTTPException(status_code=403, detail="Admin access required")
     
     try:
-        enrollments = db.query(UserEnrollment).join(User).join(Subject).filter(
-            UserEnrollment.is_active == True
-        ).all()
-        
-        enrollment_data = []
-        for enrollment in enrollments:
-            enrollment_data.append({
-                "id": enrollment.id,
-                "user": {
-                    "id": enrollment.user.id,
-                    "email": enrollment.user.email,
-                    "full_name": enrollment.user.full_name
-                },
-                "subject": {
-                    "id": enrollment.subject.id,
-                    "name": enrollment.subject.name
-                },
-                "enrolled_at": enrollment.enrolled_at
-            })
-        
-        return enrollment_data
+        rows = enrollment_rows_query(db).all()
+        return [serialize_enrollment_row(row) for row in rows]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get enrollments: {str(e)}")
 
@@ -659,8 +796,11 @@ def update_subject(db: Session, subject_id: int, **kwargs) -> Optional[Subject]:
         for key, value in kwargs.items():
             if hasattr(db_subject, key):
                 setattr(db_subject, key, value)
+        db.flush()
+        index_documents(db, "subject", Subject.id == subject_id)
         db.commit()
         db.refresh(db_subject)
+        invalidate_subject_responses(subject_id)
     return db_subject
 
 # Question Management Admin Functions
@@ -687,28 +827,41 @@ async def admin_create_question(
         raise HTTPException(status_code=400, detail=f"Failed to create question: {str(e)}")
 
 @app.get("/admin/questions", response_model=List[QuestionResponse])
+@query_budget(2)
 async def admin_list_questions(
+    response: Response,
     subject_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Get all questions with optional subject filter (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
+    check_pagination(skip, cursor)
     
     try:
         query = db.query(Question)
         if subject_id:
             query = query.filter(Question.subject_id == subject_id)
+        query = query.order_by(Question.id)
+        if cursor:
+            query = query.filter(keyset_after(db, (Question.id,), decode_cursor(cursor, (int,))))
+        else:
+            query = query.offset(skip)
         
-        questions = query.offset(skip).limit(limit).all()
+        questions = query.limit(limit).all()
+        set_next_cursor(response, next_cursor(questions, limit, "id"))
         return questions
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get questions: {str(e)}")
 
 @app.get("/admin/questions/{question_id}", response_model=QuestionWithAnswer)
+@query_budget(2)
 async def admin_get_question(
     question_id: int,
     db: Session = Depends(get_db),
@@ -749,8 +902,11 @@ async def admin_update_question(
     try:
         for key, value in update_data.items():
             setattr(question, key, value)
+        db.flush()
+        index_documents(db, "question", Question.id == question_id)
         db.commit()
         db.refresh(question)
+        invalidate_question_caches(question.subject_id)
         return {"message": "Question updated successfully", "question": QuestionWithAnswer.from_orm(question)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to update question: {str(e)}")
@@ -772,73 +928,32 @@ async def admin_delete_question(
     try:
         # Soft delete by setting is_active to False
         question.is_active = False
+        db.flush()
+        index_documents(db, "question", Question.id == question_id)
         db.commit()
+        invalidate_question_caches(question.subject_id)
         return {"message": "Question deactivated successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to delete question: {str(e)}")
 
 @app.post("/admin/questions/bulk-import")
 async def admin_bulk_import_questions(
-    questions_data: List[dict],
+    request: Request,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """Bulk import questions (admin only)"""
+    """Bulk import questions from a JSON list, or a streamed CSV/NDJSON upload (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    if not questions_data:
-        raise HTTPException(status_code=400, detail="No questions provided")
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    rows = iter_question_rows(content_type, request.stream())
     
     try:
-        created_questions = []
-        failed_questions = []
-        
-        for question_data in questions_data:
-            try:
-                # Validate required fields
-                required_fields = ["subject_id", "question_text", "option_a", "option_b", 
-                                 "option_c", "option_d", "correct_answer"]
-                for field in required_fields:
-                    if field not in question_data:
-                        raise ValueError(f"Missing required field: {field}")
-                
-                # Validate subject exists
-                subject = get_subject_by_id(db, question_data["subject_id"])
-                if not subject:
-                    raise ValueError(f"Subject with ID {question_data['subject_id']} not found")
-                
-                # Create question
-                question = Question(
-                    subject_id=question_data["subject_id"],
-                    question_text=question_data["question_text"],
-                    option_a=question_data["option_a"],
-                    option_b=question_data["option_b"],
-                    option_c=question_data["option_c"],
-                    option_d=question_data["option_d"],
-                    correct_answer=question_data["correct_answer"],
-                    explanation=question_data.get("explanation"),
-                    difficulty_level=question_data.get("difficulty_level", "medium"),
-                    is_active=True
-                )
-                db.add(question)
-                created_questions.append(question)
-                
-            except Exception as e:
-                failed_questions.append({
-                    "data": question_data,
-                    "error": str(e)
-                })
-        
-        db.commit()
-        
-        return {
-            "message": f"Successfully imported {len(created_questions)} questions",
-            "created_count": len(created_questions),
-            "failed_count": len(failed_questions),
-            "failed_questions": failed_questions
-        }
-        
+        return await import_questions(db, rows)
+    except InvalidImport as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Failed to import questions: {str(e)}")
@@ -899,53 +1014,48 @@ async def admin_get_questions_statistics(
 # Practice Session Management Admin Functions
 
 @app.get("/admin/practice-sessions")
+@query_budget(2)
 async def admin_get_practice_sessions(
+    response: Response,
     user_id: Optional[int] = None,
     subject_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Get practice sessions with optional filters (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
+    check_pagination(skip, cursor)
     
     try:
-        query = db.query(PracticeSession).join(User).join(Subject)
+        query = practice_session_rows_query(db)
         
         if user_id:
             query = query.filter(PracticeSession.user_id == user_id)
         if subject_id:
             query = query.filter(PracticeSession.subject_id == subject_id)
+        query = query.order_by(PracticeSession.completed_at.desc(), PracticeSession.id.desc())
+        if cursor:
+            query = query.filter(keyset_after(
+                db, (PracticeSession.completed_at, PracticeSession.id),
+                decode_cursor(cursor, (datetime, int)), descending=True
+            ))
+        else:
+            query = query.offset(skip)
         
-        sessions = query.order_by(PracticeSession.completed_at.desc()).offset(skip).limit(limit).all()
-        
-        session_data = []
-        for session in sessions:
-            session_data.append({
-                "id": session.id,
-                "user": {
-                    "id": session.user.id,
-                    "email": session.user.email,
-                    "full_name": session.user.full_name
-                },
-                "subject": {
-                    "id": session.subject.id,
-                    "name": session.subject.name
-                },
-                "score": session.score,
-                "total_questions": session.total_questions,
-                "correct_answers": session.correct_answers,
-                "time_taken": session.time_taken,
-                "completed_at": session.completed_at
-            })
-        
-        return session_data
+        rows = query.limit(limit).all()
+        set_next_cursor(response, next_cursor(rows, limit, "completed_at", "id"))
+        return [serialize_practice_session_row(row) for row in rows]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get practice sessions: {str(e)}")
 
 @app.get("/admin/practice-sessions/{session_id}")
+@query_budget(3)
 async def admin_get_practice_session_details(
     session_id: int,
     db: Session = Depends(get_db),
@@ -956,14 +1066,19 @@ async def admin_get_practice_session_details(
         raise HTTPException(status_code=403, detail="Admin access required")
     
     try:
-        session = db.query(PracticeSession).filter(PracticeSession.id == session_id).first()
+        session = db.query(PracticeSession).options(
+            joinedload(PracticeSession.user),
+            joinedload(PracticeSession.subject)
+        ).filter(PracticeSession.id == session_id).first()
         if not session:
             raise HTTPException(status_code=404, detail="Practice session not found")
         
         # Get all attempts for this session
-        attempts = db.query(QuestionAttempt).filter(
+        attempts = db.query(QuestionAttempt).join(QuestionAttempt.question).options(
+            contains_eager(QuestionAttempt.question)
+        ).filter(
             QuestionAttempt.session_id == session_id
-        ).join(Question).all()
+        ).all()
         
         attempt_data = []
         for attempt in attempts:
@@ -1004,72 +1119,44 @@ async def admin_get_practice_session_details(
         raise HTTPException(status_code=500, detail=f"Failed to get session details: {str(e)}")
 
 @app.get("/admin/practice-analytics")
+@query_budget(6)
 async def admin_get_practice_analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = "day",
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Get comprehensive practice analytics (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
+    if granularity not in ANALYTICS_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(ANALYTICS_GRANULARITIES)}")
+    
+    # Defaults to the last 7 days, oldest first
+    end = end or today()
+    start = start or end - timedelta(days=6)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days > MAX_ANALYTICS_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {MAX_ANALYTICS_DAYS} days")
     
     try:
-        # Overall statistics
-        total_sessions = db.query(func.count(PracticeSession.id)).scalar()
-        total_attempts = db.query(func.count(QuestionAttempt.id)).scalar()
-        avg_score = db.query(func.avg(PracticeSession.score)).scalar() or 0.0
-        avg_time = db.query(func.avg(PracticeSession.time_taken)).scalar() or 0.0
-        
-        # Recent activity (last 30 days)
-        from datetime import datetime, timedelta
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_sessions = db.query(func.count(PracticeSession.id)).filter(
-            PracticeSession.completed_at >= thirty_days_ago
-        ).scalar()
+        # Everything below reads the daily_subject_stats and user_stats rollups
+        overall = get_overall_activity(db, recent_since=today() - timedelta(days=30))
         
         # Top performing users
+        average_score = UserStats.score_sum / UserStats.sessions
         top_users = db.query(
             User.full_name,
-            func.count(PracticeSession.id).label('session_count'),
-            func.avg(PracticeSession.score).label('avg_score')
-        ).join(PracticeSession).group_by(User.id, User.full_name).order_by(
-            func.avg(PracticeSession.score).desc()
-        ).limit(10).all()
-        
-        # Subject performance
-        subject_performance = db.query(
-            Subject.name,
-            func.count(PracticeSession.id).label('session_count'),
-            func.avg(PracticeSession.score).label('avg_score'),
-            func.avg(PracticeSession.time_taken).label('avg_time')
-        ).join(PracticeSession).group_by(Subject.id, Subject.name).all()
-        
-        # Daily activity for the last 7 days
-        daily_activity = []
-        for i in range(7):
-            date = datetime.utcnow() - timedelta(days=i)
-            start_date = date.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_date = date.replace(hour=23, minute=59, second=59, microsecond=999999)
-            
-            daily_sessions = db.query(func.count(PracticeSession.id)).filter(
-                PracticeSession.completed_at >= start_date,
-                PracticeSession.completed_at <= end_date
-            ).scalar()
-            
-            daily_activity.append({
-                "date": date.strftime("%Y-%m-%d"),
-                "sessions": daily_sessions
-            })
-        
-        daily_activity.reverse()  # Show oldest first
+            UserStats.sessions,
+            average_score
+        ).join(UserStats, UserStats.user_id == User.id).filter(
+            UserStats.sessions > 0
+        ).order_by(average_score.desc()).limit(10).all()
         
         return {
-            "overall": {
-                "total_sessions": total_sessions,
-                "total_attempts": total_attempts,
-                "average_score": round(avg_score, 2),
-                "average_time": round(avg_time, 2),
-                "recent_sessions": recent_sessions
-            },
+            "overall": overall,
             "top_users": [
                 {
                     "name": name,
@@ -1077,15 +1164,9 @@ async def admin_get_practice_analytics(
                     "average_score": round(score, 2)
                 } for name, count, score in top_users
             ],
-            "subject_performance": [
-                {
-                    "subject": name,
-                    "session_count": count,
-                    "average_score": round(score, 2),
-                    "average_time": round(time, 2)
-                } for name, count, score, time in subject_performance
-            ],
-            "daily_activity": daily_activity
+            "subject_performance": get_subject_activity(db),
+            "range": {"start": start, "end": end, "granularity": granularity},
+            "daily_activity": get_activity(db, start, end, granularity)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get practice analytics: {str(e)}")
@@ -1105,7 +1186,9 @@ async def admin_delete_practice_session(
         if not session:
             raise HTTPException(status_code=404, detail="Practice session not found")
         
-        # Delete related attempts first
+        # Take it out of the user's stats, then delete related attempts first
+        record_sessions_removed(db, PracticeSession.id == session_id)
+        record_daily_sessions_removed(db, PracticeSession.id == session_id)
         db.query(QuestionAttempt).filter(QuestionAttempt.session_id == session_id).delete()
         
         # Delete the session
@@ -1118,8 +1201,11 @@ async def admin_delete_practice_session(
         raise HTTPException(status_code=400, detail=f"Failed to delete practice session: {str(e)}")
 
 @app.get("/admin/user/{user_id}/practice-history")
+@query_budget(5)
 async def admin_get_user_practice_history(
     user_id: int,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -1133,39 +1219,35 @@ async def admin_get_user_practice_history(
     
     try:
         # Get all practice sessions for the user
-        sessions = db.query(PracticeSession).filter(
+        query = practice_session_rows_query(db, include_user=False).filter(
             PracticeSession.user_id == user_id
-        ).join(Subject).order_by(PracticeSession.completed_at.desc()).all()
+        )
+        if cursor:
+            query = query.filter(keyset_after(
+                db, (PracticeSession.completed_at, PracticeSession.id),
+                decode_cursor(cursor, (datetime, int)), descending=True
+            ))
+        query = query.order_by(PracticeSession.completed_at.desc(), PracticeSession.id.desc())
+        rows = query.limit(limit).all() if limit else query.all()
         
         # Get user statistics
         stats = get_user_statistics(db, user_id)
         
-        session_data = []
-        for session in sessions:
-            session_data.append({
-                "id": session.id,
-                "subject": {
-                    "id": session.subject.id,
-                    "name": session.subject.name
-                },
-                "score": session.score,
-                "total_questions": session.total_questions,
-                "correct_answers": session.correct_answers,
-                "time_taken": session.time_taken,
-                "completed_at": session.completed_at
-            })
-        
         return {
             "user": UserResponse.from_orm(user),
             "statistics": stats,
-            "practice_sessions": session_data
+            "practice_sessions": [serialize_practice_session_row(row, include_user=False) for row in rows],
+            "next_cursor": next_cursor(rows, limit, "completed_at", "id") if limit else None
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get user practice history: {str(e)}")
 
 # System Management Admin Functions
 
 @app.get("/admin/system/health")
+@query_budget(7)
 async def admin_system_health(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -1178,40 +1260,26 @@ async def admin_system_health(
         # Database health check
         db_health = "healthy"
         try:
-            db.execute("SELECT 1")
+            db.execute(text("SELECT 1"))
         except Exception:
             db_health = "unhealthy"
         
-        # Get system statistics
-        total_users = db.query(func.count(User.id)).scalar()
-        total_subjects = db.query(func.count(Subject.id)).scalar()
-        total_questions = db.query(func.count(Question.id)).scalar()
-        total_sessions = db.query(func.count(PracticeSession.id)).scalar()
-        
-        # Check for inactive content
-        inactive_subjects = db.query(func.count(Subject.id)).filter(Subject.is_active == False).scalar()
-        inactive_questions = db.query(func.count(Question.id)).filter(Question.is_active == False).scalar()
-        
-        # Recent activity (last 24 hours)
-        from datetime import datetime, timedelta
-        day_ago = datetime.utcnow() - timedelta(days=1)
-        recent_users = db.query(func.count(User.id)).filter(User.created_at >= day_ago).scalar()
-        recent_sessions = db.query(func.count(PracticeSession.id)).filter(PracticeSession.completed_at >= day_ago).scalar()
+        counters = get_system_counters(db)
         
         return {
             "status": "healthy",
             "database": db_health,
             "statistics": {
-                "total_users": total_users,
-                "total_subjects": total_subjects,
-                "total_questions": total_questions,
-                "total_sessions": total_sessions,
-                "inactive_subjects": inactive_subjects,
-                "inactive_questions": inactive_questions
+                "total_users": counters["users"]["total"],
+                "total_subjects": counters["subjects"]["total"],
+                "total_questions": counters["questions"]["total"],
+                "total_sessions": counters["sessions"]["total"],
+                "inactive_subjects": counters["subjects"]["inactive"],
+                "inactive_questions": counters["questions"]["inactive"]
             },
             "recent_activity": {
-                "new_users_24h": recent_users,
-                "sessions_24h": recent_sessions
+                "new_users_24h": counters["users"]["new_24h"],
+                "sessions_24h": counters["sessions"]["recent_24h"]
             },
             "timestamp": datetime.utcnow().isoformat()
         }
@@ -1232,33 +1300,7 @@ async def admin_system_cleanup(
         raise HTTPException(status_code=403, detail="Admin access required")
     
     try:
-        cleanup_results = {}
-        
-        # Clean up inactive users (older than 90 days)
-        from datetime import datetime, timedelta
-        ninety_days_ago = datetime.utcnow() - timedelta(days=90)
-        inactive_users = db.query(User).filter(
-            User.is_active == False,
-            User.updated_at <= ninety_days_ago
-        ).all()
-        
-        for user in inactive_users:
-            db.delete(user)
-        cleanup_results["deleted_inactive_users"] = len(inactive_users)
-        
-        # Clean up old practice sessions (older than 1 year)
-        one_year_ago = datetime.utcnow() - timedelta(days=365)
-        old_sessions = db.query(PracticeSession).filter(
-            PracticeSession.completed_at <= one_year_ago
-        ).all()
-        
-        for session in old_sessions:
-            # Delete related attempts first
-            db.query(QuestionAttempt).filter(QuestionAttempt.session_id == session.id).delete()
-            db.delete(session)
-        cleanup_results["deleted_old_sessions"] = len(old_sessions)
-        
-        db.commit()
+        cleanup_results = system_cleanup(db)
         
         return {
             "message": "System cleanup completed successfully",
@@ -1270,165 +1312,243 @@ async def admin_system_cleanup(
 
 @app.get("/admin/system/backup")
 async def admin_system_backup(
-    db: Session = Depends(get_db),
+    compress: bool = False,
     current_user = Depends(get_current_user)
 ):
-    """Generate system backup data (admin only)"""
+    """Stream a backup of every table as NDJSON, optionally gzipped (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    try:
-        # Get all data for backup
-        users = db.query(User).all()
-        subjects = db.query(Subject).all()
-        questions = db.query(Question).all()
-        enrollments = db.query(UserEnrollment).all()
-        
-        backup_data = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "users": [
-                {
-                    "id": user.id,
-                    "email": user.email,
-                    "full_name": user.full_name,
-                    "is_active": user.is_active,
-                    "is_admin": user.is_admin,
-                    "created_at": user.created_at.isoformat()
-                } for user in users
-            ],
-            "subjects": [
-                {
-                    "id": subject.id,
-                    "name": subject.name,
-                    "description": subject.description,
-                    "is_active": subject.is_active,
-                    "created_at": subject.created_at.isoformat()
-                } for subject in subjects
-            ],
-            "questions": [
-                {
-                    "id": question.id,
-                    "subject_id": question.subject_id,
-                    "question_text": question.question_text,
-                    "option_a": question.option_a,
-                    "option_b": question.option_b,
-                    "option_c": question.option_c,
-                    "option_d": question.option_d,
-                    "correct_answer": question.correct_answer,
-                    "explanation": question.explanation,
-                    "difficulty_level": question.difficulty_level,
-                    "is_active": question.is_active,
-                    "created_at": question.created_at.isoformat()
-                } for question in questions
-            ],
-            "enrollments": [
-                {
-                    "id": enrollment.id,
-                    "user_id": enrollment.user_id,
-                    "subject_id": enrollment.subject_id,
-                    "enrolled_at": enrollment.enrolled_at.isoformat(),
-                    "is_active": enrollment.is_active
-                } for enrollment in enrollments
-            ]
-        }
-        
-        return backup_data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Backup failed: {str(e)}")
+    filename = f"studentlearn-backup-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.ndjson"
+    if compress:
+        filename += ".gz"
+    return StreamingResponse(
+        stream_backup(compress=compress),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @app.post("/admin/system/restore")
 async def admin_system_restore(
-    backup_data: dict,
-    db: Session = Depends(get_db),
+    request: Request,
+    resume: bool = False,
+    chunk_size: Optional[int] = None,
     current_user = Depends(get_current_user)
 ):
-    """Restore system from backup data (admin only)"""
+    """Restore system from a streamed backup upload (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
+    if chunk_size is not None and chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
     
     try:
-        # Clear existing data
-        db.query(QuestionAttempt).delete()
-        db.query(PracticeSession).delete()
-        db.query(UserEnrollment).delete()
-        db.query(Question).delete()
-        db.query(Subject).delete()
-        db.query(User).delete()
-        
-        # Restore users
-        for user_data in backup_data.get("users", []):
-            user = User(
-                id=user_data["id"],
-                email=user_data["email"],
-                full_name=user_data["full_name"],
-                hashed_password="restored_user_password_hash",  # You'll need to handle passwords properly
-                is_active=user_data["is_active"],
-                is_admin=user_data["is_admin"]
-            )
-            db.add(user)
-        
-        # Restore subjects
-        for subject_data in backup_data.get("subjects", []):
-            subject = Subject(
-                id=subject_data["id"],
-                name=subject_data["name"],
-                description=subject_data["description"],
-                is_active=subject_data["is_active"]
-            )
-            db.add(subject)
-        
-        db.commit()
-        
-        # Restore questions
-        for question_data in backup_data.get("questions", []):
-            question = Question(
-                id=question_data["id"],
-                subject_id=question_data["subject_id"],
-                question_text=question_data["question_text"],
-                option_a=question_data["option_a"],
-                option_b=question_data["option_b"],
-                option_c=question_data["option_c"],
-                option_d=question_data["option_d"],
-                correct_answer=question_data["correct_answer"],
-                explanation=question_data["explanation"],
-                difficulty_level=question_data["difficulty_level"],
-                is_active=question_data["is_active"]
-            )
-            db.add(question)
-        
-        # Restore enrollments
-        for enrollment_data in backup_data.get("enrollments", []):
-            enrollment = UserEnrollment(
-                id=enrollment_data["id"],
-                user_id=enrollment_data["user_id"],
-                subject_id=enrollment_data["subject_id"],
-                is_active=enrollment_data["is_active"]
-            )
-            db.add(enrollment)
-        
-        db.commit()
-        
-        return {"message": "System restored successfully"}
+        run = await restore_from_stream(request.stream(), resume=resume, chunk_size=chunk_size)
+        if run.status != "completed":
+            return {"message": "Backup ended early; upload it again with resume=true to continue", "restore": run.to_dict()}
+        return {"message": "System restored successfully", "restore": run.to_dict()}
+    except RestoreInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except InvalidBackup as e:
+        raise HTTPException(status_code=400, detail=f"Restore failed: {str(e)}")
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
+    finally:
+        # Even a failed restore may have replaced rows
+        clear_data_caches()
+
+@app.get("/admin/system/restore/status")
+async def admin_system_restore_status(
+    restore_id: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    """Get progress of the running or most recent restore (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    progress = get_restore_progress(restore_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="No restore found")
+    return progress
+
+# Background jobs
+
+def job_accepted(job) -> JSONResponse:
+    """202 response for a newly queued job, pointing at where to poll it"""
+    return JSONResponse(
+        status_code=202,
+        content=jsonable_encoder(job.to_dict()),
+        headers={"Location": f"/admin/jobs/{job.id}"}
+    )
+
+@app.post("/admin/jobs/{kind}")
+async def admin_submit_job(
+    kind: str,
+    request: Request,
+    compress: bool = False,
+    resume: bool = False,
+    chunk_size: Optional[int] = None,
+    current_user = Depends(get_current_user)
+):
+    """Queue a cleanup, backup, restore or question-import job; restore and question-import read the upload from the body (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind; use one of: {', '.join(JOB_KINDS)}")
+    if chunk_size is not None and chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+    
+    params = {}
+    upload = None
+    if kind == "backup":
+        params = {"compress": compress}
+    elif kind == "restore":
+        params = {"resume": resume, "chunk_size": chunk_size}
+        upload = request.stream()
+    elif kind == "question-import":
+        params = {"content_type": request.headers.get("content-type", "").split(";")[0].strip()}
+        upload = request.stream()
+    
+    try:
+        job = await submit_job(kind, params, submitted_by=current_user.email, upload=upload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to submit job: {str(e)}")
+    return job_accepted(job)
+
+@app.get("/admin/jobs")
+async def admin_list_jobs(
+    kind: Optional[str] = None,
+    job_status: Optional[str] = Query(None, alias="status"),
+    limit: int = 50,
+    current_user = Depends(get_current_user)
+):
+    """List background jobs, newest first (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if kind and kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(JOB_KINDS)}")
+    if job_status and job_status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of: {', '.join(JOB_STATUSES)}")
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
+    
+    return [job.to_dict() for job in list_jobs(kind=kind, status=job_status, limit=limit)]
+
+@app.get("/admin/jobs/{job_id}")
+async def admin_get_job(job_id: str, current_user = Depends(get_current_user)):
+    """Get a background job's status, progress and result (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/admin/jobs/{job_id}/events")
+async def admin_job_events(job_id: str, current_user = Depends(get_current_user)):
+    """Stream a background job's state as server-sent events until it finishes (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return StreamingResponse(
+        iter_job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/admin/jobs/{job_id}/cancel")
+async def admin_cancel_job(job_id: str, current_user = Depends(get_current_user)):
+    """Cancel a queued job, or ask a running one to stop (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return cancel_job(job_id).to_dict()
+
+@app.get("/admin/jobs/{job_id}/artifact")
+async def admin_get_job_artifact(job_id: str, current_user = Depends(get_current_user)):
+    """Download the file a finished job produced, like a backup or an import report (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    path = job_artifact_path(job)
+    if not path:
+        raise HTTPException(status_code=404, detail="Job has no artifact")
+    return FileResponse(path, media_type=job.artifact["media_type"], filename=job.artifact["filename"])
+
+@app.get("/admin/system/hashing")
+async def admin_get_hashing_metrics(current_user = Depends(get_current_user)):
+    """Get password hashing pool metrics (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return get_hashing_metrics()
+
+@app.get("/admin/system/database/pool")
+async def admin_get_pool_metrics(current_user = Depends(get_current_user)):
+    """Get database connection pool usage and checkout wait metrics (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return get_pool_metrics()
 
 @app.get("/admin/system/logs")
 async def admin_get_system_logs(
     limit: int = 100,
     current_user = Depends(get_current_user)
 ):
-    """Get system logs (admin only)"""
+    """Get the most recent slow requests, newest first (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    
+    return {
+        "slow_request_ms": SLOW_REQUEST_MS,
+        "entries": request_metrics.slow_requests(limit)
+    }
+
+@app.get("/admin/system/slow-queries")
+async def admin_get_slow_queries(
+    sort: str = "total_ms",
+    limit: int = 50,
+    current_user = Depends(get_current_user)
+):
+    """Get slow SQL statements grouped by fingerprint, with their query plans (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
+    if sort not in SLOW_QUERY_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(SLOW_QUERY_SORT_FIELDS)}")
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
     
-    # This is a placeholder - in a real system, you'd integrate with a proper logging system
-    # For now, we'll return a mock log structure
     return {
-        "message": "Log retrieval not implemented in this version",
-        "note": "Integrate with a proper logging system like ELK stack or similar"
+        "threshold_ms": slow_query_log.threshold_ms,
+        "queries": slow_query_log.entries(sort=sort, limit=limit)
     }
 
+@app.delete("/admin/system/slow-queries")
+async def admin_clear_slow_queries(current_user = Depends(get_current_user)):
+    """Forget the recorded slow queries, e.g. after adding an index (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Request, SQL and pool metrics for this worker in Prometheus text format"""
+    if not metrics_authorized(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
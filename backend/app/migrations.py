@@ -0,0 +1,102 @@
+from alembic import command
+from alembic.config import Config
+from contextlib import contextmanager
+from sqlalchemy import inspect, text
+import hashlib
+import os
+import tempfile
+import time
+from dotenv import load_dotenv
+
+from .database import engine
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker development setups only
+    fcntl = None
+
+# Load environment variables
+load_dotenv()
+
+# Seconds a worker waits for another worker's migration run before giving up
+MIGRATION_LOCK_TIMEOUT_SECONDS = int(os.getenv("MIGRATION_LOCK_TIMEOUT_SECONDS", "300"))
+# Name of the lock held while migrating: MySQL GET_LOCK, PostgreSQL advisory lock (via hashtext) or lock file
+MIGRATION_LOCK_NAME = "studentlearn-migrations"
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+# Revision matching the schema Base.metadata.create_all used to build
+BASELINE_REVISION = "0001_initial_schema"
+
+def get_alembic_config() -> Config:
+    """Get the Alembic config for the backend"""
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    return config
+
+def migration_lock_path(url: str) -> str:
+    """Lock file shared by every process migrating the database at url"""
+    digest = hashlib.sha1(url.encode()).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"{MIGRATION_LOCK_NAME}-{digest}.lock")
+
+@contextmanager
+def migration_lock(connection, timeout: float = MIGRATION_LOCK_TIMEOUT_SECONDS):
+    """Hold a lock across processes so only one of them migrates at a time.
+
+    PostgreSQL and MySQL use a server-side advisory lock, which also covers
+    workers on other hosts; SQLite, whose workers share one host, uses a
+    lock file in the temp dir. Take it outside the migration transaction
+    so it is released only after that transaction commits.
+    """
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "mysql"):
+        if dialect == "postgresql":
+            connection.execute(text(f"SET lock_timeout = '{int(timeout * 1000)}ms'"))
+            connection.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), {"name": MIGRATION_LOCK_NAME})
+            connection.execute(text("RESET lock_timeout"))
+            release = "SELECT pg_advisory_unlock(hashtext(:name))"
+        else:
+            acquired = connection.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"), {"name": MIGRATION_LOCK_NAME, "timeout": int(timeout)}
+            ).scalar()
+            if acquired != 1:
+                raise RuntimeError(f"Timed out waiting {timeout:.0f}s for another worker's migrations")
+            release = "SELECT RELEASE_LOCK(:name)"
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text(release), {"name": MIGRATION_LOCK_NAME})
+            connection.commit()
+    elif fcntl is None:
+        yield
+    else:
+        with open(migration_lock_path(str(connection.engine.url)), "w") as lock_file:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Timed out waiting {timeout:.0f}s for another worker's migrations")
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def upgrade_database(revision: str = "head"):
+    """Bring the database schema up to date with the Alembic migrations.
+
+    Safe to call from every worker at startup: the first one to take the
+    migration lock migrates, and the rest find the schema already at head.
+    """
+    config = get_alembic_config()
+    with engine.connect() as connection, migration_lock(connection), connection.begin():
+        config.attributes["connection"] = connection
+        tables = set(inspect(connection).get_table_names())
+        # Databases created by create_all have the baseline tables but no version
+        if "users" in tables and "alembic_version" not in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, revision)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Text, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -47,6 +47,8 @@ class Question(Base):
     correct_answer = Column(String, nullable=False)  # 'A', 'B', 'C', or 'D'
     explanation = Column(Text)
     difficulty_level = Column(String, default="medium")  # easy, medium, hard
+    rating = Column(Float)  # Elo difficulty; null until answered, then seeded from difficulty_level
+    rating_attempts = Column(Integer, default=0, server_default="0")
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -54,6 +56,10 @@ class Question(Base):
     subject = relationship("Subject", back_populates="questions")
     attempts = relationship("QuestionAttempt", back_populates="question")
 
+    __table_args__ = (
+        Index("ix_questions_subject_id_is_active_difficulty", "subject_id", "is_active", "difficulty_level"),
+    )
+
 class PracticeSession(Base):
     __tablename__ = "practice_sessions"
 
@@ -68,8 +74,15 @@ class PracticeSession(Base):
 
     # Relationships
     user = relationship("User", back_populates="practice_sessions")
+    subject = relationship("Subject")
     attempts = relationship("QuestionAttempt", back_populates="session")
 
+    __table_args__ = (
+        Index("ix_practice_sessions_user_id_completed_at", "user_id", "completed_at"),
+        Index("ix_practice_sessions_subject_id_score", "subject_id", "score"),
+        Index("ix_practice_sessions_completed_at", "completed_at"),
+    )
+
 class QuestionAttempt(Base):
     __tablename__ = "question_attempts"
 
@@ -85,7 +98,14 @@ class QuestionAttempt(Base):
     # Relationships
     user = relationship("User", back_populates="question_attempts")
     question = relationship("Question", back_populates="attempts")
-    session = relationship("PracticeSession", back_populates="attempts") 
+    session = relationship("PracticeSession", back_populates="attempts")
+
+    __table_args__ = (
+        Index("ix_question_attempts_user_id_attempted_at", "user_id", "attempted_at"),
+        Index("ix_question_attempts_user_id_is_correct", "user_id", "is_correct"),
+        Index("ix_question_attempts_session_id", "session_id"),
+        Index("ix_question_attempts_question_id", "question_id"),
+    )
 
 class SubjectContent(Base):
     __tablename__ = "subject_contents"
@@ -121,7 +141,72 @@ class UserEnrollment(Base):
     user = relationship("User", back_populates="enrollments")
     subject = relationship("Subject", back_populates="enrollments")
 
-    # Ensure unique enrollment per user-subject pair
+    # Ensure unique enrollment per user-subject pair; unenrolling only
+    # flips is_active, and re-enrolling reactivates the same row
     __table_args__ = (
+        Index("uq_user_enrollments_user_id_subject_id", "user_id", "subject_id", unique=True),
+        Index("ix_user_enrollments_user_id_is_active", "user_id", "is_active", "subject_id"),
+        Index("ix_user_enrollments_subject_id_is_active", "subject_id", "is_active"),
         {"extend_existing": True},
-    )
\ No newline at end of file
+    )
+
+class UserMastery(Base):
+    __tablename__ = "user_mastery"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)
+    ability = Column(Float, default=0.0, nullable=False)  # Elo ability, same scale as Question.rating
+    attempts = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("uq_user_mastery_user_id_subject_id", "user_id", "subject_id", unique=True),
+    )
+
+# Running totals behind a user's statistics, kept in step with sessions and attempts
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    sessions = Column(Integer, default=0, nullable=False)
+    score_sum = Column(Float, default=0.0, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    correct_answers = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Per-subject session counts of a user; subjects with sessions are the ones practiced
+class UserSubjectStats(Base):
+    __tablename__ = "user_subject_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), primary_key=True)
+    sessions = Column(Integer, default=0, nullable=False)
+
+# Practice activity per subject per UTC day: sessions by completion day, attempts by attempt day
+class DailySubjectStats(Base):
+    __tablename__ = "daily_subject_stats"
+
+    day = Column(Date, primary_key=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), primary_key=True)
+    sessions = Column(Integer, default=0, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    score_sum = Column(Float, default=0.0, nullable=False)
+    time_sum = Column(Integer, default=0, nullable=False)
+
+# One row per searchable record, mirrored from subjects, contents, lessons and questions.
+# SQLite indexes it with an FTS5 table and MySQL with a FULLTEXT index (see app/search.py)
+class SearchDocument(Base):
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(16), nullable=False)  # subject, content, lesson, question
+    ref_id = Column(Integer, nullable=False)
+    subject_id = Column(Integer)
+    title = Column(Text, nullable=False)
+    body = Column(Text, nullable=False)
+    is_active = Column(Boolean, default=True, nullable=False)
+
+    __table_args__ = (
+        Index("uq_search_documents_kind_ref_id", "kind", "ref_id", unique=True),
+    )
@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import Optional, Sequence
+from sqlalchemy import and_, or_, literal, String
+from sqlalchemy.orm import Session
+import base64
+import json
+
+# Response header carrying the cursor for the next page of list endpoints
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> list:
+    """Decode a cursor into its sort key values, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for kind, value in zip(types, payload)
+        ]
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+def next_cursor(items: list, limit: int, *attributes: str) -> Optional[str]:
+    """Get the cursor following a full page, or None when there are no more rows"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(*(getattr(last, attribute) for attribute in attributes))
+
+def _bounds(db: Session, value) -> tuple:
+    # SQLite keeps timestamps as text in two spellings: CURRENT_TIMESTAMP writes whole
+    # seconds ("...12:00:00") while SQLAlchemy always writes microseconds
+    # ("...12:00:00.000000"). Return both, as the lowest and highest text for the instant.
+    if isinstance(value, datetime) and db.get_bind().dialect.name == "sqlite":
+        full = literal(value.strftime("%Y-%m-%d %H:%M:%S") + f".{value.microsecond:06d}", String)
+        if value.microsecond:
+            return full, full
+        return literal(value.strftime("%Y-%m-%d %H:%M:%S"), String), full
+    return value, value
+
+def keyset_after(db: Session, columns: Sequence, values: Sequence, descending: bool = False):
+    """Build the filter that resumes an ordering on columns just after values"""
+    predicate = None
+    for column, value in reversed(list(zip(columns, values))):
+        low, high = _bounds(db, value)
+        step = column < low if descending else column > high
+        if predicate is None:
+            predicate = step
+        else:
+            equal = column == low if low is high else column.in_([low, high])
+            predicate = or_(step, and_(equal, predicate))
+    return predicate
@@ -0,0 +1,189 @@
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Optional
+import json
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PRINCIPAL_CACHE_BACKEND = os.getenv("PRINCIPAL_CACHE_BACKEND", "memory")  # memory, redis or none
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user fields request handlers rely on"""
+    id: int
+    email: str
+    full_name: str
+    is_active: bool
+    is_admin: bool
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin),
+            created_at=user.created_at,
+        )
+
+class InMemoryPrincipalCache:
+    """Per-process LRU cache with a TTL on each entry"""
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[subject]
+                return None
+            self._entries.move_to_end(subject)
+            return principal
+
+    def set(self, subject: str, principal: Principal):
+        with self._lock:
+            self._entries[subject] = (principal, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def get_async(self, subject: str) -> Optional[Principal]:
+        return self.get(subject)
+
+    async def set_async(self, subject: str, principal: Principal):
+        self.set(subject, principal)
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisPrincipalCache:
+    """Cache shared between workers, so invalidation reaches all of them"""
+
+    key_prefix = "principal:"
+
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis
+        import redis.asyncio
+
+        self.ttl_seconds = ttl_seconds
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25)
+        # The async dependency awaits this one, so a slow Redis doesn't stall the event loop
+        self._async_client = redis.asyncio.Redis.from_url(url, socket_timeout=0.25)
+
+    @staticmethod
+    def _decode(raw) -> Optional[Principal]:
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        if data.get("created_at"):
+            data["created_at"] = datetime.fromisoformat(data["created_at"])
+        return Principal(**data)
+
+    @staticmethod
+    def _encode(principal: Principal) -> str:
+        data = asdict(principal)
+        if principal.created_at:
+            data["created_at"] = principal.created_at.isoformat()
+        return json.dumps(data)
+
+    def get(self, subject: str) -> Optional[Principal]:
+        try:
+            raw = self._client.get(self.key_prefix + subject)
+        except Exception as e:
+            logger.warning("Principal cache read failed: %s", e)
+            return None
+        return self._decode(raw)
+
+    def set(self, subject: str, principal: Principal):
+        try:
+            self._client.setex(self.key_prefix + subject, self.ttl_seconds, self._encode(principal))
+        except Exception as e:
+            logger.warning("Principal cache write failed: %s", e)
+
+    async def get_async(self, subject: str) -> Optional[Principal]:
+        try:
+            raw = await self._async_client.get(self.key_prefix + subject)
+        except Exception as e:
+            logger.warning("Principal cache read failed: %s", e)
+            return None
+        return self._decode(raw)
+
+    async def set_async(self, subject: str, principal: Principal):
+        try:
+            await self._async_client.setex(self.key_prefix + subject, self.ttl_seconds, self._encode(principal))
+        except Exception as e:
+            logger.warning("Principal cache write failed: %s", e)
+
+    def invalidate(self, subject: str):
+        try:
+            self._client.delete(self.key_prefix + subject)
+        except Exception as e:
+            logger.warning("Principal cache invalidation failed: %s", e)
+
+    def clear(self):
+        try:
+            for key in self._client.scan_iter(self.key_prefix + "*"):
+                self._client.delete(key)
+        except Exception as e:
+            logger.warning("Principal cache clear failed: %s", e)
+
+class NullPrincipalCache:
+    """Disables caching so every request hits the database"""
+
+    def get(self, subject: str) -> Optional[Principal]:
+        return None
+
+    def set(self, subject: str, principal: Principal):
+        pass
+
+    async def get_async(self, subject: str) -> Optional[Principal]:
+        return None
+
+    async def set_async(self, subject: str, principal: Principal):
+        pass
+
+    def invalidate(self, subject: str):
+        pass
+
+    def clear(self):
+        pass
+
+def _create_cache():
+    if PRINCIPAL_CACHE_BACKEND == "redis":
+        return RedisPrincipalCache(REDIS_URL, PRINCIPAL_CACHE_TTL_SECONDS)
+    if PRINCIPAL_CACHE_BACKEND == "none":
+        return NullPrincipalCache()
+    return InMemoryPrincipalCache(PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_SIZE)
+
+principal_cache = _create_cache()
+
+def invalidate_principal(email: str):
+    """Drop a cached principal so the next request reloads it"""
+    principal_cache.invalidate(email)
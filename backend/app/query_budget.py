@@ -0,0 +1,62 @@
+from typing import List, Optional, Tuple
+import logging
+import os
+from dotenv import load_dotenv
+
+from .database import QueryStats
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+# What a request that runs more SQL statements than its route's budget does: off, log or raise.
+# Development servers log by default; tests and benchmarks/query_budgets.py raise.
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log" if os.getenv("ENVIRONMENT") == "development" else "off")
+
+class QueryBudgetExceeded(Exception):
+    def __init__(self, route: str, budget: int, queries: int):
+        super().__init__(f"{route} ran {queries} SQL statements, over its budget of {budget}")
+        self.route = route
+        self.budget = budget
+        self.queries = queries
+
+def query_budget(max_queries: int):
+    """Declare the most SQL statements one request to the decorated route may run.
+
+    Goes below the route decorator, so FastAPI registers the tagged function:
+
+        @app.get("/admin/subjects/analytics")
+        @query_budget(2)
+        async def admin_get_subjects_analytics(...):
+    """
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+def route_budget(route) -> Optional[int]:
+    return getattr(getattr(route, "endpoint", None), "query_budget", None)
+
+def route_budgets(app) -> List[Tuple[str, str, int]]:
+    """(method, path, budget) for every route that declares a budget"""
+    budgets = []
+    for route in app.routes:
+        budget = route_budget(route)
+        if budget is not None:
+            budgets.extend((method, route.path, budget) for method in sorted(route.methods))
+    return budgets
+
+def check_query_budget(scope: dict, stats: QueryStats):
+    """Log or raise, per QUERY_BUDGET_MODE, when a finished request ran more statements than its route allows"""
+    if QUERY_BUDGET_MODE == "off":
+        return
+    route = scope.get("route")
+    budget = route_budget(route)
+    if budget is None or stats.queries <= budget:
+        return
+    error = QueryBudgetExceeded(f"{scope['method']} {route.path}", budget, stats.queries)
+    if QUERY_BUDGET_MODE == "raise":
+        raise error
+    logger.warning("Query budget exceeded: %s", error)
@@ -0,0 +1,214 @@
+from typing import AsyncIterator, Callable
+from sqlalchemy import insert, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import csv
+import json
+import os
+from dotenv import load_dotenv
+
+from .models import Subject, Question
+from .uploads import iter_upload_lines
+from .question_pool import invalidate_question_caches
+from .search import index_documents
+
+# Load environment variables
+load_dotenv()
+
+# Rows validated and inserted per executemany batch
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+
+REQUIRED_QUESTION_FIELDS = ("subject_id", "question_text", "option_a", "option_b", "option_c", "option_d", "correct_answer")
+ANSWER_OPTIONS = ("A", "B", "C", "D")
+DIFFICULTY_LEVELS = ("easy", "medium", "hard")
+
+class InvalidImport(ValueError):
+    """Raised when an upload cannot be read as questions at all"""
+
+class ImportInterrupted(Exception):
+    """Raised when an import fails after some chunks were already committed"""
+
+    def __init__(self, created_count: int, error: Exception):
+        super().__init__(f"{error} ({created_count} questions from earlier chunks were already imported)")
+        self.created_count = created_count
+
+class QuestionImport:
+    """Validate and insert questions a chunk at a time.
+
+    Subjects are resolved with one IN query per chunk for ids not seen before,
+    and the valid rows of a chunk go in with a single executemany. Each chunk
+    is committed on its own, like a restore, so a long upload never holds the
+    write lock for more than one chunk and a failure keeps the chunks before it.
+    """
+
+    def __init__(self, db: Session, chunk_size: int = None):
+        self.db = db
+        self.chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+        self.created_count = 0
+        self.failed = []
+        self.subject_ids = set()
+        self.imported_subject_ids = set()
+        self._pending = []
+        self.rows_seen = 0
+        self.chunks = 0
+        self._checked_subjects = set()
+        # Rows a chunk inserts get ids above this, which is how they are indexed in one pass
+        self._last_id = db.query(func.max(Question.id)).scalar() or 0
+
+    def add(self, data) -> bool:
+        """Queue a row, returning True once a full chunk is ready to flush"""
+        self.rows_seen += 1
+        self._pending.append((self.rows_seen, data))
+        return len(self._pending) >= self.chunk_size
+
+    def _fail(self, row: int, data, error: str):
+        self.failed.append({"row": row, "data": data, "error": error})
+
+    def _normalize(self, data) -> dict:
+        if not isinstance(data, dict):
+            raise ValueError("Row is not an object")
+        for field in REQUIRED_QUESTION_FIELDS:
+            if data.get(field) in (None, ""):
+                raise ValueError(f"Missing required field: {field}")
+        try:
+            subject_id = int(data["subject_id"])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid subject_id: {data['subject_id']}")
+        correct_answer = str(data["correct_answer"]).strip().upper()
+        if correct_answer not in ANSWER_OPTIONS:
+            raise ValueError(f"correct_answer must be one of: {', '.join(ANSWER_OPTIONS)}")
+        difficulty_level = data.get("difficulty_level") or "medium"
+        if difficulty_level not in DIFFICULTY_LEVELS:
+            raise ValueError(f"difficulty_level must be one of: {', '.join(DIFFICULTY_LEVELS)}")
+        return {
+            "subject_id": subject_id,
+            "question_text": data["question_text"],
+            "option_a": data["option_a"],
+            "option_b": data["option_b"],
+            "option_c": data["option_c"],
+            "option_d": data["option_d"],
+            "correct_answer": correct_answer,
+            "explanation": data.get("explanation") or None,
+            "difficulty_level": difficulty_level,
+            "is_active": True,
+        }
+
+    def flush(self):
+        """Validate the queued rows, insert the valid ones and commit them"""
+        if not self._pending:
+            return
+        chunk, self._pending = self._pending, []
+
+        # Field checks first, so the subject lookup only covers well-formed rows
+        candidates = []
+        for row, data in chunk:
+            try:
+                candidates.append((row, data, self._normalize(data)))
+            except ValueError as e:
+                self._fail(row, data, str(e))
+
+        unchecked = {values["subject_id"] for _, _, values in candidates} - self._checked_subjects
+        if unchecked:
+            found = self.db.query(Subject.id).filter(Subject.id.in_(unchecked)).all()
+            self.subject_ids.update(subject_id for (subject_id,) in found)
+            self._checked_subjects.update(unchecked)
+
+        rows = []
+        for row, data, values in candidates:
+            if values["subject_id"] in self.subject_ids:
+                rows.append(values)
+            else:
+                self._fail(row, data, f"Subject with ID {values['subject_id']} not found")
+        if rows:
+            self.db.execute(insert(Question), rows)
+            index_documents(self.db, "question", Question.id > self._last_id)
+            self._last_id = self.db.query(func.max(Question.id)).scalar()
+        self.db.commit()
+        self.chunks += 1
+        if rows:
+            self.created_count += len(rows)
+            chunk_subject_ids = {values["subject_id"] for values in rows}
+            self.imported_subject_ids.update(chunk_subject_ids)
+            invalidate_question_caches(*chunk_subject_ids)
+
+    def finish(self) -> dict:
+        """Insert the last chunk and summarize the import"""
+        self.flush()
+        self.failed.sort(key=lambda failure: failure["row"])
+        return {
+            "message": f"Successfully imported {self.created_count} questions",
+            "created_count": self.created_count,
+            "failed_count": len(self.failed),
+            "failed_questions": self.failed,
+        }
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator:
+    """Yield one question object per NDJSON line"""
+    async for line in iter_upload_lines(chunks):
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Kept as a row so it is reported with its position like any other bad row
+            yield line.decode(errors="replace")
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """Yield one question dict per CSV record, keyed by the header row"""
+    header = None
+    record = ""
+    async for line in iter_upload_lines(chunks, keep_blank=True):
+        record += line.decode("utf-8-sig" if header is None and not record else "utf-8") + "\n"
+        # A record is complete once its quotes are balanced; quoted fields may span lines
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader([record]), [])
+        record = ""
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+        else:
+            yield dict(zip(header, values))
+    if header is None:
+        raise InvalidImport("CSV upload has no header row")
+
+async def iter_json_rows(body: bytes) -> AsyncIterator:
+    """Yield the items of a JSON array body"""
+    try:
+        rows = json.loads(body)
+    except ValueError:
+        raise InvalidImport("Body is not valid JSON")
+    if not isinstance(rows, list):
+        raise InvalidImport("Expected a JSON list of questions")
+    for row in rows:
+        yield row
+
+async def _iter_json_body(chunks: AsyncIterator[bytes]) -> AsyncIterator:
+    body = b"".join([chunk async for chunk in chunks])
+    async for row in iter_json_rows(body):
+        yield row
+
+def iter_question_rows(content_type: str, chunks: AsyncIterator[bytes]) -> AsyncIterator:
+    """Question rows from an upload: CSV or NDJSON streamed, anything else read whole as a JSON list"""
+    if content_type == "text/csv":
+        return iter_csv_rows(chunks)
+    if content_type in ("application/x-ndjson", "application/jsonl"):
+        return iter_ndjson_rows(chunks)
+    return _iter_json_body(chunks)
+
+async def import_questions(db: Session, rows: AsyncIterator, on_flush: Callable[[QuestionImport], None] = None) -> dict:
+    """Validate, insert and commit questions from a row stream, a chunk at a time"""
+    question_import = QuestionImport(db)
+    try:
+        async for row in rows:
+            if question_import.add(row):
+                await run_in_threadpool(question_import.flush)
+                if on_flush:
+                    on_flush(question_import)
+        if question_import.rows_seen == 0:
+            raise InvalidImport("No questions provided")
+        return await run_in_threadpool(question_import.finish)
+    except Exception as e:
+        if not question_import.chunks:
+            raise
+        await run_in_threadpool(db.rollback)
+        raise ImportInterrupted(question_import.created_count, e) from e
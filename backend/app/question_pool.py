@@ -0,0 +1,203 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+import os
+import random
+import threading
+import time
+from dotenv import load_dotenv
+
+from .models import Question, QuestionAttempt
+from .answer_keys import invalidate_answer_keys
+
+# Load environment variables
+load_dotenv()
+
+# How long a worker reuses a subject's id arrays before reloading them
+QUESTION_POOL_CACHE_SECONDS = float(os.getenv("QUESTION_POOL_CACHE_SECONDS", "300"))
+# How many of the user's latest attempts count as "recently attempted"
+RECENT_ATTEMPT_WINDOW = int(os.getenv("RECENT_ATTEMPT_WINDOW", "200"))
+
+DIFFICULTY_LEVELS = ("easy", "medium", "hard")
+
+# Starting Elo rating of questions nobody has answered yet
+DIFFICULTY_PRIORS = {"easy": -1.0, "medium": 0.0, "hard": 1.0}
+
+def question_rating(rating: Optional[float], difficulty_level: Optional[str]) -> float:
+    """Get a question's Elo rating, falling back to the prior of its difficulty level"""
+    if rating is not None:
+        return rating
+    return DIFFICULTY_PRIORS.get(difficulty_level or "medium", 0.0)
+
+class SubjectQuestionPool:
+    """Ids of a subject's active questions, one compact array per difficulty level,
+    plus every id sorted by rating for adaptive picks"""
+
+    __slots__ = ("buckets", "ratings", "rated_ids", "expires_at")
+
+    def __init__(self, rows, ttl_seconds: float):
+        self.buckets: Dict[str, array] = {level: array("i") for level in DIFFICULTY_LEVELS}
+        rated = []
+        for question_id, difficulty_level, rating in rows:
+            self.buckets.setdefault(difficulty_level or "medium", array("i")).append(question_id)
+            rated.append((question_rating(rating, difficulty_level), question_id))
+        rated.sort()
+        self.ratings = array("d", (rating for rating, _ in rated))
+        self.rated_ids = array("i", (question_id for _, question_id in rated))
+        self.expires_at = time.monotonic() + ttl_seconds
+
+    def __len__(self) -> int:
+        return len(self.rated_ids)
+
+    def nearest_ids(self, target: float, count: int, exclude: set, spread: int = 1) -> List[int]:
+        """Pick count ids at random from the count * spread ids rated closest to target.
+
+        Bisects into the sorted ratings and walks outward, so the cost is
+        O(log n + count * spread) plus one step per excluded id passed over.
+        Excluded ids only fill in when there are too few others.
+        """
+        fresh, skipped = [], []
+        window = count * spread
+        high = bisect_left(self.ratings, target)
+        low = high - 1
+        while len(fresh) < window and (low >= 0 or high < len(self.ratings)):
+            if high >= len(self.ratings) or (low >= 0 and target - self.ratings[low] <= self.ratings[high] - target):
+                question_id = self.rated_ids[low]
+                low -= 1
+            else:
+                question_id = self.rated_ids[high]
+                high += 1
+            if question_id not in exclude:
+                fresh.append(question_id)
+            elif len(skipped) < count:
+                skipped.append(question_id)
+        picked = random.sample(fresh, min(count, len(fresh)))
+        picked.extend(skipped[:count - len(picked)])
+        return picked
+
+class QuestionPoolCache:
+    """Per-process question id pools, loaded per subject on first use"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._pools: Dict[int, SubjectQuestionPool] = {}
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, subject_id: int) -> SubjectQuestionPool:
+        """Get a subject's pool, loading it with one narrow query when missing or expired"""
+        with self._lock:
+            pool = self._pools.get(subject_id)
+            generation = (self._epoch, self._generations.get(subject_id, 0))
+        if pool is not None and pool.expires_at > time.monotonic():
+            return pool
+        rows = db.query(Question.id, Question.difficulty_level, Question.rating).filter(
+            Question.subject_id == subject_id,
+            Question.is_active == True
+        ).order_by(Question.id).all()
+        pool = SubjectQuestionPool(rows, self.ttl_seconds)
+        with self._lock:
+            # Don't keep a pool that was invalidated while it was loading
+            if (self._epoch, self._generations.get(subject_id, 0)) == generation:
+                self._pools[subject_id] = pool
+        return pool
+
+    def invalidate(self, subject_id: int):
+        with self._lock:
+            self._pools.pop(subject_id, None)
+            self._generations[subject_id] = self._generations.get(subject_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._pools.clear()
+
+question_pool_cache = QuestionPoolCache(QUESTION_POOL_CACHE_SECONDS)
+
+def invalidate_question_caches(*subject_ids: int):
+    """Drop every cached view of these subjects' questions (pools and answer keys)"""
+    for subject_id in subject_ids:
+        question_pool_cache.invalidate(subject_id)
+    invalidate_answer_keys(*subject_ids)
+
+def parse_difficulty_mix(mix: str) -> Dict[str, float]:
+    """Parse "easy=2,medium=5,hard=3" into weights, raising ValueError when malformed"""
+    weights = {}
+    for part in mix.split(","):
+        level, sep, weight = part.partition("=")
+        level = level.strip()
+        if not sep or level not in DIFFICULTY_LEVELS:
+            raise ValueError(f"mix must look like easy=2,medium=5,hard=3 using: {', '.join(DIFFICULTY_LEVELS)}")
+        weights[level] = float(weight)
+        if weights[level] < 0:
+            raise ValueError("mix weights must not be negative")
+    if not sum(weights.values()):
+        raise ValueError("mix needs at least one positive weight")
+    return weights
+
+def split_count(count: int, weights: Dict[str, float]) -> Dict[str, int]:
+    """Split count across levels in proportion to weights (largest remainder)"""
+    total = sum(weights.values())
+    shares = {level: count * weight / total for level, weight in weights.items()}
+    counts = {level: int(share) for level, share in shares.items()}
+    leftover = count - sum(counts.values())
+    for level in sorted(shares, key=lambda level: shares[level] - counts[level], reverse=True)[:leftover]:
+        counts[level] += 1
+    return counts
+
+def sample_ids(ids: array, count: int, exclude: set) -> List[int]:
+    """Draw up to count distinct ids that are not excluded, without scanning large arrays"""
+    if count <= 0 or not ids:
+        return []
+    if len(ids) <= 4 * (count + len(exclude)):
+        candidates = [question_id for question_id in ids if question_id not in exclude]
+        return random.sample(candidates, min(count, len(candidates)))
+    # Rejection sampling: the array is much larger than what we skip, so few draws are wasted
+    picked = set()
+    while len(picked) < count:
+        question_id = ids[random.randrange(len(ids))]
+        if question_id not in exclude:
+            picked.add(question_id)
+    return list(picked)
+
+def get_recent_question_ids(db: Session, user_id: int, window: int = None) -> set:
+    """Get the ids of questions in the user's latest attempts"""
+    rows = db.query(QuestionAttempt.question_id).filter(
+        QuestionAttempt.user_id == user_id
+    ).order_by(QuestionAttempt.attempted_at.desc()).limit(window or RECENT_ATTEMPT_WINDOW).all()
+    return {question_id for (question_id,) in rows}
+
+def sample_question_ids(
+    db: Session,
+    subject_id: int,
+    count: int,
+    difficulty_mix: Optional[Dict[str, float]] = None,
+    exclude: Optional[set] = None
+) -> List[int]:
+    """Pick random question ids for a subject, honoring a difficulty mix and skipping excluded ids when possible"""
+    pool = question_pool_cache.get(db, subject_id)
+    exclude = exclude or set()
+    weights = difficulty_mix or {level: len(ids) for level, ids in pool.buckets.items() if ids}
+    if not weights:
+        return []
+
+    picked = []
+    for level, wanted in split_count(count, weights).items():
+        picked.extend(sample_ids(pool.buckets.get(level, array("i")), wanted, exclude))
+
+    # Short buckets or too many recent attempts: top up from the other requested levels,
+    # fresh questions first, then recently attempted ones
+    for skip in (exclude, set()):
+        if len(picked) >= count:
+            break
+        taken = set(picked) | skip
+        for level in (level for level, weight in weights.items() if weight > 0):
+            picked.extend(sample_ids(pool.buckets.get(level, array("i")), count - len(picked), taken))
+            taken = set(picked) | skip
+            if len(picked) >= count:
+                break
+
+    random.shuffle(picked)
+    return picked[:count]
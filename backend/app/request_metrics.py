@@ -0,0 +1,242 @@
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import bisect
+import logging
+import os
+import secrets
+import threading
+import time
+from dotenv import load_dotenv
+
+from .database import QueryStats, current_query_stats, get_pool_metrics
+from .query_budget import check_query_budget
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+# Requests at least this slow are kept in the slow request log
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_LOG_SIZE = int(os.getenv("SLOW_REQUEST_LOG_SIZE", "200"))
+# When set, /metrics requires "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Histogram upper bounds: request latency in seconds, statements per request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+# Requests that matched no route share one label, so stray paths can't grow the series
+UNMATCHED_ROUTE = "unmatched"
+
+# ASGI scope of the request being handled, for attributing work done on its behalf
+current_request_scope: ContextVar[Optional[dict]] = ContextVar("current_request_scope", default=None)
+
+def current_route() -> Optional[str]:
+    """Method and route template of the request being handled, like GET /subjects/{subject_id}"""
+    scope = current_request_scope.get()
+    if scope is None:
+        return None
+    return f"{scope['method']} {getattr(scope.get('route'), 'path', None) or UNMATCHED_ROUTE}"
+
+class Histogram:
+    """Counts per bucket plus sum and count, in Prometheus' cumulative form when rendered"""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        if index < len(self.bounds):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        total = 0
+        buckets = []
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+class RouteMetrics:
+    """Latency, SQL and status totals for one method and route"""
+    __slots__ = ("latency", "queries", "query_seconds", "rows", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.query_seconds = 0.0
+        self.rows = 0
+        self.statuses: Dict[int, int] = {}
+
+class RequestMetrics:
+    """Per-process request metrics and a ring buffer of recent slow requests"""
+
+    def __init__(self, slow_request_ms: float, log_size: int):
+        self.slow_request_ms = slow_request_ms
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._slow_requests = deque(maxlen=log_size)
+        self._lock = threading.Lock()
+
+    def record(self, method: str, route: Optional[str], path: str, status: int, duration_ms: float, stats: QueryStats):
+        route = route or UNMATCHED_ROUTE
+        with self._lock:
+            metrics = self._routes.get((method, route))
+            if metrics is None:
+                metrics = self._routes[(method, route)] = RouteMetrics()
+            metrics.latency.observe(duration_ms / 1000)
+            metrics.queries.observe(stats.queries)
+            metrics.query_seconds += stats.query_ms / 1000
+            metrics.rows += stats.rows
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            if duration_ms < self.slow_request_ms:
+                return
+            entry = {
+                "timestamp": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+                "method": method,
+                "path": path,
+                "route": route,
+                "status": status,
+                "duration_ms": round(duration_ms, 2),
+                "queries": stats.queries,
+                "query_ms": round(stats.query_ms, 2),
+                "rows": stats.rows,
+            }
+            self._slow_requests.append(entry)
+        logger.warning("Slow request: %s %s %s in %.0f ms (%d queries, %.0f ms in SQL)",
+                       method, path, status, duration_ms, stats.queries, stats.query_ms)
+
+    def slow_requests(self, limit: int) -> List[dict]:
+        """The most recent slow requests, newest first"""
+        with self._lock:
+            entries = list(self._slow_requests)
+        return entries[::-1][:limit]
+
+    def routes(self) -> List[Tuple[Tuple[str, str], RouteMetrics]]:
+        with self._lock:
+            return sorted(self._routes.items())
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+            self._slow_requests.clear()
+
+request_metrics = RequestMetrics(SLOW_REQUEST_MS, SLOW_REQUEST_LOG_SIZE)
+
+class RequestMetricsMiddleware:
+    """Time every HTTP request and count the SQL it runs, per matched route, against any query budget.
+
+    A plain ASGI middleware, so streamed responses are timed to their last
+    chunk and handlers run in the context that collects their statements.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        scope_token = current_request_scope.set(scope)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_query_stats.reset(token)
+            current_request_scope.reset(scope_token)
+            # The router records the matched route on the scope, giving a template like /subjects/{subject_id}
+            route = getattr(scope.get("route"), "path", None)
+            request_metrics.record(
+                scope["method"], route, scope["path"], status, (time.perf_counter() - started) * 1000, stats
+            )
+        # Past the finally, so a budget error never hides the handler's own exception
+        check_query_budget(scope, stats)
+
+def metrics_authorized(authorization: Optional[str]) -> bool:
+    """Whether a request may read /metrics, given its Authorization header"""
+    if not METRICS_TOKEN:
+        return True
+    return secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}")
+
+def _labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    routes = request_metrics.routes()
+    lines = []
+
+    def header(name: str, kind: str, help_text: str):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def histogram(name: str, help_text: str, pick):
+        header(name, "histogram", help_text)
+        for (method, route), metrics in routes:
+            values = pick(metrics)
+            for bound, count in values.cumulative():
+                lines.append(f"{name}_bucket{_labels(method=method, route=route, le=_number(bound))} {count}")
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {values.count}")
+            lines.append(f"{name}_sum{_labels(method=method, route=route)} {_number(values.sum)}")
+            lines.append(f"{name}_count{_labels(method=method, route=route)} {values.count}")
+
+    header("http_requests_total", "counter", "HTTP requests handled, by route and status code.")
+    for (method, route), metrics in routes:
+        for status, count in sorted(metrics.statuses.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    histogram("http_request_duration_seconds", "Time from receiving a request to sending the last response byte.",
+              lambda metrics: metrics.latency)
+    histogram("db_queries_per_request", "SQL statements executed while handling one request.",
+              lambda metrics: metrics.queries)
+
+    header("db_query_duration_seconds_total", "counter", "Time spent executing SQL statements, by route.")
+    for (method, route), metrics in routes:
+        lines.append(f"db_query_duration_seconds_total{_labels(method=method, route=route)} {_number(metrics.query_seconds)}")
+
+    header("db_rows_total", "counter", "Rows written, or selected where the driver reports them, by route.")
+    for (method, route), metrics in routes:
+        lines.append(f"db_rows_total{_labels(method=method, route=route)} {metrics.rows}")
+
+    pools = get_pool_metrics()
+    for name, key, help_text in (
+        ("db_pool_checked_out", "checked_out", "Connections currently checked out of the pool."),
+        ("db_pool_size", "size", "Configured pool size."),
+        ("db_pool_overflow", "overflow", "Connections open beyond the pool size."),
+    ):
+        header(name, "gauge", help_text)
+        for engine_name, metrics in pools.items():
+            if key in metrics:
+                lines.append(f"{name}{_labels(engine=engine_name)} {metrics[key]}")
+    header("db_pool_checkouts_total", "counter", "Connections checked out of the pool.")
+    for engine_name, metrics in pools.items():
+        lines.append(f"db_pool_checkouts_total{_labels(engine=engine_name)} {metrics['checkouts']}")
+    header("db_pool_timeouts_total", "counter", "Checkouts that gave up waiting for a connection.")
+    for engine_name, metrics in pools.items():
+        lines.append(f"db_pool_timeouts_total{_labels(engine=engine_name)} {metrics['timeouts']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,234 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # memory, redis or none
+# Upper bound on how stale another worker's copy can get; writes on the same worker invalidate at once
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+# max-age browsers may reuse public catalog responses without revalidating (0: always revalidate)
+CATALOG_MAX_AGE_SECONDS = int(os.getenv("CATALOG_MAX_AGE_SECONDS", "0"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A serialized JSON body, its strong ETag and the decoded payload"""
+    body: bytes
+    etag: str
+    data: Any
+
+    @classmethod
+    def from_data(cls, data) -> "CachedResponse":
+        data = jsonable_encoder(data)
+        body = json.dumps(data, separators=(",", ":")).encode()
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', data=data)
+
+class InMemoryResponseCache:
+    """Per-process LRU cache with a TTL on each entry"""
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Bumped by every invalidation, so a build that started before one doesn't store its result
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            response, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def set(self, key: str, response: CachedResponse, generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (response, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, prefix: str):
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+class RedisResponseCache:
+    """Cache shared between workers, so invalidation reaches all of them"""
+
+    key_prefix = "response:"
+    # Outside key_prefix, so clearing the cache doesn't reset it
+    generation_key = "response-generation"
+
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis
+
+        self.ttl_seconds = ttl_seconds
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            raw = self._client.get(self.key_prefix + key)
+        except Exception as e:
+            logger.warning("Response cache read failed: %s", e)
+            return None
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b"\n")
+        return CachedResponse(body=body, etag=etag.decode(), data=json.loads(body))
+
+    def generation(self) -> Optional[int]:
+        try:
+            return int(self._client.get(self.generation_key) or 0)
+        except Exception as e:
+            logger.warning("Response cache read failed: %s", e)
+            return None
+
+    def set(self, key: str, response: CachedResponse, generation: Optional[int] = None):
+        value = response.etag.encode() + b"\n" + response.body
+        try:
+            if generation is None:
+                self._client.setex(self.key_prefix + key, self.ttl_seconds, value)
+                return
+            # Store only if no worker invalidated since the build started, checked atomically
+            with self._client.pipeline() as pipe:
+                pipe.watch(self.generation_key)
+                if int(pipe.get(self.generation_key) or 0) != generation:
+                    return
+                pipe.multi()
+                pipe.setex(self.key_prefix + key, self.ttl_seconds, value)
+                pipe.execute()
+        except Exception as e:
+            # Includes WatchError, when an invalidation lands between the check and the write
+            logger.warning("Response cache write failed: %s", e)
+
+    def invalidate(self, prefix: str):
+        try:
+            self._client.incr(self.generation_key)
+            for key in self._client.scan_iter(self.key_prefix + prefix + "*"):
+                self._client.delete(key)
+        except Exception as e:
+            logger.warning("Response cache invalidation failed: %s", e)
+
+    def clear(self):
+        self.invalidate("")
+
+class NullResponseCache:
+    """Disables caching so every request hits the database"""
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        return None
+
+    def generation(self) -> int:
+        return 0
+
+    def set(self, key: str, response: CachedResponse, generation: Optional[int] = None):
+        pass
+
+    def invalidate(self, prefix: str):
+        pass
+
+    def clear(self):
+        pass
+
+def _create_cache():
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return RedisResponseCache(REDIS_URL, RESPONSE_CACHE_TTL_SECONDS)
+    if RESPONSE_CACHE_BACKEND == "none":
+        return NullResponseCache()
+    return InMemoryResponseCache(RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_SIZE)
+
+response_cache = _create_cache()
+
+# Cache keys; invalidating a key also drops every key it prefixes
+def library_courses_key() -> str:
+    return "library:courses"
+
+def subject_key(subject_id: int) -> str:
+    return f"subject:{subject_id}:"
+
+def subject_detail_key(subject_id: int) -> str:
+    return f"subject:{subject_id}:detail"
+
+def subject_contents_key(subject_id: int) -> str:
+    return f"subject:{subject_id}:contents"
+
+def content_lessons_key(content_id: int) -> str:
+    return f"content:{content_id}:lessons"
+
+def invalidate_responses(*keys: str):
+    """Drop cached responses for these keys (and any keys they prefix)"""
+    for key in keys:
+        response_cache.invalidate(key)
+
+def invalidate_subject_responses(subject_id: int):
+    """Drop the library listing and everything cached for one subject"""
+    invalidate_responses(library_courses_key(), subject_key(subject_id))
+
+async def get_or_build(key: str, build: Callable) -> CachedResponse:
+    """Get a cached response, building and storing it on a miss; build may be async"""
+    cached = response_cache.get(key)
+    if cached is None:
+        # Taken before reading the database; an invalidation during the build means the result may be stale
+        generation = response_cache.generation()
+        data = build()
+        if inspect.isawaitable(data):
+            data = await data
+        cached = CachedResponse.from_data(data)
+        response_cache.set(key, cached, generation)
+    return cached
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+def conditional_response(request: Request, cached: CachedResponse, public: bool = False) -> Response:
+    """Answer with the cached body, or 304 when the client already holds this ETag"""
+    if public:
+        cache_control = f"public, max-age={CATALOG_MAX_AGE_SECONDS}"
+        if not CATALOG_MAX_AGE_SECONDS:
+            cache_control = "public, no-cache"
+        headers = {"ETag": cached.etag, "Cache-Control": cache_control}
+    else:
+        # Per-user access checks run on every request, so shared caches must not keep these
+        headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if _etag_matches(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
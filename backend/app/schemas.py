@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -99,6 +99,23 @@ class QuestionAttemptBase(BaseModel):
 class QuestionAttemptCreate(QuestionAttemptBase):
     session_id: int
 
+class AttemptAnswer(BaseModel):
+    question_id: int
+    selected_answer: str
+    time_taken: int = Field(0, ge=0)
+
+class AttemptBatchCreate(BaseModel):
+    answers: List[AttemptAnswer] = Field(..., min_length=1, max_length=500)
+
+class AttemptResult(BaseModel):
+    question_id: int
+    selected_answer: str
+    is_correct: bool
+
+class AttemptBatchResponse(BaseModel):
+    session: PracticeSessionResponse
+    results: List[AttemptResult]
+
 class QuestionAttemptResponse(QuestionAttemptBase):
     id: int
     user_id: int
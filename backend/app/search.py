@@ -0,0 +1,357 @@
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event, select, insert, delete, func, literal, text, bindparam, true
+from sqlalchemy.orm import Session
+import bisect
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from dotenv import load_dotenv
+
+from .models import Subject, SubjectContent, Lesson, Question, SearchDocument
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")  # auto, fts (SQLite FTS5 / MySQL FULLTEXT) or python
+# How long the in-process fallback index is kept before it is rebuilt from search_documents
+SEARCH_INDEX_CACHE_SECONDS = int(os.getenv("SEARCH_INDEX_CACHE_SECONDS", "300"))
+
+SEARCH_KINDS = ("subject", "content", "lesson", "question")
+# Query terms beyond this are ignored, keeping intersection cost bounded
+MAX_QUERY_TERMS = 8
+SNIPPET_LENGTH = 160
+# Title matches count this many times a body match when ranking
+TITLE_WEIGHT = 4.0
+
+_documents = SearchDocument.__table__
+_token_pattern = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(value: str) -> List[str]:
+    return _token_pattern.findall((value or "").lower())
+
+def _document_source(kind: str):
+    """Rows of search_documents for a kind, as (select, id column) over the source table"""
+    if kind == "subject":
+        return select(
+            literal("subject"), Subject.id, Subject.id, Subject.name,
+            func.coalesce(Subject.description, ""), func.coalesce(Subject.is_active, true())
+        ), Subject.id
+    if kind == "content":
+        return select(
+            literal("content"), SubjectContent.id, SubjectContent.subject_id,
+            SubjectContent.title, SubjectContent.body, true()
+        ), SubjectContent.id
+    if kind == "lesson":
+        return select(
+            literal("lesson"), Lesson.id, SubjectContent.subject_id, Lesson.title, Lesson.body, true()
+        ).select_from(Lesson).outerjoin(SubjectContent, SubjectContent.id == Lesson.content_id), Lesson.id
+    if kind == "question":
+        return select(
+            literal("question"), Question.id, Question.subject_id, Question.question_text,
+            literal(""), func.coalesce(Question.is_active, true())
+        ), Question.id
+    raise ValueError(f"Unknown search kind: {kind}")
+
+_DOCUMENT_COLUMNS = ["kind", "ref_id", "subject_id", "title", "body", "is_active"]
+
+def index_documents(db, kind: str, *criteria):
+    """Refresh the search documents of the kind's records matching criteria.
+
+    One DELETE and one INSERT ... SELECT, so a bulk import costs two
+    statements. Runs in the caller's transaction; call after flushing the
+    records and before committing.
+    """
+    source, id_column = _document_source(kind)
+    db.execute(delete(_documents).where(
+        _documents.c.kind == kind,
+        _documents.c.ref_id.in_(select(id_column).where(*criteria))
+    ))
+    db.execute(insert(_documents).from_select(_DOCUMENT_COLUMNS, source.where(*criteria)))
+    if isinstance(db, Session) and _fallback_in_use(db):
+        ref_ids = db.execute(select(id_column).where(*criteria)).scalars()
+        _pending_changes(db).update((kind, ref_id) for ref_id in ref_ids)
+
+def remove_documents(db, kind: str, *ref_ids: int):
+    """Drop search documents for deleted records; runs in the caller's transaction"""
+    if not ref_ids:
+        return
+    db.execute(delete(_documents).where(_documents.c.kind == kind, _documents.c.ref_id.in_(ref_ids)))
+    if isinstance(db, Session) and _fallback_in_use(db):
+        _pending_changes(db).update((kind, ref_id) for ref_id in ref_ids)
+
+def rebuild_search_index(db) -> int:
+    """Recreate every search document from the source tables, returning how many there are.
+
+    Works on a Session or a Connection; the caller commits.
+    """
+    db.execute(delete(_documents))
+    for kind in SEARCH_KINDS:
+        source, _ = _document_source(kind)
+        db.execute(insert(_documents).from_select(_DOCUMENT_COLUMNS, source))
+    search_index.clear()
+    return db.execute(select(func.count()).select_from(_documents)).scalar()
+
+def _pending_changes(db: Session) -> set:
+    return db.info.setdefault("search_changes", set())
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_changes(session):
+    changes = session.info.pop("search_changes", None)
+    if changes:
+        search_index.mark_changed(changes)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("search_changes", None)
+
+class InvertedIndex:
+    """Per-process BM25 index over search_documents, for databases without full-text search.
+
+    Built with one scan of the table; records changed by committed writes are
+    re-read on the next search rather than rebuilding everything.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._changed: set = set()
+        self._reset()
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[tuple, float]] = {}
+        self._documents: Dict[tuple, tuple] = {}
+        self._lengths: Dict[tuple, float] = {}
+        self._total_length = 0.0
+        self._vocabulary: Optional[List[str]] = None
+
+    def clear(self):
+        with self._lock:
+            self._loaded_at = None
+            self._changed.clear()
+            self._reset()
+
+    def mark_changed(self, keys):
+        with self._lock:
+            self._changed.update(keys)
+
+    def _add(self, row):
+        key = (row.kind, row.ref_id)
+        weights = Counter()
+        for term in tokenize(row.title):
+            weights[term] += TITLE_WEIGHT
+        for term in tokenize(row.body):
+            weights[term] += 1.0
+        length = sum(weights.values())
+        self._documents[key] = (row.subject_id, row.title, row.body, bool(row.is_active))
+        self._lengths[key] = length
+        self._total_length += length
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._vocabulary = None
+            postings[key] = weight
+
+    def _remove(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        self._total_length -= self._lengths.pop(key)
+        _, title, body, _ = document
+        for term in set(tokenize(title)) | set(tokenize(body)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+                    self._vocabulary = None
+
+    def _refresh(self, db: Session):
+        columns = (
+            SearchDocument.kind, SearchDocument.ref_id, SearchDocument.subject_id,
+            SearchDocument.title, SearchDocument.body, SearchDocument.is_active
+        )
+        if self._loaded_at is None or self._loaded_at + self.ttl_seconds < time.monotonic():
+            self._reset()
+            self._changed.clear()
+            self._loaded_at = time.monotonic()
+            for row in db.query(*columns).yield_per(5000):
+                self._add(row)
+            return
+        if not self._changed:
+            return
+        changed, self._changed = self._changed, set()
+        by_kind: Dict[str, List[int]] = {}
+        for kind, ref_id in changed:
+            self._remove((kind, ref_id))
+            by_kind.setdefault(kind, []).append(ref_id)
+        for kind, ref_ids in by_kind.items():
+            for row in db.query(*columns).filter(SearchDocument.kind == kind, SearchDocument.ref_id.in_(ref_ids)):
+                self._add(row)
+
+    def _expand(self, prefix: str) -> List[str]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\U0010ffff")
+        return self._vocabulary[start:end]
+
+    def search(self, db: Session, terms: List[str], kinds: Sequence[str], active_only: bool,
+               limit: int, offset: int) -> List[tuple]:
+        """Documents containing every term (the last one as a prefix), best BM25 score first"""
+        with self._lock:
+            self._refresh(db)
+            count = len(self._documents)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count or 1.0
+
+            # Each term maps to its postings; the last term may expand to several words
+            matches = []
+            for position, term in enumerate(terms):
+                words = self._expand(term) if position == len(terms) - 1 else [term]
+                postings = [self._postings[word] for word in words if word in self._postings]
+                if not postings:
+                    return []
+                matches.append(postings)
+
+            def keys(postings_list):
+                if len(postings_list) == 1:
+                    return postings_list[0].keys()
+                return set().union(*postings_list)
+
+            matches.sort(key=lambda postings_list: sum(len(postings) for postings in postings_list))
+            candidates = set(keys(matches[0]))
+            for postings_list in matches[1:]:
+                candidates.intersection_update(keys(postings_list))
+                if not candidates:
+                    return []
+
+            scores = Counter()
+            kinds = set(kinds)
+            for key in candidates:
+                if key[0] not in kinds or (active_only and not self._documents[key][3]):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[key] / average_length)
+                for postings_list in matches:
+                    for postings in postings_list:
+                        weight = postings.get(key)
+                        if weight:
+                            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                            scores[key] += idf * weight * (self.k1 + 1) / (weight + norm)
+
+            best = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], -item[0][1]))
+            return [
+                (kind, ref_id, self._documents[(kind, ref_id)][0], self._documents[(kind, ref_id)][1],
+                 self._documents[(kind, ref_id)][2], score)
+                for (kind, ref_id), score in best[offset:]
+            ]
+
+search_index = InvertedIndex(SEARCH_INDEX_CACHE_SECONDS)
+
+_backend_lock = threading.Lock()
+_resolved_backends: Dict[str, str] = {}
+
+def search_backend(db: Session) -> str:
+    """The engine answering searches: fts5, mysql or python"""
+    bind = db.get_bind()
+    dialect = bind.dialect.name
+    with _backend_lock:
+        backend = _resolved_backends.get(dialect)
+    if backend is not None:
+        return backend
+    backend = "python"
+    if SEARCH_BACKEND != "python":
+        if dialect == "sqlite":
+            exists = db.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_documents_fts'"
+            )).first()
+            backend = "fts5" if exists else "python"
+        elif dialect == "mysql":
+            backend = "mysql"
+    with _backend_lock:
+        _resolved_backends[dialect] = backend
+    return backend
+
+def _fallback_in_use(db: Session) -> bool:
+    return search_backend(db) == "python"
+
+def _fts5_query(terms: List[str]) -> str:
+    # Every term quoted so user input can't inject FTS5 syntax; the last one matches as a prefix
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+def _mysql_query(terms: List[str]) -> str:
+    return " ".join(f"+{term}" for term in terms[:-1]) + f" +{terms[-1]}*"
+
+def _search_sql(db: Session, backend: str, terms: List[str], kinds: Sequence[str], active_only: bool,
+                limit: int, offset: int) -> List[tuple]:
+    active = "AND d.is_active = 1 " if active_only else ""
+    if backend == "fts5":
+        # bm25() is lower for better matches; title hits weigh TITLE_WEIGHT times body hits
+        statement = text(
+            "SELECT d.kind, d.ref_id, d.subject_id, d.title, d.body, "
+            f"-bm25(search_documents_fts, {TITLE_WEIGHT}, 1.0) AS score "
+            "FROM search_documents_fts JOIN search_documents d ON d.id = search_documents_fts.rowid "
+            f"WHERE search_documents_fts MATCH :query AND d.kind IN :kinds {active}"
+            "ORDER BY bm25(search_documents_fts, " f"{TITLE_WEIGHT}, 1.0), d.ref_id "
+            "LIMIT :limit OFFSET :offset"
+        )
+        query = _fts5_query(terms)
+    else:
+        statement = text(
+            "SELECT d.kind, d.ref_id, d.subject_id, d.title, d.body, "
+            "MATCH (d.title, d.body) AGAINST (:query IN BOOLEAN MODE) AS score "
+            "FROM search_documents d "
+            f"WHERE MATCH (d.title, d.body) AGAINST (:query IN BOOLEAN MODE) AND d.kind IN :kinds {active}"
+            "ORDER BY score DESC, d.ref_id LIMIT :limit OFFSET :offset"
+        )
+        query = _mysql_query(terms)
+    statement = statement.bindparams(bindparam("kinds", expanding=True))
+    return [tuple(row) for row in db.execute(statement, {
+        "query": query, "kinds": list(kinds), "limit": limit, "offset": offset
+    })]
+
+def snippet(text_value: str, terms: List[str], length: int = SNIPPET_LENGTH) -> str:
+    """A window of text around the first query term it contains"""
+    text_value = " ".join((text_value or "").split())
+    if len(text_value) <= length:
+        return text_value
+    lowered = text_value.lower()
+    positions = [position for position in (lowered.find(term) for term in terms) if position >= 0]
+    start = max(0, min(positions) - length // 4) if positions else 0
+    end = min(len(text_value), start + length)
+    start = max(0, end - length)
+    return ("…" if start else "") + text_value[start:end].strip() + ("…" if end < len(text_value) else "")
+
+def search_documents(db: Session, query: str, kinds: Sequence[str], active_only: bool = True,
+                     limit: int = 20, offset: int = 0) -> Tuple[List[dict], bool]:
+    """Ranked matches for query among kinds, and whether more results follow this page"""
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    if not terms or not kinds:
+        return [], False
+    backend = search_backend(db)
+    if backend == "python":
+        rows = search_index.search(db, terms, kinds, active_only, limit + 1, offset)
+    else:
+        rows = _search_sql(db, backend, terms, kinds, active_only, limit + 1, offset)
+    results = [
+        {
+            "kind": kind,
+            "id": ref_id,
+            "subject_id": subject_id,
+            "title": title,
+            "snippet": snippet(body or title, terms),
+            "score": round(float(score), 4),
+        }
+        for kind, ref_id, subject_id, title, body, score in rows[:limit]
+    ]
+    return results, len(rows) > limit
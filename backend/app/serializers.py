@@ -0,0 +1,86 @@
+from sqlalchemy.orm import Session
+
+from .models import User, Subject, PracticeSession, UserEnrollment
+
+# Column projections for the admin listings. Rows come back as named tuples,
+# so the serializers below never touch ORM instances or lazy relationships.
+ENROLLMENT_COLUMNS = (
+    UserEnrollment.id.label("id"),
+    UserEnrollment.enrolled_at.label("enrolled_at"),
+    User.id.label("user_id"),
+    User.email.label("user_email"),
+    User.full_name.label("user_full_name"),
+    Subject.id.label("subject_id"),
+    Subject.name.label("subject_name"),
+)
+
+PRACTICE_SESSION_COLUMNS = (
+    PracticeSession.id.label("id"),
+    PracticeSession.score.label("score"),
+    PracticeSession.total_questions.label("total_questions"),
+    PracticeSession.correct_answers.label("correct_answers"),
+    PracticeSession.time_taken.label("time_taken"),
+    PracticeSession.completed_at.label("completed_at"),
+    Subject.id.label("subject_id"),
+    Subject.name.label("subject_name"),
+)
+
+PRACTICE_SESSION_USER_COLUMNS = (
+    User.id.label("user_id"),
+    User.email.label("user_email"),
+    User.full_name.label("user_full_name"),
+)
+
+def enrollment_rows_query(db: Session):
+    """Query active enrollments projected onto ENROLLMENT_COLUMNS"""
+    return db.query(*ENROLLMENT_COLUMNS).join(
+        User, UserEnrollment.user_id == User.id
+    ).join(
+        Subject, UserEnrollment.subject_id == Subject.id
+    ).filter(UserEnrollment.is_active == True)
+
+def practice_session_rows_query(db: Session, include_user: bool = True):
+    """Query practice sessions projected onto the session (and optionally user) columns"""
+    columns = PRACTICE_SESSION_COLUMNS + (PRACTICE_SESSION_USER_COLUMNS if include_user else ())
+    query = db.query(*columns).join(Subject, PracticeSession.subject_id == Subject.id)
+    if include_user:
+        query = query.join(User, PracticeSession.user_id == User.id)
+    return query
+
+def serialize_enrollment_row(row) -> dict:
+    """Build an enrollment response from an ENROLLMENT_COLUMNS row"""
+    return {
+        "id": row.id,
+        "user": {
+            "id": row.user_id,
+            "email": row.user_email,
+            "full_name": row.user_full_name
+        },
+        "subject": {
+            "id": row.subject_id,
+            "name": row.subject_name
+        },
+        "enrolled_at": row.enrolled_at
+    }
+
+def serialize_practice_session_row(row, include_user: bool = True) -> dict:
+    """Build a practice session response from a practice_session_rows_query row"""
+    data = {"id": row.id}
+    if include_user:
+        data["user"] = {
+            "id": row.user_id,
+            "email": row.user_email,
+            "full_name": row.user_full_name
+        }
+    data.update({
+        "subject": {
+            "id": row.subject_id,
+            "name": row.subject_name
+        },
+        "score": row.score,
+        "total_questions": row.total_questions,
+        "correct_answers": row.correct_answers,
+        "time_taken": row.time_taken,
+        "completed_at": row.completed_at
+    })
+    return data
@@ -0,0 +1,215 @@
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import List, Optional
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+from .database import engine, async_engine
+from .request_metrics import current_route
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+# Statements taking at least this long (ms) are recorded
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Distinct fingerprints kept; the least recently seen is dropped first
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "500"))
+# Capture the backend's query plan the first time a fingerprint is slow
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+
+SLOW_QUERY_SORT_FIELDS = ("total_ms", "max_ms", "avg_ms", "count", "last_seen")
+# Routes and callers kept per fingerprint, most frequent first
+MAX_SOURCES = 5
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+# Statements EXPLAIN can describe without running them
+_EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+_number_literal = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_placeholder = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+|\?")
+_placeholder_list = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_whitespace = re.compile(r"\s+")
+
+def normalize_sql(statement: str) -> str:
+    """The statement with literals and placeholders as ?, IN lists collapsed and whitespace squeezed"""
+    normalized = _string_literal.sub("?", statement)
+    normalized = _placeholder.sub("?", normalized)
+    normalized = _number_literal.sub("?", normalized)
+    # Expanded IN lists vary in length per call; they are one shape
+    normalized = _placeholder_list.sub("(...)", normalized)
+    return _whitespace.sub(" ", normalized).strip()
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.lower().encode()).hexdigest()[:16]
+
+def bind_shape(parameters, executemany: bool) -> str:
+    """Types of the bound parameters, without their values"""
+    if executemany:
+        rows = list(parameters or [])
+        return f"{bind_shape(rows[0], False) if rows else '()'} x{len(rows)}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name}: {type(value).__name__}" for name, value in parameters.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in parameters or ()) + ")"
+
+def _app_caller(frame) -> Optional[str]:
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_APP_DIR) and filename != _THIS_FILE:
+            module = os.path.relpath(filename, _APP_DIR)[:-len(".py")].replace(os.sep, ".")
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+def calling_function() -> Optional[str]:
+    """The innermost app function (like crud.get_user_statistics) that issued the current statement"""
+    caller = _app_caller(sys._getframe(1))
+    if caller is None:
+        # Async sessions run statements in a greenlet; the awaiting code is on its parent's stack
+        try:
+            import greenlet
+            parent = greenlet.getcurrent().parent
+            caller = _app_caller(parent.gr_frame) if parent is not None else None
+        except Exception:
+            caller = None
+    return caller
+
+def explain(dbapi_connection, dialect_name: str, statement: str, parameters) -> Optional[List[str]]:
+    """The backend's plan for a statement, read on a separate cursor so the statement's own results are untouched"""
+    if not statement.lstrip().lower().startswith(_EXPLAINABLE):
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if dialect_name == "sqlite" else "EXPLAIN "
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+        if dialect_name == "sqlite":
+            # (id, parent, notused, detail): indent each step under its parent
+            depth = {0: -1}
+            lines = []
+            for node_id, parent_id, _, detail in rows:
+                depth[node_id] = depth.get(parent_id, -1) + 1
+                lines.append("  " * depth[node_id] + detail)
+            return lines
+        columns = [column[0] for column in cursor.description or ()]
+        if len(columns) == 1:
+            return [str(row[0]) for row in rows]
+        return [", ".join(f"{name}={value}" for name, value in zip(columns, row)) for row in rows]
+    finally:
+        cursor.close()
+
+class SlowQueryLog:
+    """Slow statements grouped by fingerprint, with timings, sources and a query plan"""
+
+    def __init__(self, threshold_ms: float, max_entries: int):
+        self.threshold_ms = threshold_ms
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, normalized: str, shape: str, duration_ms: float, route: Optional[str],
+               caller: Optional[str]) -> bool:
+        """Add one slow execution, returning True when its fingerprint still needs a plan"""
+        key = fingerprint(normalized)
+        now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {
+                    "fingerprint": key,
+                    "statement": normalized,
+                    "bind_shape": shape,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "first_seen": now,
+                    "routes": Counter(),
+                    "callers": Counter(),
+                    "plan": None,
+                    "plan_requested": False,
+                }
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(key)
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_ms"] = duration_ms
+            entry["last_seen"] = now
+            entry["routes"][route or "(no request)"] += 1
+            entry["callers"][caller or "(unknown)"] += 1
+            needs_plan = not entry["plan_requested"]
+            entry["plan_requested"] = True
+        return needs_plan
+
+    def set_plan(self, normalized: str, plan):
+        with self._lock:
+            entry = self._entries.get(fingerprint(normalized))
+            if entry is not None:
+                entry["plan"] = plan
+
+    def entries(self, sort: str = "total_ms", limit: int = 50) -> List[dict]:
+        """Recorded fingerprints, largest first by sort"""
+        with self._lock:
+            entries = [
+                {
+                    "fingerprint": entry["fingerprint"],
+                    "statement": entry["statement"],
+                    "bind_shape": entry["bind_shape"],
+                    "count": entry["count"],
+                    "avg_ms": round(entry["total_ms"] / entry["count"], 2),
+                    "max_ms": round(entry["max_ms"], 2),
+                    "last_ms": round(entry["last_ms"], 2),
+                    "total_ms": round(entry["total_ms"], 2),
+                    "first_seen": entry["first_seen"],
+                    "last_seen": entry["last_seen"],
+                    "routes": dict(entry["routes"].most_common(MAX_SOURCES)),
+                    "callers": dict(entry["callers"].most_common(MAX_SOURCES)),
+                    "plan": entry["plan"],
+                }
+                for entry in self._entries.values()
+            ]
+        entries.sort(key=lambda entry: entry[sort], reverse=True)
+        return entries[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_LOG_SIZE)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms < slow_query_log.threshold_ms:
+        return
+    try:
+        normalized = normalize_sql(statement)
+        needs_plan = slow_query_log.record(
+            normalized, bind_shape(parameters, executemany), duration_ms, current_route(), calling_function()
+        )
+        # A streamed (server-side) result is still being read on this connection; leave it alone
+        if needs_plan and SLOW_QUERY_EXPLAIN and not context.execution_options.get("stream_results"):
+            plan_parameters = parameters[0] if executemany and parameters else parameters
+            slow_query_log.set_plan(normalized, explain(
+                conn.connection.dbapi_connection, conn.dialect.name, statement, plan_parameters
+            ))
+    except Exception as e:
+        # Diagnostics must never fail the statement being diagnosed
+        logger.warning("Slow query capture failed: %s", e)
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,49 @@
+from typing import AsyncIterator, Iterator, List
+import zlib
+
+def _split_lines(chunk: bytes, pending: List[bytes]) -> Iterator[bytes]:
+    """Complete lines ending in chunk; the unfinished tail is kept in pending.
+
+    Only the new chunk is searched for newlines and a line's pieces are
+    joined once, so a long line costs time in proportion to its length.
+    """
+    start = 0
+    while True:
+        end = chunk.find(b"\n", start)
+        if end < 0:
+            break
+        if pending:
+            pending.append(chunk[start:end])
+            line = b"".join(pending)
+            pending.clear()
+        else:
+            line = chunk[start:end]
+        yield line
+        start = end + 1
+    if start < len(chunk):
+        pending.append(chunk[start:])
+
+async def iter_upload_lines(chunks: AsyncIterator[bytes], keep_blank: bool = False) -> AsyncIterator[bytes]:
+    """Split a streamed upload into lines, gunzipping on the fly when it starts with the gzip magic"""
+    decompressor = None
+    started = False
+    pending = []
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if not started:
+            started = True
+            if chunk[:2] == b"\x1f\x8b":
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        for line in _split_lines(chunk, pending):
+            if keep_blank or line.strip():
+                yield line
+    if decompressor:
+        for line in _split_lines(decompressor.flush(), pending):
+            if keep_blank or line.strip():
+                yield line
+    last = b"".join(pending)
+    if last.strip():
+        yield last
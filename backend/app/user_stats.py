@@ -0,0 +1,142 @@
+from typing import Iterable, Optional
+from sqlalchemy import select, insert, update, delete, func, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import User, Subject, PracticeSession, QuestionAttempt, UserStats, UserSubjectStats
+
+_user_stats = UserStats.__table__
+_subject_stats = UserSubjectStats.__table__
+
+# Derived tables, cleared before the tables they reference
+STATS_TABLES = [_subject_stats, _user_stats]
+
+def bump_rollup(db: Session, table, key: dict, **deltas):
+    """Add deltas to a rollup row in SQL, creating the row on first use"""
+    if all(isinstance(delta, (int, float)) and not delta for delta in deltas.values()):
+        return
+    where = [table.c[column] == value for column, value in key.items()]
+    values = {column: table.c[column] + delta for column, delta in deltas.items()}
+    if db.execute(update(table).where(*where).values(values)).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(table).values(**key, **deltas))
+    except IntegrityError:
+        # A concurrent transaction created the row first
+        db.execute(update(table).where(*where).values(values))
+
+def record_session_added(db: Session, user_id: int, subject_id: int, score: float = 0.0):
+    """Count a new practice session; runs in the caller's transaction"""
+    bump_rollup(db, _user_stats, {"user_id": user_id}, sessions=1, score_sum=score or 0.0)
+    bump_rollup(db, _subject_stats, {"user_id": user_id, "subject_id": subject_id}, sessions=1)
+
+def record_attempts_added(db: Session, user_id: int, attempts: int, correct: int, score_change=0.0):
+    """Count new attempts and any change they made to a session score; runs in the caller's transaction"""
+    bump_rollup(db, _user_stats, {"user_id": user_id}, attempts=attempts, correct_answers=correct, score_sum=score_change)
+
+def record_score_changed(db: Session, user_id: int, score_change: float):
+    """Apply an edited session score to the user's score total"""
+    bump_rollup(db, _user_stats, {"user_id": user_id}, score_sum=score_change)
+
+def record_sessions_removed(db: Session, *criteria):
+    """Take the sessions matching criteria, and their attempts, out of the totals.
+
+    Call before deleting them, in the same transaction. Totals are gathered
+    with two grouped queries, so the cost doesn't grow with a loop per session.
+    """
+    session_ids = select(PracticeSession.id).where(*criteria)
+    sessions = db.query(
+        PracticeSession.user_id, PracticeSession.subject_id,
+        func.count(PracticeSession.id), func.coalesce(func.sum(PracticeSession.score), 0.0)
+    ).filter(*criteria).group_by(PracticeSession.user_id, PracticeSession.subject_id).all()
+    attempts = db.query(
+        QuestionAttempt.user_id, func.count(QuestionAttempt.id),
+        func.count(case((QuestionAttempt.is_correct == True, 1)))
+    ).filter(QuestionAttempt.session_id.in_(session_ids)).group_by(QuestionAttempt.user_id).all()
+
+    for user_id, subject_id, count, score_sum in sessions:
+        bump_rollup(db, _user_stats, {"user_id": user_id}, sessions=-count, score_sum=-score_sum)
+        bump_rollup(db, _subject_stats, {"user_id": user_id, "subject_id": subject_id}, sessions=-count)
+    for user_id, count, correct in attempts:
+        bump_rollup(db, _user_stats, {"user_id": user_id}, attempts=-count, correct_answers=-correct)
+    if sessions:
+        db.execute(delete(_subject_stats).where(_subject_stats.c.sessions <= 0))
+
+def remove_user_stats(db: Session, user_ids):
+    """Drop the rollup rows of user_ids (a list or a SELECT of ids), before the users are deleted"""
+    for table in STATS_TABLES:
+        db.execute(delete(table).where(table.c.user_id.in_(user_ids)))
+
+def rebuild_user_stats(db, user_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute the rollups from practice_sessions and question_attempts.
+
+    Works on a Session or a Connection, for every user or only user_ids, with
+    set-based INSERT ... SELECT statements. Returns the number of users with
+    a stats row afterwards. The caller commits.
+    """
+    user_ids = list(user_ids) if user_ids is not None else None
+
+    def only(column):
+        return [column.in_(user_ids)] if user_ids is not None else []
+
+    for table in STATS_TABLES:
+        db.execute(delete(table).where(*only(table.c.user_id)))
+
+    session_totals = select(
+        PracticeSession.user_id.label("user_id"),
+        func.count(PracticeSession.id).label("sessions"),
+        func.coalesce(func.sum(PracticeSession.score), 0.0).label("score_sum"),
+    ).where(*only(PracticeSession.user_id)).group_by(PracticeSession.user_id).subquery()
+    attempt_totals = select(
+        QuestionAttempt.user_id.label("user_id"),
+        func.count(QuestionAttempt.id).label("attempts"),
+        func.count(case((QuestionAttempt.is_correct == True, 1))).label("correct_answers"),
+    ).where(*only(QuestionAttempt.user_id)).group_by(QuestionAttempt.user_id).subquery()
+    db.execute(insert(_user_stats).from_select(
+        ["user_id", "sessions", "score_sum", "attempts", "correct_answers"],
+        select(
+            User.id,
+            func.coalesce(session_totals.c.sessions, 0),
+            func.coalesce(session_totals.c.score_sum, 0.0),
+            func.coalesce(attempt_totals.c.attempts, 0),
+            func.coalesce(attempt_totals.c.correct_answers, 0),
+        ).select_from(User.__table__)
+        .outerjoin(session_totals, session_totals.c.user_id == User.id)
+        .outerjoin(attempt_totals, attempt_totals.c.user_id == User.id)
+        .where(
+            (session_totals.c.user_id != None) | (attempt_totals.c.user_id != None),
+            *only(User.id)
+        )
+    ))
+    db.execute(insert(_subject_stats).from_select(
+        ["user_id", "subject_id", "sessions"],
+        select(
+            PracticeSession.user_id, PracticeSession.subject_id, func.count(PracticeSession.id)
+        ).where(*only(PracticeSession.user_id)).group_by(PracticeSession.user_id, PracticeSession.subject_id)
+    ))
+    return db.execute(
+        select(func.count()).select_from(_user_stats).where(*only(_user_stats.c.user_id))
+    ).scalar()
+
+def get_user_stats(db: Session, user_id: int) -> dict:
+    """Read a user's statistics from the rollups: one row plus their practiced subjects"""
+    stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
+    subjects = db.query(Subject.name).join(
+        UserSubjectStats, UserSubjectStats.subject_id == Subject.id
+    ).filter(
+        UserSubjectStats.user_id == user_id,
+        UserSubjectStats.sessions > 0
+    ).order_by(Subject.id).all()
+
+    sessions = stats.sessions if stats else 0
+    attempts = stats.attempts if stats else 0
+    correct = stats.correct_answers if stats else 0
+    return {
+        "total_sessions": sessions,
+        "average_score": round(stats.score_sum / sessions, 2) if sessions else 0.0,
+        "total_questions_attempted": attempts,
+        "total_correct_answers": correct,
+        "accuracy_rate": round((correct / attempts * 100) if attempts > 0 else 0, 2),
+        "subjects_practiced": [name for (name,) in subjects]
+    }
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Backfill the daily_subject_stats rollups behind /admin/practice-analytics.
+Writes keep the rollups current; run this to rebuild a date range (or all
+history) after importing or editing sessions and attempts directly.
+
+    python backfill_daily_stats.py                                    # all history
+    python backfill_daily_stats.py --start 2026-01-01 --end 2026-03-31
+"""
+
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
+# Add the app directory to the Python path
+sys.path.append(str(Path(__file__).parent / "app"))
+
+from app.database import SessionLocal
+from app.migrations import upgrade_database
+from app.daily_stats import rebuild_daily_stats
+
+def main():
+    """Main function to backfill daily statistics"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--start", type=date.fromisoformat, help="first day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+    if args.start and args.end and args.start > args.end:
+        parser.error("--start must not be after --end")
+
+    upgrade_database()
+
+    db = SessionLocal()
+    try:
+        count = rebuild_daily_stats(db, args.start, args.end)
+        db.commit()
+        print(f"Backfilled {count} subject-day rows")
+    except Exception as e:
+        db.rollback()
+        print(f"Error backfilling daily statistics: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
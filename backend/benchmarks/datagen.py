@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Synthetic dataset generator for benchmarks
+Fills a database with users, subjects, questions, enrollments, practice
+sessions and question attempts using chunked Core inserts, then rebuilds the
+statistics rollups and search index from them. Sessions are consistent with
+their attempts (score and correct_answers match), spread over --days.
+
+Point DATABASE_URL at a scratch database, then:
+    python benchmarks/datagen.py --users 10000 --sessions 200000 --attempts 2000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select, text
+
+from app.auth import get_password_hash
+from app.daily_stats import rebuild_daily_stats
+from app.models import User, Subject, Question, UserEnrollment, PracticeSession, QuestionAttempt
+from app.search import rebuild_search_index
+from app.user_stats import rebuild_user_stats
+
+PASSWORD = "bench-password"
+DIFFICULTY_LEVELS = ("easy", "medium", "hard")
+# Chance a generated attempt is correct, by question difficulty
+CORRECT_RATE = {"easy": 0.8, "medium": 0.6, "hard": 0.4}
+WORDS = (
+    "algebra equation function limit vector matrix probability statistics geometry triangle circle "
+    "integral derivative series sequence proof theorem graph network energy force motion cell "
+    "molecule reaction history economy language grammar essay poem climate planet orbit"
+).split()
+
+
+@dataclass
+class DatasetSpec:
+    users: int = 1000
+    subjects: int = 20
+    questions_per_subject: int = 200
+    enrollments_per_user: int = 3
+    sessions: int = 10000
+    attempts: int = 100000
+    days: int = 180
+    chunk_size: int = 10000
+    seed: int = 1234
+
+
+def _next_id(conn, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _insert_chunks(engine, model, rows, chunk_size: int) -> int:
+    """Insert rows from an iterator in executemany chunks, one transaction per chunk"""
+    chunk = []
+    total = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            with engine.begin() as conn:
+                conn.execute(insert(model), chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        with engine.begin() as conn:
+            conn.execute(insert(model), chunk)
+        total += len(chunk)
+    return total
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def generate(engine, spec: DatasetSpec, log=print) -> dict:
+    """Add a synthetic dataset to the database behind engine, returning row counts and timings.
+
+    Ids continue after any existing rows, so the generator can top up a
+    database. Rollups and the search index are rebuilt at the end.
+    """
+    rng = random.Random(spec.seed)
+    started = time.perf_counter()
+    now = datetime.utcnow().replace(microsecond=0)
+    hashed = get_password_hash(PASSWORD)
+
+    with engine.connect() as conn:
+        first = {model: _next_id(conn, model) for model in (User, Subject, Question, PracticeSession, QuestionAttempt)}
+    user_ids = range(first[User], first[User] + spec.users)
+    subject_ids = range(first[Subject], first[Subject] + spec.subjects)
+    timings = {}
+
+    def timed(name, count_rows):
+        table_started = time.perf_counter()
+        count = count_rows()
+        timings[name] = {"rows": count, "seconds": round(time.perf_counter() - table_started, 2)}
+        log(f"{name}: {count} rows in {timings[name]['seconds']}s")
+
+    timed("users", lambda: _insert_chunks(engine, User, (
+        {
+            "id": user_id,
+            "email": f"user{user_id}@bench.example.com",
+            "full_name": f"Bench User {user_id}",
+            "hashed_password": hashed,
+            "is_active": True,
+            "is_admin": index == 0,
+        } for index, user_id in enumerate(user_ids)
+    ), spec.chunk_size))
+
+    timed("subjects", lambda: _insert_chunks(engine, Subject, (
+        {"id": subject_id, "name": f"Subject {subject_id}", "description": _sentence(rng, 12), "is_active": True}
+        for subject_id in subject_ids
+    ), spec.chunk_size))
+
+    # Question ids are laid out subject by subject, so a subject's questions are a contiguous range
+    difficulties = []
+
+    def questions():
+        question_id = first[Question]
+        for subject_id in subject_ids:
+            for _ in range(spec.questions_per_subject):
+                level = rng.choice(DIFFICULTY_LEVELS)
+                difficulties.append(level)
+                yield {
+                    "id": question_id,
+                    "subject_id": subject_id,
+                    "question_text": _sentence(rng, 10) + "?",
+                    "option_a": "A", "option_b": "B", "option_c": "C", "option_d": "D",
+                    "correct_answer": rng.choice("ABCD"),
+                    "explanation": None,
+                    "difficulty_level": level,
+                    "is_active": True,
+                }
+                question_id += 1
+
+    timed("questions", lambda: _insert_chunks(engine, Question, questions(), spec.chunk_size))
+
+    timed("user_enrollments", lambda: _insert_chunks(engine, UserEnrollment, (
+        {"user_id": user_id, "subject_id": subject_id, "is_active": True}
+        for user_id in user_ids
+        for subject_id in rng.sample(subject_ids, min(spec.enrollments_per_user, spec.subjects))
+    ), spec.chunk_size))
+
+    # Attempts per session, spread so they add up to spec.attempts exactly
+    sessions = max(spec.sessions, 1 if spec.attempts else 0)
+    # Each session's answers come from their own seed, so both passes see the same ones without keeping them
+    session_plans = []
+
+    def answers(subject_id: int, count: int, session_seed: int):
+        session_rng = random.Random(session_seed)
+        base = (subject_id - first[Subject]) * spec.questions_per_subject
+        for _ in range(count):
+            offset = base + session_rng.randrange(spec.questions_per_subject)
+            yield first[Question] + offset, session_rng.random() < CORRECT_RATE[difficulties[offset]]
+
+    def practice_sessions():
+        for index in range(sessions):
+            session_id = first[PracticeSession] + index
+            user_id = rng.choice(user_ids)
+            subject_id = rng.choice(subject_ids)
+            completed_at = now - timedelta(seconds=rng.randrange(spec.days * 86400))
+            count = spec.attempts // sessions + (1 if index < spec.attempts % sessions else 0)
+            session_seed = rng.getrandbits(32)
+            correct = sum(is_correct for _, is_correct in answers(subject_id, count, session_seed))
+            session_plans.append((session_id, user_id, subject_id, completed_at, count, session_seed))
+            yield {
+                "id": session_id,
+                "user_id": user_id,
+                "subject_id": subject_id,
+                "score": round(correct / count * 100, 2) if count else 0.0,
+                "total_questions": count,
+                "correct_answers": correct,
+                "time_taken": 20 * count,
+                "completed_at": completed_at,
+            }
+
+    if spec.questions_per_subject and spec.subjects and spec.users:
+        timed("practice_sessions", lambda: _insert_chunks(engine, PracticeSession, practice_sessions(), spec.chunk_size))
+
+    def question_attempts():
+        attempt_id = first[QuestionAttempt]
+        for session_id, user_id, subject_id, completed_at, count, session_seed in session_plans:
+            for position, (question_id, is_correct) in enumerate(answers(subject_id, count, session_seed)):
+                yield {
+                    "id": attempt_id,
+                    "user_id": user_id,
+                    "question_id": question_id,
+                    "session_id": session_id,
+                    "selected_answer": "A",
+                    "is_correct": is_correct,
+                    "time_taken": 20,
+                    "attempted_at": completed_at - timedelta(seconds=20 * (count - position)),
+                }
+                attempt_id += 1
+
+    if session_plans:
+        timed("question_attempts", lambda: _insert_chunks(engine, QuestionAttempt, question_attempts(), spec.chunk_size))
+
+    rollups_started = time.perf_counter()
+    with engine.begin() as conn:
+        rebuild_user_stats(conn)
+        rebuild_daily_stats(conn)
+        rebuild_search_index(conn)
+        if conn.dialect.name == "postgresql":
+            # Explicit ids don't advance the sequences
+            for model in (User, Subject, Question, UserEnrollment, PracticeSession, QuestionAttempt):
+                table = model.__table__.name
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+                ))
+    timings["rollups"] = {"seconds": round(time.perf_counter() - rollups_started, 2)}
+    log(f"rollups and search index rebuilt in {timings['rollups']['seconds']}s")
+
+    return {
+        "spec": asdict(spec),
+        "first_user_id": first[User],
+        "tables": timings,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser, defaults: DatasetSpec = DatasetSpec()):
+    """Dataset size options, shared with the scenario runner"""
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--subjects", type=int, default=defaults.subjects)
+    parser.add_argument("--questions-per-subject", type=int, default=defaults.questions_per_subject)
+    parser.add_argument("--enrollments-per-user", type=int, default=defaults.enrollments_per_user)
+    parser.add_argument("--sessions", type=int, default=defaults.sessions)
+    parser.add_argument("--attempts", type=int, default=defaults.attempts)
+    parser.add_argument("--days", type=int, default=defaults.days, help="history the sessions are spread over")
+    parser.add_argument("--chunk-size", type=int, default=defaults.chunk_size, help="rows per executemany")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def spec_from_args(args) -> DatasetSpec:
+    return DatasetSpec(
+        users=args.users,
+        subjects=args.subjects,
+        questions_per_subject=args.questions_per_subject,
+        enrollments_per_user=args.enrollments_per_user,
+        sessions=args.sessions,
+        attempts=args.attempts,
+        days=args.days,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    from app.database import engine
+    from app.migrations import upgrade_database
+
+    upgrade_database()
+    summary = generate(engine, spec_from_args(args), log=lambda line: print(line, file=sys.stderr))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
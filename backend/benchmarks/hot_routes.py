@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Concurrent load benchmark for the hot StudentLearn routes
+Drives the ASGI app in-process with httpx while admin reports run alongside,
+and prints p50/p95/p99 latency per route as JSON.
+
+Run it on two checkouts to compare before/after:
+    python benchmarks/hot_routes.py --concurrency 50 --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# The app reads DATABASE_URL at import time, so point it at a scratch DB first
+_db_file = os.path.join(tempfile.mkdtemp(prefix="studentlearn-bench-"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import event, insert
+
+from app.main import app
+from app.auth import get_password_hash, create_access_token
+from app import database
+from app.database import engine
+from app.migrations import upgrade_database
+from app.models import User, Subject, UserEnrollment
+
+PASSWORD = "bench-password"
+
+
+def seed(users: int, subjects: int, enrollments_per_user: int):
+    """Insert a synthetic dataset with Core bulk inserts"""
+    upgrade_database()
+    hashed = get_password_hash(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "email": f"user{i}@bench.example.com",
+                "full_name": f"Bench User {i}",
+                "hashed_password": hashed,
+                "is_active": True,
+                "is_admin": i == 0,
+            } for i in range(users)
+        ])
+        conn.execute(insert(Subject), [
+            {"name": f"Subject {i}", "description": f"Benchmark subject {i}", "is_active": True}
+            for i in range(subjects)
+        ])
+        rows = []
+        for user_id in range(1, users + 1):
+            for subject_id in random.sample(range(1, subjects + 1), min(enrollments_per_user, subjects)):
+                rows.append({"user_id": user_id, "subject_id": subject_id, "is_active": True})
+        if rows:
+            conn.execute(insert(UserEnrollment), rows)
+
+
+def add_db_latency(latency_ms: float):
+    """Simulate a networked database by sleeping wherever each statement waits.
+
+    A sync driver blocks the calling thread (the event loop for sync calls in
+    async handlers), so the sync engine sleeps in before_cursor_execute.
+    aiosqlite runs statements on its own worker thread, so the async engine
+    sleeps in a sqlite trace callback on that thread instead.
+    """
+    def slow_cursor(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(latency_ms / 1000)
+
+    def slow_statement(statement):
+        time.sleep(latency_ms / 1000)
+
+    def on_async_connect(dbapi_connection, connection_record):
+        dbapi_connection.driver_connection._conn.set_trace_callback(slow_statement)
+
+    event.listen(engine, "before_cursor_execute", slow_cursor)
+    if hasattr(database, "async_engine"):
+        event.listen(database.async_engine.sync_engine, "connect", on_async_connect)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(args):
+    seed(args.users, args.subjects, args.enrollments)
+    if args.db_latency_ms:
+        add_db_latency(args.db_latency_ms)
+    tokens = [create_access_token(data={"sub": f"user{i}@bench.example.com"}) for i in range(args.users)]
+    admin_headers = {"Authorization": f"Bearer {tokens[0]}"}
+
+    latencies = {}
+    errors = {}
+    remaining = args.requests
+    done = asyncio.Event()
+
+    async def timed(client, name, method, url, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        latencies.setdefault(name, []).append(elapsed_ms)
+        if response.status_code >= 400:
+            errors[name] = errors.get(name, 0) + 1
+
+    async def worker(client):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            user = random.randrange(1, args.users)
+            headers = {"Authorization": f"Bearer {tokens[user]}"}
+            subject_id = random.randint(1, args.subjects)
+            roll = random.random()
+            if roll < args.login_ratio:
+                await timed(client, "POST /auth/login", "POST", "/auth/login",
+                            json={"email": f"user{user}@bench.example.com", "password": PASSWORD})
+            elif roll < 0.45:
+                await timed(client, "GET /library/courses", "GET", "/library/courses")
+            elif roll < 0.70:
+                await timed(client, "GET /my-courses", "GET", "/my-courses", headers=headers)
+            elif roll < 0.90:
+                await timed(client, "GET /enrollments/check/{id}", "GET",
+                            f"/enrollments/check/{subject_id}", headers=headers)
+            else:
+                await timed(client, "POST /enrollments/{id}", "POST",
+                            f"/enrollments/{subject_id}", headers=headers)
+
+    async def admin_reports(client):
+        # Slow dashboard polling that used to stall everything else
+        while not done.is_set():
+            await timed(client, "GET /admin/statistics", "GET", "/admin/statistics", headers=admin_headers)
+            await asyncio.sleep(0)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        reporters = [asyncio.create_task(admin_reports(client)) for _ in range(args.admin_pollers)]
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*reporters)
+
+    return {
+        "concurrency": args.concurrency,
+        "db_latency_ms": args.db_latency_ms,
+        "requests": args.requests,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "routes": {
+            name: {
+                "count": len(samples),
+                "errors": errors.get(name, 0),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+            } for name, samples in sorted(latencies.items())
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--subjects", type=int, default=50)
+    parser.add_argument("--enrollments", type=int, default=5, help="enrollments per user")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--admin-pollers", type=int, default=2)
+    parser.add_argument("--login-ratio", type=float, default=0.05,
+                        help="share of requests that hit /auth/login (bcrypt heavy)")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0,
+                        help="simulated per-statement database round-trip")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
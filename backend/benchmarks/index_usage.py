@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Index usage check
+Migrates a scratch SQLite database, seeds a small synthetic dataset (see
+datagen.py) and runs the hot queries, through the app's own functions where
+it has them. Every statement they issue is explained with EXPLAIN QUERY
+PLAN, and the check exits with status 1 when a query no longer uses the
+index added for it (alembic/versions/0002_hot_path_indexes.py).
+
+    python benchmarks/index_usage.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Before the app is imported: a scratch database for the migrations to build
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='studentlearn-indexes-'), 'indexes.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.orm import contains_eager
+
+from app.aggregates import get_subject_analytics
+from app.crud import get_user_enrolled_subjects, get_user_practice_sessions, get_user_question_attempts, is_user_enrolled
+from app.database import SessionLocal, engine
+from app.migrations import upgrade_database
+from app.models import PracticeSession, QuestionAttempt
+from app.question_pool import get_recent_question_ids, question_pool_cache
+from app.user_stats import rebuild_user_stats
+from benchmarks import datagen
+
+# (index the query must use, what the query is, how the app runs it); filters written out here mirror app/main.py and app/jobs.py
+HOT_QUERIES = [
+    ("ix_question_attempts_user_id_attempted_at", "recent attempts of a user",
+     lambda db, ids: get_recent_question_ids(db, ids["user_id"])),
+    ("ix_question_attempts_user_id_attempted_at", "attempt history of a user",
+     lambda db, ids: get_user_question_attempts(db, ids["user_id"], limit=50)),
+    ("ix_question_attempts_user_id_is_correct", "rebuilding a user's stats",
+     lambda db, ids: rebuild_user_stats(db, [ids["user_id"]])),
+    ("ix_question_attempts_session_id", "attempts of a session",
+     lambda db, ids: db.query(QuestionAttempt).join(QuestionAttempt.question).options(
+         contains_eager(QuestionAttempt.question)
+     ).filter(QuestionAttempt.session_id == ids["session_id"]).all()),
+    ("ix_question_attempts_question_id", "attempts of a question",
+     lambda db, ids: db.query(func.count(QuestionAttempt.id)).filter(
+         QuestionAttempt.question_id == ids["question_id"]
+     ).scalar()),
+    ("ix_practice_sessions_user_id_completed_at", "practice history of a user",
+     lambda db, ids: get_user_practice_sessions(db, ids["user_id"], limit=50)),
+    ("ix_practice_sessions_subject_id_score", "average score per subject",
+     lambda db, ids: get_subject_analytics(db)),
+    ("ix_practice_sessions_completed_at", "sessions past the cleanup cutoff",
+     lambda db, ids: db.query(QuestionAttempt).filter(QuestionAttempt.session_id.in_(
+         select(PracticeSession.id).where(PracticeSession.completed_at <= ids["cutoff"])
+     )).delete(synchronize_session=False)),
+    ("ix_user_enrollments_user_id_is_active", "subjects a user is enrolled in",
+     lambda db, ids: get_user_enrolled_subjects(db, ids["user_id"])),
+    ("ix_user_enrollments_subject_id_is_active", "active enrollments per subject",
+     lambda db, ids: get_subject_analytics(db)),
+    ("uq_user_enrollments_user_id_subject_id", "enrollment check",
+     lambda db, ids: is_user_enrolled(db, ids["user_id"], ids["subject_id"])),
+    ("ix_questions_subject_id_is_active_difficulty", "question pool of a subject",
+     lambda db, ids: question_pool_cache.get(db, ids["subject_id"])),
+]
+
+# Statements worth a plan; savepoints and the like have none
+EXPLAINED = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+@contextmanager
+def capture_statements():
+    """Collect (statement, parameters) for everything run on the engine inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def explain(conn, statement: str, parameters) -> str:
+    """The query plan SQLite picks for a statement, one step per line"""
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return "\n".join(row[-1] for row in rows)
+
+def query_plans(db, run, ids) -> list:
+    """Plans for every statement running the query issues; any writes are rolled back"""
+    question_pool_cache.clear()
+    with capture_statements() as statements:
+        run(db, ids)
+    db.rollback()
+    with engine.connect() as conn:
+        return [explain(conn, statement, parameters) for statement, parameters in statements
+                if statement.lstrip().upper().startswith(EXPLAINED)]
+
+def seed() -> dict:
+    """A small dataset with its planner statistics, returning the ids the hot queries use"""
+    summary = datagen.generate(engine, datagen.DatasetSpec(
+        users=200, subjects=50, questions_per_subject=40, sessions=4000, attempts=40000
+    ), log=lambda line: None)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+        user_id = summary["first_user_id"] + 1
+        session_id, subject_id = conn.execute(
+            select(PracticeSession.id, PracticeSession.subject_id).where(PracticeSession.user_id == user_id).limit(1)
+        ).one()
+        question_id = conn.execute(
+            select(QuestionAttempt.question_id).where(QuestionAttempt.session_id == session_id).limit(1)
+        ).scalar()
+        cutoff = conn.execute(select(func.min(PracticeSession.completed_at))).scalar()
+    return {
+        "user_id": user_id,
+        "subject_id": subject_id,
+        "session_id": session_id,
+        "question_id": question_id,
+        "cutoff": cutoff,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print every query plan")
+    args = parser.parse_args()
+
+    upgrade_database()
+    ids = seed()
+    failures = []
+    with SessionLocal() as db:
+        for index, label, run in HOT_QUERIES:
+            plans = query_plans(db, run, ids)
+            used = any(index in plan for plan in plans)
+            print(f"{label:36} {index:46} {'ok' if used else 'NOT USED'}")
+            if args.verbose or not used:
+                for plan in plans:
+                    print("    " + plan.replace("\n", "\n    "))
+            if not used:
+                failures.append(f"{label} does not use {index}")
+
+    if failures:
+        print("\nIndex usage check failed:", file=sys.stderr)
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        sys.exit(1)
+    print("\nAll hot queries use their indexes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Query budget check
+Seeds a small synthetic dataset (see datagen.py), then calls every route
+with caches disabled, counting the SQL statements each request runs. Exits
+with status 1 when a route that declares a budget (@query_budget in
+app/main.py) goes over it, or has no sample request here to exercise it.
+Routes that list every subject are then called again after the number of
+subjects doubles, and must run the same number of statements.
+
+    python benchmarks/query_budgets.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Before the app is imported: a scratch database, and every cache off so each request takes its cold path
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='studentlearn-budgets-'), 'budgets.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.update({
+    "QUERY_BUDGET_MODE": "raise",
+    "PRINCIPAL_CACHE_BACKEND": "none",
+    "RESPONSE_CACHE_BACKEND": "none",
+    "ADMIN_STATS_CACHE_SECONDS": "0",
+    "ANSWER_KEY_CACHE_SECONDS": "0",
+    "QUESTION_POOL_CACHE_SECONDS": "0",
+})
+
+from sqlalchemy import event, select
+from starlette.routing import Match
+
+from app.auth import create_access_token
+from app.database import engine, async_engine
+from app.main import app
+from app.migrations import upgrade_database
+from app.models import PracticeSession, Question
+from app.query_budget import QueryBudgetExceeded, route_budget, route_budgets
+from benchmarks import datagen
+
+# One request per route: (method, path template, request options). Templates are filled from the seeded ids.
+SAMPLE_REQUESTS = [
+    ("POST", "/auth/login", {"json": "login"}),
+    ("GET", "/auth/me", {"as": "student"}),
+    ("GET", "/practice/subjects", {}),
+    ("GET", "/practice/questions/{subject_id}", {"as": "student", "params": {"limit": 10}}),
+    ("GET", "/practice/questions/{subject_id}", {"as": "student", "params": {"limit": 10, "mode": "adaptive"}}),
+    ("GET", "/users", {"as": "admin"}),
+    ("GET", "/search", {"as": "admin", "params": {"q": "algebra matr"}}),
+    ("GET", "/library/courses", {}),
+    ("GET", "/subjects/{subject_id}", {"as": "student"}),
+    ("GET", "/subjects", {"as": "admin"}),
+    ("GET", "/subjects/{subject_id}/contents", {"as": "admin"}),
+    ("GET", "/contents/{content_id}/lessons", {"as": "admin"}),
+    ("GET", "/my-courses", {"as": "student"}),
+    ("GET", "/enrollments/check/{subject_id}", {"as": "student"}),
+    ("POST", "/practice-sessions/{session_id}/attempts:batch", {"as": "student", "json": "answers"}),
+    ("GET", "/admin/users", {"as": "admin", "params": {"limit": 50}}),
+    ("GET", "/admin/users/{user_id}", {"as": "admin"}),
+    ("GET", "/admin/statistics", {"as": "admin"}),
+    ("GET", "/admin/user/{user_id}/statistics", {"as": "admin"}),
+    ("GET", "/admin/subjects/analytics", {"as": "admin"}),
+    ("GET", "/admin/enrollments", {"as": "admin", "params": {"limit": 50}}),
+    ("GET", "/admin/questions", {"as": "admin", "params": {"limit": 50}}),
+    ("GET", "/admin/questions/{question_id}", {"as": "admin"}),
+    ("GET", "/admin/practice-sessions", {"as": "admin", "params": {"limit": 50}}),
+    ("GET", "/admin/practice-sessions/{session_id}", {"as": "admin"}),
+    ("GET", "/admin/practice-analytics", {"as": "admin"}),
+    ("GET", "/admin/user/{user_id}/practice-history", {"as": "admin"}),
+    ("GET", "/admin/system/health", {"as": "admin"}),
+]
+
+# Requests whose statement count must not grow with the number of subjects
+SCALING_REQUESTS = [
+    ("GET", "/admin/subjects/analytics", {"as": "admin"}),
+    ("GET", "/library/courses", {}),
+    ("GET", "/subjects", {"as": "admin"}),
+]
+
+# Subjects seeded before the scaling requests run again
+SEED_SUBJECTS = 5
+
+@contextmanager
+def count_queries():
+    """Count the SQL statements run on either engine inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+def budget_for(method: str, path: str):
+    """The budget declared by the route a request would reach"""
+    for route in app.routes:
+        match, _ = route.matches({"type": "http", "method": method, "path": path})
+        if match == Match.FULL:
+            return route_budget(route)
+    return None
+
+def assert_query_budget(client, method: str, path: str, **kwargs) -> int:
+    """Make one request and fail if it errors or runs more statements than its route's budget"""
+    budget = budget_for(method, path)
+    with count_queries() as statements:
+        try:
+            response = client.request(method, path, **kwargs)
+        except QueryBudgetExceeded:
+            response = None
+    if response is not None and response.status_code >= 400:
+        raise AssertionError(f"{method} {path} returned {response.status_code}: {response.text[:200]}")
+    if budget is not None and len(statements) > budget:
+        # Repeats of one statement are the usual N+1 signature, so group them
+        repeats = Counter(" ".join(statement.split())[:120] for statement in statements)
+        raise AssertionError(f"{method} {path} ran {len(statements)} SQL statements, over its budget of {budget}:\n"
+                             + "\n".join(f"  {count:>4}x {statement}" for statement, count in repeats.most_common()))
+    return len(statements)
+
+def seed(client) -> dict:
+    """A small dataset, plus a content and lesson, returning the ids the sample requests use"""
+    summary = datagen.generate(engine, datagen.DatasetSpec(
+        users=20, subjects=SEED_SUBJECTS, questions_per_subject=50, sessions=200, attempts=2000
+    ), log=lambda line: None)
+    admin_id = summary["first_user_id"]
+    student_id = admin_id + 1
+    headers = {
+        role: {"Authorization": f"Bearer {create_access_token(data={'sub': f'user{user_id}@bench.example.com'})}"}
+        for role, user_id in (("admin", admin_id), ("student", student_id))
+    }
+    with engine.connect() as conn:
+        session_id, subject_id = conn.execute(
+            select(PracticeSession.id, PracticeSession.subject_id).where(PracticeSession.user_id == student_id).limit(1)
+        ).one()
+        question_ids = list(conn.execute(
+            select(Question.id).where(Question.subject_id == subject_id).limit(10)
+        ).scalars())
+    content = client.post(f"/subjects/{subject_id}/contents", json={"title": "Algebra basics", "body": "Equations"},
+                          headers=headers["admin"]).json()
+    client.post(f"/contents/{content['id']}/lessons", json={"title": "Linear equations", "body": "Solve for x"},
+                headers=headers["admin"])
+    return {
+        "headers": headers,
+        "ids": {
+            "user_id": student_id,
+            "subject_id": subject_id,
+            "session_id": session_id,
+            "question_id": question_ids[0],
+            "content_id": content["id"],
+        },
+        "login": {"email": f"user{student_id}@bench.example.com", "password": datagen.PASSWORD},
+        "answers": {"answers": [
+            {"question_id": question_id, "selected_answer": "A", "time_taken": 10} for question_id in question_ids
+        ]},
+    }
+
+def request_kwargs(data: dict, options: dict) -> dict:
+    kwargs = {"params": options.get("params")}
+    if "as" in options:
+        kwargs["headers"] = data["headers"][options["as"]]
+    if "json" in options:
+        kwargs["json"] = data[options["json"]]
+    return kwargs
+
+def count_scaling_queries(client, data: dict, failures: list) -> dict:
+    """Statements each scaling request runs against the current dataset; None for a request that failed"""
+    counts = {}
+    for method, path, options in SCALING_REQUESTS:
+        try:
+            counts[f"{method} {path}"] = assert_query_budget(client, method, path, **request_kwargs(data, options))
+        except AssertionError as e:
+            failures.append(str(e))
+            counts[f"{method} {path}"] = None
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="also list routes without a budget")
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    upgrade_database()
+    failures = []
+    with TestClient(app) as client:
+        data = seed(client)
+        exercised = set()
+        print(f"{'route':62} {'queries':>8} {'budget':>7}")
+        for method, template, options in SAMPLE_REQUESTS:
+            path = template.format(**data["ids"])
+            kwargs = request_kwargs(data, options)
+            budget = budget_for(method, path)
+            label = f"{method} {template}" + (f" {options['params']}" if options.get("params") else "")
+            try:
+                queries = assert_query_budget(client, method, path, **kwargs)
+            except AssertionError as e:
+                failures.append(str(e))
+                print(f"{label:62} {'FAIL':>8} {budget if budget is not None else '-':>7}")
+                continue
+            exercised.add((method, template))
+            if budget is not None or args.verbose:
+                print(f"{label:62} {queries:>8} {budget if budget is not None else '-':>7}")
+
+        # N+1 loops over subjects show up as statement counts that grow with them
+        before = count_scaling_queries(client, data, failures)
+        datagen.generate(engine, datagen.DatasetSpec(
+            users=5, subjects=SEED_SUBJECTS, questions_per_subject=50, sessions=50, attempts=500
+        ), log=lambda line: None)
+        after = count_scaling_queries(client, data, failures)
+        print(f"\n{'route':62} {f'{SEED_SUBJECTS} subj':>8} {f'{2 * SEED_SUBJECTS} subj':>8}")
+        for label, queries in before.items():
+            print(f"{label:62} {str(queries):>8} {str(after[label]):>8}")
+            if None not in (queries, after[label]) and after[label] != queries:
+                failures.append(f"{label} ran {queries} SQL statements with {SEED_SUBJECTS} subjects "
+                                f"but {after[label]} with {2 * SEED_SUBJECTS}")
+
+    for method, path, budget in route_budgets(app):
+        if (method, path) not in exercised and not any(failure.startswith(f"{method} ") for failure in failures):
+            failures.append(f"{method} {path} declares a budget of {budget} but has no sample request here")
+
+    if failures:
+        print("\nQuery budget check failed:", file=sys.stderr)
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        sys.exit(1)
+    print("\nAll routes within their query budgets, and constant as subjects grow")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Restore throughput benchmark
+Writes a synthetic NDJSON backup (1M question attempts by default) to a temp
+file, then streams it through the chunked restore engine once per chunk size
+and prints rows/s, elapsed time and peak RSS as JSON.
+
+    python benchmarks/restore.py --attempts 1000000 --chunk-sizes 1000,5000,20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# The app reads DATABASE_URL at import time, so point it at a scratch DB first
+_workdir = tempfile.mkdtemp(prefix="studentlearn-restore-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'restore.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.backup import BACKUP_FORMAT, BACKUP_FORMAT_VERSION, BACKUP_TABLES, restore_from_stream
+from app.migrations import upgrade_database
+
+
+def write_backup(path: str, users: int, subjects: int, questions: int, sessions: int, attempts: int):
+    """Write a backup file in the same NDJSON layout the backup endpoint produces"""
+    started = datetime(2024, 1, 1)
+    counts = {table.name: 0 for table in BACKUP_TABLES}
+
+    def rows():
+        for i in range(1, users + 1):
+            yield "users", {"id": i, "email": f"user{i}@bench.example.com", "full_name": f"User {i}",
+                            "hashed_password": "x", "is_active": True, "is_admin": i == 1,
+                            "created_at": started.isoformat(), "updated_at": None}
+        for i in range(1, subjects + 1):
+            yield "subjects", {"id": i, "name": f"Subject {i}", "description": None, "is_active": True,
+                               "created_at": started.isoformat()}
+        for i in range(1, questions + 1):
+            yield "questions", {"id": i, "subject_id": i % subjects + 1, "question_text": f"Question {i}?",
+                                "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d",
+                                "correct_answer": "A", "explanation": None, "difficulty_level": "medium",
+                                "is_active": True, "created_at": started.isoformat()}
+        for i in range(1, sessions + 1):
+            yield "practice_sessions", {"id": i, "user_id": i % users + 1, "subject_id": i % subjects + 1,
+                                        "score": 50.0, "total_questions": 10, "correct_answers": 5,
+                                        "time_taken": 300,
+                                        "completed_at": (started + timedelta(seconds=i)).isoformat()}
+        for i in range(1, attempts + 1):
+            yield "question_attempts", {"id": i, "user_id": i % users + 1,
+                                        "question_id": random.randint(1, questions),
+                                        "session_id": i % sessions + 1, "selected_answer": "A",
+                                        "is_correct": random.random() < 0.6, "time_taken": 20,
+                                        "attempted_at": (started + timedelta(seconds=i)).isoformat()}
+
+    with open(path, "w") as f:
+        f.write(json.dumps({"type": "header", "format": BACKUP_FORMAT, "version": BACKUP_FORMAT_VERSION,
+                            "timestamp": started.isoformat(),
+                            "tables": [table.name for table in BACKUP_TABLES]}) + "\n")
+        for table, row in rows():
+            counts[table] += 1
+            f.write(json.dumps({"table": table, "row": row}) + "\n")
+        f.write(json.dumps({"type": "footer", "counts": counts}) + "\n")
+    return sum(counts.values())
+
+
+async def read_file(path: str, block_size: int = 64 * 1024):
+    """Feed the file to the restore engine the way an upload body arrives"""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            yield block
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--subjects", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=50000)
+    parser.add_argument("--attempts", type=int, default=1000000)
+    parser.add_argument("--chunk-sizes", default="5000", help="comma-separated chunk sizes to compare")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    upgrade_database()
+    path = os.path.join(_workdir, "backup.ndjson")
+    total_rows = write_backup(path, args.users, args.subjects, args.questions, args.sessions, args.attempts)
+
+    results = []
+    for chunk_size in (int(size) for size in args.chunk_sizes.split(",")):
+        started = time.perf_counter()
+        run = asyncio.run(restore_from_stream(read_file(path), chunk_size=chunk_size))
+        elapsed = time.perf_counter() - started
+        results.append({
+            "chunk_size": chunk_size,
+            "status": run.status,
+            "chunks": run.chunks,
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(total_rows / elapsed),
+        })
+
+    print(json.dumps({
+        "backup_bytes": os.path.getsize(path),
+        "rows": total_rows,
+        "attempts": args.attempts,
+        "runs": results,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
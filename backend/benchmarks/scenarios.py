@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Scenario benchmark runner
+Generates a synthetic dataset (see datagen.py), then drives the ASGI app
+in-process with httpx through named scenarios and reports throughput and
+p50/p95/p99 latency per route as JSON.
+
+Scenarios:
+    login_storm          bcrypt-heavy POST /auth/login bursts
+    library_browsing     library, subject pages, practice subjects and search
+    practice_submission  fetch practice questions, submit answers in a batch
+    admin_dashboards     statistics, analytics and user history reports
+
+Record a run per commit and compare them:
+    python benchmarks/scenarios.py --output before.json
+    python benchmarks/scenarios.py --output after.json --baseline before.json --max-regression 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND_DIR)
+
+SCENARIOS = ("login_storm", "library_browsing", "practice_submission", "admin_dashboards")
+# Routes with fewer samples than this are too noisy to flag as regressions
+MIN_COMPARABLE_SAMPLES = 20
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    """Latencies and errors per route for one scenario"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    async def request(self, client, name: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        return response
+
+    def routes(self) -> dict:
+        return {
+            name: {
+                "count": len(samples),
+                "errors": self.errors.get(name, 0),
+                "mean_ms": round(sum(samples) / len(samples), 2),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+                "max_ms": round(max(samples), 2),
+            } for name, samples in sorted(self.latencies.items())
+        }
+
+
+class Context:
+    """Users, tokens and practice sessions the scenarios draw from"""
+
+    def __init__(self, db_engine, first_user_id: int, users: int, words):
+        from sqlalchemy import select
+        from app.models import PracticeSession, Subject
+
+        self.first_user_id = first_user_id
+        self.users = users
+        self.words = words
+        self._tokens = {}
+        with db_engine.connect() as conn:
+            self.subject_ids = list(conn.execute(select(Subject.id).where(Subject.is_active == True)).scalars())
+            self.sessions = conn.execute(
+                select(PracticeSession.id, PracticeSession.user_id, PracticeSession.subject_id)
+                .where(PracticeSession.user_id >= first_user_id, PracticeSession.user_id < first_user_id + users)
+                .order_by(PracticeSession.id.desc()).limit(5000)
+            ).all()
+
+    def user_email(self, user_id: int) -> str:
+        return f"user{user_id}@bench.example.com"
+
+    def headers(self, user_id: int) -> dict:
+        from app.auth import create_access_token
+
+        token = self._tokens.get(user_id)
+        if token is None:
+            token = self._tokens[user_id] = create_access_token(data={"sub": self.user_email(user_id)})
+        return {"Authorization": f"Bearer {token}"}
+
+    @property
+    def admin_headers(self) -> dict:
+        return self.headers(self.first_user_id)
+
+    def random_user(self, rng: random.Random) -> int:
+        # The first user is the admin; students are everyone after
+        return rng.randrange(self.first_user_id + 1, self.first_user_id + self.users)
+
+
+async def login_storm(ctx: Context, client, rec: Recorder, rng: random.Random):
+    from benchmarks.datagen import PASSWORD
+
+    user_id = ctx.random_user(rng)
+    await rec.request(client, "POST /auth/login", "POST", "/auth/login",
+                      json={"email": ctx.user_email(user_id), "password": PASSWORD})
+
+
+async def library_browsing(ctx: Context, client, rec: Recorder, rng: random.Random):
+    headers = ctx.headers(ctx.random_user(rng))
+    subject_id = rng.choice(ctx.subject_ids)
+    await rec.request(client, "GET /library/courses", "GET", "/library/courses")
+    await rec.request(client, "GET /subjects/{subject_id}", "GET", f"/subjects/{subject_id}", headers=headers)
+    await rec.request(client, "GET /practice/subjects", "GET", "/practice/subjects")
+    await rec.request(client, "GET /search", "GET", "/search",
+                      params={"q": " ".join(rng.sample(ctx.words, 2))[:-2], "limit": 20})
+
+
+async def practice_submission(ctx: Context, client, rec: Recorder, rng: random.Random):
+    session_id, user_id, subject_id = rng.choice(ctx.sessions)
+    headers = ctx.headers(user_id)
+    mode = "adaptive" if rng.random() < 0.3 else "random"
+    response = await rec.request(client, f"GET /practice/questions/{{subject_id}} ({mode})", "GET",
+                                 f"/practice/questions/{subject_id}", params={"limit": 10, "mode": mode},
+                                 headers=headers)
+    questions = response.json().get("questions", []) if response.status_code == 200 else []
+    if questions:
+        answers = [
+            {"question_id": question["id"], "selected_answer": rng.choice("ABCD"), "time_taken": rng.randint(5, 60)}
+            for question in questions
+        ]
+        await rec.request(client, "POST /practice-sessions/{session_id}/attempts:batch", "POST",
+                          f"/practice-sessions/{session_id}/attempts:batch", json={"answers": answers},
+                          headers=headers)
+
+
+async def admin_dashboards(ctx: Context, client, rec: Recorder, rng: random.Random):
+    headers = ctx.admin_headers
+    user_id = ctx.random_user(rng)
+    report = rng.randrange(5)
+    if report == 0:
+        await rec.request(client, "GET /admin/statistics", "GET", "/admin/statistics", headers=headers)
+    elif report == 1:
+        await rec.request(client, "GET /admin/subjects/analytics", "GET", "/admin/subjects/analytics", headers=headers)
+    elif report == 2:
+        await rec.request(client, "GET /admin/practice-analytics", "GET", "/admin/practice-analytics",
+                          params={"granularity": rng.choice(("day", "week", "month"))}, headers=headers)
+    elif report == 3:
+        await rec.request(client, "GET /admin/user/{user_id}/statistics", "GET",
+                          f"/admin/user/{user_id}/statistics", headers=headers)
+    else:
+        await rec.request(client, "GET /admin/practice-sessions", "GET", "/admin/practice-sessions",
+                          params={"limit": 50}, headers=headers)
+
+
+async def run_scenario(app, ctx: Context, name: str, iterations: int, concurrency: int, warmup: int,
+                       seed: int) -> dict:
+    import httpx
+
+    step = globals()[name]
+    rng = random.Random(f"{seed}:{name}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        # Warm caches and pools without recording, so runs compare steady state
+        discard = Recorder()
+        for _ in range(warmup):
+            await step(ctx, client, discard, rng)
+
+        rec = Recorder()
+        remaining = iterations
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await step(ctx, client, rec, rng)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    requests = sum(len(samples) for samples in rec.latencies.values())
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(rec.errors.values()),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "routes": rec.routes(),
+    }
+
+
+def git_revision() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=_BACKEND_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except Exception:
+        return {"commit": None, "dirty": None}
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list:
+    """Print per-route p95 and throughput changes against a baseline, returning the regressions"""
+    regressions = []
+    print(f"{'scenario / route':60} {'base p95':>10} {'p95':>10} {'change':>8}", file=sys.stderr)
+    for name, scenario in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        change = scenario["throughput_rps"] / base["throughput_rps"] - 1 if base["throughput_rps"] else 0.0
+        print(f"{name + ' throughput (rps)':60} {base['throughput_rps']:>10.1f} {scenario['throughput_rps']:>10.1f} {change:>+8.1%}",
+              file=sys.stderr)
+        if -change > max_regression:
+            regressions.append(f"{name}: throughput {change:+.1%}")
+        for route, stats in scenario["routes"].items():
+            base_stats = base["routes"].get(route)
+            if not base_stats:
+                continue
+            change = stats["p95_ms"] / base_stats["p95_ms"] - 1 if base_stats["p95_ms"] else 0.0
+            print(f"  {route:58} {base_stats['p95_ms']:>10.2f} {stats['p95_ms']:>10.2f} {change:>+8.1%}", file=sys.stderr)
+            comparable = min(stats["count"], base_stats["count"]) >= MIN_COMPARABLE_SAMPLES
+            if comparable and change > max_regression:
+                regressions.append(f"{name} {route}: p95 {change:+.1%}")
+    return regressions
+
+
+def main():
+    # The app reads DATABASE_URL at import time, so find the target before importing anything from it
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--database-url")
+    known, _ = pre.parse_known_args()
+    os.environ["DATABASE_URL"] = known.database_url or (
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='studentlearn-scenarios-'), 'bench.db')}"
+    )
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+    from benchmarks import datagen
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenarios to run")
+    parser.add_argument("--iterations", type=int, default=500, help="iterations per scenario")
+    parser.add_argument("--login-iterations", type=int, default=100, help="iterations for login_storm (bcrypt bound)")
+    # Above DB_POOL_SIZE + DB_MAX_OVERFLOW, routes that use sync sessions on the event loop can stall for DB_POOL_TIMEOUT
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="unrecorded iterations per scenario")
+    parser.add_argument("--database-url", help="benchmark an existing database instead of a scratch SQLite file")
+    parser.add_argument("--no-generate", action="store_true", help="use the bench data already in --database-url")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="JSON report from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="exit with status 1 when a route's p95 or a scenario's throughput is this fraction worse")
+    # A smaller dataset than datagen's defaults, so a run finishes in a couple of minutes
+    datagen.add_arguments(parser.add_argument_group("dataset"),
+                          datagen.DatasetSpec(users=500, sessions=5000, attempts=100000))
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    if args.no_generate and not args.database_url:
+        parser.error("--no-generate needs --database-url")
+    if args.users < 2:
+        parser.error("--users must be at least 2 (an admin and a student)")
+    # Slow request warnings would interleave with the report
+    logging.getLogger("app.request_metrics").setLevel(logging.ERROR)
+
+    from app.main import app
+    from app.database import engine
+    from app.hashing import shutdown_hash_executor
+    from app.migrations import upgrade_database
+
+    upgrade_database()
+    spec = datagen.spec_from_args(args)
+    if args.no_generate:
+        from sqlalchemy import func, select
+        from app.models import User
+        with engine.connect() as conn:
+            first_user_id = conn.execute(
+                select(func.min(User.id)).where(User.email.like("user%@bench.example.com"))
+            ).scalar() or 1
+        dataset_summary = {"spec": None, "first_user_id": first_user_id}
+    else:
+        dataset_summary = datagen.generate(engine, spec, log=lambda line: print(line, file=sys.stderr))
+
+    ctx = Context(engine, dataset_summary["first_user_id"], args.users, datagen.WORDS)
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "dataset": dataset_summary,
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in names:
+            iterations = args.login_iterations if name == "login_storm" else args.iterations
+            print(f"running {name} ({iterations} iterations, concurrency {args.concurrency})", file=sys.stderr)
+            report["scenarios"][name] = asyncio.run(
+                run_scenario(app, ctx, name, iterations, args.concurrency, args.warmup, args.seed)
+            )
+    finally:
+        shutdown_hash_executor()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression if args.max_regression is not None else float("inf"))
+        if regressions and args.max_regression is not None:
+            print("Regressions beyond the allowed margin:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
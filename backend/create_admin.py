@@ -13,6 +13,7 @@ sys.path.append(str(Path(__file__).parent / "app"))
 
 from app.database import get_db, engine
 from app.models import Base, User
+from app.migrations import upgrade_database
 from app.auth import get_password_hash
 from sqlalchemy.orm import Session
 
@@ -56,8 +57,8 @@ def create_admin_user(email: str, full_name: str, password: str, db: Session) ->
 def main():
     """Main function to create admin user"""
     
-    # Create database tables if they don't exist
-    Base.metadata.create_all(bind=engine)
+    # Create or upgrade database tables
+    upgrade_database()
     
     print("=== StudentLearn Admin User Creator ===")
     print()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Rebuild the search_documents index from subjects, contents, lessons and questions.
+Writes through the API keep it current; run this to reconcile drift, e.g.
+after editing those tables directly in the database.
+
+    python rebuild_search_index.py
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add the app directory to the Python path
+sys.path.append(str(Path(__file__).parent / "app"))
+
+from app.database import SessionLocal
+from app.migrations import upgrade_database
+from app.search import rebuild_search_index
+
+def main():
+    """Main function to rebuild the search index"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.parse_args()
+
+    upgrade_database()
+
+    db = SessionLocal()
+    try:
+        count = rebuild_search_index(db)
+        db.commit()
+        print(f"Indexed {count} search documents")
+    except Exception as e:
+        db.rollback()
+        print(f"Error rebuilding search index: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Rebuild the user_stats rollups from practice_sessions and question_attempts.
+Writes keep the rollups current; run this to reconcile drift, e.g. after
+editing sessions or attempts directly in the database.
+
+    python rebuild_user_stats.py                  # every user
+    python rebuild_user_stats.py --user-id 12 40  # only these users
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add the app directory to the Python path
+sys.path.append(str(Path(__file__).parent / "app"))
+
+from app.database import SessionLocal
+from app.migrations import upgrade_database
+from app.user_stats import rebuild_user_stats
+
+def main():
+    """Main function to rebuild user statistics"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--user-id", type=int, nargs="+", help="only rebuild these users")
+    args = parser.parse_args()
+
+    upgrade_database()
+
+    db = SessionLocal()
+    try:
+        count = rebuild_user_stats(db, args.user_id)
+        db.commit()
+        print(f"Rebuilt statistics for {count} users")
+    except Exception as e:
+        db.rollback()
+        print(f"Error rebuilding statistics: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Before the app is imported: a scratch database, so tests never touch a real one
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='studentlearn-tests-'), 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
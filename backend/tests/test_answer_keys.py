@@ -0,0 +1,28 @@
+from app.answer_keys import UNGRADABLE_ANSWER, SubjectAnswerKey
+
+ROWS = [(10, "A"), (11, "b"), (13, "D"), (14, "E"), (15, None)]
+
+def test_dense_key():
+    key = SubjectAnswerKey(ROWS, 300)
+    assert key.ids is None
+    assert key.is_correct(10, "A") and key.is_correct(11, " B ")
+    assert not key.is_correct(10, "B") and not key.is_correct(12, "A")
+    assert key.get(14) == UNGRADABLE_ANSWER and not key.is_correct(14, "E")
+    assert 15 in key and 12 not in key and 9 not in key and 16 not in key
+
+def test_scattered_ids_use_a_sorted_array():
+    # A few questions spread over a billion ids must not allocate a byte per id
+    rows = [(question_id * 100_000_000 + 7, answer) for question_id, answer in ROWS]
+    key = SubjectAnswerKey(reversed(rows), 300)
+    assert key.ids is not None
+    assert len(key.codes) == len(rows)
+    assert key.is_correct(1_000_000_007, "A") and key.is_correct(1_100_000_007, "B")
+    assert not key.is_correct(1_000_000_007, "B")
+    assert key.get(1_400_000_007) == UNGRADABLE_ANSWER
+    assert 1_500_000_007 in key
+    for missing in (0, 7, 1_000_000_006, 1_000_000_008, 1_200_000_007, 10**12):
+        assert missing not in key
+
+def test_empty_key():
+    key = SubjectAnswerKey([], 300)
+    assert 1 not in key and not key.is_correct(1, "A")
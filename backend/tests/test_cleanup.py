@@ -0,0 +1,90 @@
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.daily_stats import rebuild_daily_stats
+from app.database import SessionLocal, engine
+from app.jobs import system_cleanup
+from app.migrations import upgrade_database
+from app.models import PracticeSession, Question, QuestionAttempt, Subject, User, UserEnrollment
+from app.user_stats import rebuild_user_stats
+
+NUMBERS = itertools.count()
+
+def add_session(db, user: User, question: Question, completed_at: datetime) -> PracticeSession:
+    session = PracticeSession(user_id=user.id, subject_id=question.subject_id, score=50.0, completed_at=completed_at)
+    db.add(session)
+    db.flush()
+    db.add(QuestionAttempt(
+        user_id=user.id, question_id=question.id, session_id=session.id,
+        selected_answer="A", is_correct=True, attempted_at=completed_at,
+    ))
+    return session
+
+def seed(inactive_users: int, old_sessions: int) -> dict:
+    """Inactive users with a session each, and an active user with old and recent sessions"""
+    upgrade_database()
+    long_ago = datetime.utcnow() - timedelta(days=400)
+    with SessionLocal() as db:
+        subject = Subject(name="Cleanup test", description="d")
+        db.add(subject)
+        db.flush()
+        question = Question(
+            subject_id=subject.id, question_text="q", option_a="a", option_b="b", option_c="c", option_d="d", correct_answer="A"
+        )
+        db.add(question)
+
+        def add_user(**fields) -> User:
+            user = User(email=f"cleanup{next(NUMBERS)}@example.com", full_name="c", hashed_password="x", **fields)
+            db.add(user)
+            db.flush()
+            db.add(UserEnrollment(user_id=user.id, subject_id=subject.id))
+            return user
+
+        db.flush()
+        for _ in range(inactive_users):
+            add_session(db, add_user(is_active=False, updated_at=datetime.utcnow() - timedelta(days=100)), question, long_ago)
+        active = add_user()
+        for _ in range(old_sessions):
+            add_session(db, active, question, long_ago)
+        recent = add_session(db, active, question, datetime.utcnow())
+        rebuild_user_stats(db)
+        rebuild_daily_stats(db)
+        db.commit()
+        return {"active_user_id": active.id, "recent_session_id": recent.id}
+
+def run_cleanup() -> tuple:
+    """Cleanup results and the number of statements the cleanup issued"""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        with SessionLocal() as db:
+            results = system_cleanup(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return results, len(statements)
+
+@pytest.mark.parametrize("inactive_users, old_sessions", [(2, 3), (6, 9)])
+def test_cleanup_reports_deleted_rows(inactive_users, old_sessions):
+    ids = seed(inactive_users, old_sessions)
+    results, _ = run_cleanup()
+    assert results == {"deleted_inactive_users": inactive_users, "deleted_old_sessions": old_sessions}
+    with SessionLocal() as db:
+        assert db.get(User, ids["active_user_id"]) is not None
+        sessions = db.query(PracticeSession).filter(PracticeSession.user_id == ids["active_user_id"])
+        assert [session.id for session in sessions] == [ids["recent_session_id"]]
+        assert db.query(QuestionAttempt).filter(QuestionAttempt.user_id == ids["active_user_id"]).count() == 1
+        assert db.query(User).filter(User.is_active == False).count() == 0
+
+def test_cleanup_statement_count_does_not_grow_with_rows():
+    seed(2, 3)
+    _, few = run_cleanup()
+    seed(20, 30)
+    _, many = run_cleanup()
+    assert many == few
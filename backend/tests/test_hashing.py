@@ -0,0 +1,38 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import hashing
+from app.hashing import hash_password_async, verify_password_async
+
+@pytest.fixture
+def broken_pool(monkeypatch):
+    pool = ProcessPoolExecutor(max_workers=1)
+    # A worker exiting mid-task breaks the pool, like an OOM kill would
+    assert isinstance(pool.submit(os._exit, 1).exception(timeout=30), BrokenProcessPool)
+    monkeypatch.setattr(hashing, "_executor", pool)
+    yield pool
+    hashing.shutdown_hash_executor()
+
+def test_broken_process_pool_falls_back_to_threads(broken_pool):
+    async def scenario():
+        hashed = await hash_password_async("secret")
+        return hashed, await verify_password_async("secret", hashed)
+
+    hashed, valid = asyncio.run(scenario())
+    assert valid
+    assert isinstance(hashing._executor, ThreadPoolExecutor)
+    assert hashing.get_hashing_metrics()["in_flight"] == 0
+
+def test_concurrent_requests_replace_the_pool_once(broken_pool):
+    async def scenario():
+        return await asyncio.gather(*(hash_password_async(f"secret{n}") for n in range(4)))
+
+    assert len(asyncio.run(scenario())) == 4
+    replacement = hashing._executor
+    assert isinstance(replacement, ThreadPoolExecutor)
+    asyncio.run(hash_password_async("again"))
+    assert hashing._executor is replacement
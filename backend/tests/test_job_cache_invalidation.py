@@ -0,0 +1,98 @@
+import time
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from app import aggregates, jobs
+from app.answer_keys import answer_key_cache
+from app.question_pool import question_pool_cache
+
+CHANNEL = "test:cache-invalidation"
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+@pytest.fixture
+def celery_worker(server, monkeypatch):
+    """Make this process publish invalidations the way a Celery worker does"""
+    monkeypatch.setattr(jobs, "JOB_BACKEND", "celery")
+    monkeypatch.setattr(jobs, "CACHE_INVALIDATION_CHANNEL", CHANNEL)
+    monkeypatch.setattr(jobs, "_invalidation_client", fakeredis.FakeRedis(server=server))
+
+def subscribe(server):
+    pubsub = fakeredis.FakeRedis(server=server).pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(CHANNEL)
+    return pubsub
+
+def published(pubsub, wait: float = 0.3) -> list:
+    scopes = []
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        # Ignored subscribe confirmations also come back as None, so keep polling until the deadline
+        message = pubsub.get_message(timeout=0.05)
+        if message is not None:
+            scopes.append(message["data"].decode())
+    return scopes
+
+def fill_caches():
+    answer_key_cache._keys[1] = SimpleNamespace(expires_at=time.monotonic() + 300)
+    question_pool_cache._pools[1] = SimpleNamespace(expires_at=time.monotonic() + 300)
+    aggregates.memoized("system_counters", lambda: {"users": 1}, ttl_seconds=300)
+
+def caches_empty() -> bool:
+    return not answer_key_cache._keys and not question_pool_cache._pools and "system_counters" not in aggregates._memo
+
+def test_restore_job_publishes_invalidation(server, celery_worker, monkeypatch):
+    async def restore_from_stream(stream, resume=False, chunk_size=None, on_flush=None):
+        return SimpleNamespace(status="completed", to_dict=lambda: {})
+
+    monkeypatch.setattr(jobs, "restore_from_stream", restore_from_stream)
+    pubsub = subscribe(server)
+    ctx = SimpleNamespace(params={}, iter_input=lambda: None, input_read=0, input_size=0, progress=lambda *a, **k: None)
+    jobs.restore_job(ctx)
+    assert published(pubsub) == ["data"]
+
+def test_restore_job_publishes_invalidation_when_it_fails(server, celery_worker, monkeypatch):
+    async def restore_from_stream(stream, resume=False, chunk_size=None, on_flush=None):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(jobs, "restore_from_stream", restore_from_stream)
+    pubsub = subscribe(server)
+    ctx = SimpleNamespace(params={}, iter_input=lambda: None, input_read=0, input_size=0, progress=lambda *a, **k: None)
+    with pytest.raises(RuntimeError):
+        jobs.restore_job(ctx)
+    assert published(pubsub) == ["data"]
+
+def test_local_backend_does_not_publish(server, monkeypatch):
+    client = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(jobs, "JOB_BACKEND", "local")
+    monkeypatch.setattr(jobs, "CACHE_INVALIDATION_CHANNEL", CHANNEL)
+    monkeypatch.setattr(jobs, "_invalidation_client", client)
+    pubsub = subscribe(server)
+    fill_caches()
+    jobs.publish_cache_invalidation("questions")
+    assert caches_empty()
+    assert published(pubsub) == []
+
+@pytest.mark.parametrize("scope", ["data", "questions"])
+def test_api_listener_clears_caches_published_by_worker(server, scope):
+    listener = jobs.CacheInvalidationListener(fakeredis.FakeRedis(server=server), channel=CHANNEL)
+    listener.start()
+    worker = fakeredis.FakeRedis(server=server)
+    try:
+        assert wait_for(lambda: worker.pubsub_numsub(CHANNEL)[0][1] == 1)
+        fill_caches()
+        assert worker.publish(CHANNEL, scope) == 1
+        assert wait_for(caches_empty)
+    finally:
+        listener.stop()
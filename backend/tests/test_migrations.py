@@ -0,0 +1,23 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_workers_starting_together_migrate_once(tmp_path):
+    database = tmp_path / "fresh.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}")
+    env.pop("ASYNC_DATABASE_URL", None)
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", "from app.migrations import upgrade_database; upgrade_database()"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        )
+        for _ in range(4)
+    ]
+    for worker in workers:
+        output, _ = worker.communicate(timeout=120)
+        assert worker.returncode == 0, output.decode()
+    with sqlite3.connect(database) as conn:
+        assert len(conn.execute("SELECT version_num FROM alembic_version").fetchall()) == 1
@@ -0,0 +1,45 @@
+import asyncio
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app import auth
+from app.auth import create_access_token, get_current_user_async
+from app.principal_cache import Principal, RedisPrincipalCache
+
+PRINCIPAL = Principal(id=1, email="a@example.com", full_name="A", is_active=True, is_admin=False)
+
+class BlockingClient:
+    """Stands in for the sync client; the async dependency must never call it"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"sync Redis {name}() called from the event loop")
+
+@pytest.fixture
+def redis_cache(monkeypatch):
+    server = fakeredis.FakeServer()
+    cache = RedisPrincipalCache.__new__(RedisPrincipalCache)
+    cache.ttl_seconds = 30
+    cache._client = fakeredis.FakeRedis(server=server)
+    cache._async_client = fakeredis.aioredis.FakeRedis(server=server)
+    monkeypatch.setattr(auth, "principal_cache", cache)
+    return cache
+
+def test_async_and_sync_clients_share_entries(redis_cache):
+    other = Principal(id=2, email="b@example.com", full_name="B", is_active=True, is_admin=True)
+
+    async def scenario():
+        redis_cache.set(PRINCIPAL.email, PRINCIPAL)
+        assert await redis_cache.get_async(PRINCIPAL.email) == PRINCIPAL
+        await redis_cache.set_async(other.email, other)
+
+    asyncio.run(scenario())
+    assert redis_cache.get(other.email) == other
+
+def test_async_dependency_does_not_use_the_sync_client(redis_cache):
+    redis_cache.set(PRINCIPAL.email, PRINCIPAL)
+    redis_cache._client = BlockingClient()
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token({"sub": PRINCIPAL.email}))
+    assert asyncio.run(get_current_user_async(credentials, db=None)) == PRINCIPAL
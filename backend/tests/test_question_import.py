@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app import question_import
+from app.database import SessionLocal
+from app.migrations import upgrade_database
+from app.models import Question, SearchDocument, Subject
+from app.question_import import ImportInterrupted, import_questions
+
+@pytest.fixture
+def subject_id():
+    upgrade_database()
+    with SessionLocal() as db:
+        subject = Subject(name="Import test", description="d")
+        db.add(subject)
+        db.commit()
+        return subject.id
+
+def question(subject_id: int, number: int) -> dict:
+    return {
+        "subject_id": subject_id, "question_text": f"Imported question {number}",
+        "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d", "correct_answer": "B",
+    }
+
+def count_questions(subject_id: int) -> int:
+    with SessionLocal() as db:
+        return db.query(Question).filter(Question.subject_id == subject_id).count()
+
+def test_chunks_are_committed_as_they_go(subject_id, monkeypatch):
+    monkeypatch.setattr(question_import, "IMPORT_CHUNK_SIZE", 10)
+    visible = []
+
+    async def rows():
+        for number in range(35):
+            yield question(subject_id, number)
+
+    def on_flush(run):
+        # Another session sees each chunk once it is flushed, while the import is still going
+        visible.append(count_questions(subject_id))
+
+    with SessionLocal() as db:
+        report = asyncio.run(import_questions(db, rows(), on_flush=on_flush))
+    assert visible == [10, 20, 30]
+    assert report["created_count"] == 35
+    assert count_questions(subject_id) == 35
+    with SessionLocal() as db:
+        assert db.query(SearchDocument).filter(
+            SearchDocument.kind == "question", SearchDocument.subject_id == subject_id
+        ).count() == 35
+
+def test_failure_keeps_committed_chunks(subject_id, monkeypatch):
+    monkeypatch.setattr(question_import, "IMPORT_CHUNK_SIZE", 10)
+
+    async def rows():
+        for number in range(25):
+            yield question(subject_id, number)
+        raise ConnectionError("upload cut short")
+
+    with SessionLocal() as db:
+        with pytest.raises(ImportInterrupted) as error:
+            asyncio.run(import_questions(db, rows()))
+    assert error.value.created_count == 20
+    assert "upload cut short" in str(error.value)
+    # The two full chunks stay; the five rows still pending are rolled back
+    assert count_questions(subject_id) == 20
+
+def test_failure_before_the_first_chunk_is_not_wrapped(subject_id):
+    async def rows():
+        raise ConnectionError("upload cut short")
+        yield
+
+    with SessionLocal() as db:
+        with pytest.raises(ConnectionError):
+            asyncio.run(import_questions(db, rows()))
+    assert count_questions(subject_id) == 0
@@ -0,0 +1,58 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app import response_cache as module
+from app.response_cache import InMemoryResponseCache, RedisResponseCache, get_or_build, invalidate_subject_responses, library_courses_key
+
+def memory_cache():
+    return InMemoryResponseCache(ttl_seconds=300, max_size=100)
+
+def redis_cache():
+    cache = RedisResponseCache.__new__(RedisResponseCache)
+    cache.ttl_seconds = 300
+    cache._client = fakeredis.FakeRedis()
+    return cache
+
+@pytest.fixture(params=[memory_cache, redis_cache], ids=["memory", "redis"])
+def cache(request, monkeypatch):
+    cache = request.param()
+    monkeypatch.setattr(module, "response_cache", cache)
+    return cache
+
+def test_build_is_cached(cache):
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {"courses": [1]}
+
+    first = asyncio.run(get_or_build(library_courses_key(), build))
+    second = asyncio.run(get_or_build(library_courses_key(), build))
+    assert first.etag == second.etag
+    assert len(calls) == 1
+
+def test_invalidation_during_build_is_not_overwritten(cache):
+    async def scenario():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_build():
+            started.set()
+            await release.wait()
+            return {"courses": ["stale"]}
+
+        build = asyncio.create_task(get_or_build(library_courses_key(), slow_build))
+        await started.wait()
+        invalidate_subject_responses(1)
+        release.set()
+        return await build
+
+    stale = asyncio.run(scenario())
+    # The request that built it still gets its result, but it isn't kept for later requests
+    assert stale.data == {"courses": ["stale"]}
+    assert cache.get(library_courses_key()) is None
+
+    fresh = asyncio.run(get_or_build(library_courses_key(), lambda: {"courses": ["fresh"]}))
+    assert cache.get(library_courses_key()).etag == fresh.etag
@@ -0,0 +1,37 @@
+import asyncio
+import gzip
+import time
+
+from app.uploads import iter_upload_lines
+
+def read_lines(data: bytes, chunk_size: int, keep_blank: bool = False) -> list:
+    async def chunks():
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    async def collect():
+        return [line async for line in iter_upload_lines(chunks(), keep_blank=keep_blank)]
+
+    return asyncio.run(collect())
+
+def test_lines_split_across_chunks():
+    data = b'{"a": 1}\n\n{"b": 2}\n{"c": 3}'
+    for chunk_size in (1, 2, 3, 7, 100):
+        assert read_lines(data, chunk_size) == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+        assert read_lines(data, chunk_size, keep_blank=True) == [b'{"a": 1}', b"", b'{"b": 2}', b'{"c": 3}']
+
+def test_gzipped_upload():
+    data = b"".join(b"line %d\n" % number for number in range(10000))
+    lines = read_lines(gzip.compress(data), 1000)
+    assert len(lines) == 10000
+    assert lines[0] == b"line 0" and lines[-1] == b"line 9999"
+
+def test_large_single_line_upload_is_linear():
+    # A legacy single-document JSON backup: one line, arriving in many small chunks
+    data = b'{"users": [' + b",".join(b'{"id": %d}' % number for number in range(800000)) + b"]}"
+    started = time.perf_counter()
+    lines = read_lines(data, 1024)
+    elapsed = time.perf_counter() - started
+    assert lines == [data]
+    # Rescanning the whole buffer on every chunk took minutes at this size
+    assert elapsed < 5, f"{len(data)} bytes in 1 KB chunks took {elapsed:.1f}s"